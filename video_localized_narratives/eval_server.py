@@ -0,0 +1,355 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A local evaluation server which keeps the ground truth and workers warm.
+
+The server loads the ground truth of each split once at startup and keeps a
+pool of worker processes, which keep their decoded ground truth masks across
+evaluations. Evaluation jobs are sent as json over HTTP on localhost and are
+processed one after another.
+
+The splits are configured with a json file:
+  {
+    "vng": {
+      "ovis_test": {
+        "meta_filename": "data/vng/OVIS_VNG/meta_expressions/test/...",
+        "orig_masks_filename": "data/vng/OVIS_VNG/orig_masks/...",
+        "extra_masks_filename": "data/vng/OVIS_VNG/extra_masks/test/..."
+      }
+    },
+    "location_output": {
+      "oops_val": {
+        "gt_json_path": "data/videoqa/location_output/oops_val/..."
+      }
+    }
+  }
+
+Jobs are posted to /evaluate:
+  {"task": "vng", "split": "ovis_test", "result_path": "/path/to/result"}
+The response has the same scores as eval_vng.py or eval_location_output.py.
+For VNG jobs, "boundary_engine" and "chunk_size" can be given as well, for
+location-output jobs "engine" and "batch_size". VNG jobs with "frame_stride" or
+"max_frames_per_expression" evaluate only a subset of the frames, and the
+response has the "jf_standard_error" of the approximate J&F as well.
+Location-output jobs can give a list "result_paths" instead of "result_path",
+to evaluate several models in one pass. Then the response has the scores by
+result path.
+GET /splits lists the available splits.
+
+Usage example:
+  python3 video_localized_narratives/eval_server.py --config=splits.json
+  curl -d '{"task": "vng", "split": "ovis_test", "result_path": "..."}' \\
+    http://localhost:8765/evaluate
+"""
+
+from collections.abc import Sequence
+import http.server
+import json
+import traceback
+from typing import Any, Optional
+import urllib.request
+
+from absl import app
+from absl import flags
+import numpy as np
+
+from video_localized_narratives.tools import progress
+from video_localized_narratives.tools import util
+from video_localized_narratives.video_narrative_grounding import vng_aggregation
+from video_localized_narratives.video_narrative_grounding import vng_dataset
+from video_localized_narratives.video_narrative_grounding import vng_evaluation
+from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import location_output_evaluation
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import square_gt_sidecar
+
+
+DEFAULT_PORT = 8765
+
+_CONFIG_FLAG = flags.DEFINE_string(
+    'config',
+    default=None,
+    required=True,
+    help='The json file with the ground truth splits, see the module docstring.'
+)
+_HOST_FLAG = flags.DEFINE_string(
+    'host',
+    default='localhost',
+    help='The host to listen on. The server has no authentication, so only '
+         'listen on localhost or on trusted networks.'
+)
+_PORT_FLAG = flags.DEFINE_integer(
+    'port', default=DEFAULT_PORT, help='The port to listen on.'
+)
+_PARALLEL_FLAG = flags.DEFINE_boolean(
+    'parallel',
+    default=True,
+    help='Whether to run in parallel. Disable for better debuggability.')
+_NUM_WORKERS_FLAG = flags.DEFINE_integer(
+    'num_workers',
+    default=None,
+    lower_bound=1,
+    help='The number of worker processes. Defaults to the number of CPUs '
+         'available to this process.'
+)
+_MASK_CACHE_BYTES_FLAG = flags.DEFINE_integer(
+    'mask_cache_bytes',
+    default=512 * 1024 * 1024,
+    lower_bound=0,
+    help='The memory budget per worker for decoded ground truth masks, which '
+         'are kept across evaluations.'
+)
+
+
+class EvaluationServer:
+  """Evaluates jobs against the ground truth splits loaded at construction."""
+
+  def __init__(
+      self,
+      config: util.JsonData,
+      run_parallel: bool,
+      num_workers: Optional[int] = None,
+      mask_cache_bytes: int = 0,
+  ):
+    self._vng_datasets = {
+        split: vng_dataset.VNGDataset(frames_path=None, **filenames)
+        for split, filenames in config.get('vng', {}).items()
+    }
+    self._location_output_questions = {
+        split: list(
+            location_output_question.iterate_location_output_questions(
+                split_config['gt_json_path']
+            )
+        )
+        for split, split_config in config.get('location_output', {}).items()
+    }
+    self._location_output_square_gts = {
+        split: square_gt_sidecar.load_sidecar(split_config['gt_json_path'])
+        for split, split_config in config.get('location_output', {}).items()
+    }
+    self._run_parallel = run_parallel
+    if num_workers is None:
+      num_workers = progress.available_cpu_count()
+    self._num_workers = num_workers
+    self._mask_cache_bytes = mask_cache_bytes
+    self._pool = None
+    if run_parallel:
+      # The pool is shared by both tasks. Its workers keep the mask cache.
+      self._pool = vng_evaluation.create_pool(
+          num_workers,
+          vng_evaluation.EvaluationOptions(mask_cache_bytes=mask_cache_bytes),
+      )
+
+  def close(self) -> None:
+    if self._pool is not None:
+      self._pool.terminate()
+      self._pool.join()
+      self._pool = None
+
+  def get_splits(self) -> util.JsonData:
+    return {
+        'vng': sorted(self._vng_datasets),
+        'location_output': sorted(self._location_output_questions),
+    }
+
+  def evaluate_job(self, job: util.JsonData) -> util.JsonData:
+    """Evaluate a job, see the module docstring for the format."""
+    task = job.get('task')
+    if task == 'vng':
+      return self._evaluate_vng(job)
+    elif task == 'location_output':
+      return self._evaluate_location_output(job)
+    raise ValueError(f'Unknown task: {task}')
+
+  def _evaluate_vng(self, job: util.JsonData) -> util.JsonData:
+    dataset = _get_split(self._vng_datasets, job)
+    options = vng_evaluation.EvaluationOptions(
+        chunk_size=job.get('chunk_size'),
+        boundary_engine=job.get('boundary_engine', 'davis2017'),
+        mask_cache_bytes=self._mask_cache_bytes,
+        frame_stride=job.get('frame_stride', 1),
+        max_frames_per_expression=job.get('max_frames_per_expression'),
+    )
+    approximate_scores = {}
+    if options.subsamples_frames():
+      scores, js_by_video_by_exp, fs_by_video_by_exp = (
+          vng_evaluation.evaluate_approximate(
+              dataset,
+              job['result_path'],
+              self._run_parallel,
+              options,
+              num_workers=self._num_workers,
+              pool=self._pool,
+          )
+      )
+      jf, j, f = scores.jf, scores.j, scores.f
+      approximate_scores = {
+          'jf_standard_error': scores.jf_standard_error,
+          'num_evaluated_frames': scores.num_evaluated_frames,
+          'num_annotated_frames': scores.num_annotated_frames,
+      }
+    else:
+      jf, j, f, js_by_video_by_exp, fs_by_video_by_exp = (
+          vng_evaluation.evaluate(
+              dataset,
+              job['result_path'],
+              self._run_parallel,
+              options,
+              num_workers=self._num_workers,
+              pool=self._pool,
+          )
+      )
+    return {
+        **approximate_scores,
+        'jf': jf,
+        'j': j,
+        'f': f,
+        'js_by_video_by_exp': vng_aggregation.scores_to_json(
+            js_by_video_by_exp
+        ),
+        'fs_by_video_by_exp': vng_aggregation.scores_to_json(
+            fs_by_video_by_exp
+        ),
+    }
+
+  def _evaluate_location_output(self, job: util.JsonData) -> util.JsonData:
+    questions = _get_split(self._location_output_questions, job)
+    results_paths = job.get('result_paths', [job.get('result_path')])
+    question_results_by_model = (
+        location_output_evaluation.evaluate_questions_for_models(
+            questions,
+            results_paths,
+            self._run_parallel,
+            self._pool,
+            engine=job.get('engine', 'mask'),
+            square_gt=self._location_output_square_gts[job['split']],
+            batch_size=job.get('batch_size'),
+        )
+    )
+    measures = eval_utils.FrameEvaluationResult.__annotations__.keys()
+    scores_by_model = {
+        results_path: {
+            m: float(np.mean([getattr(r, m) for r in question_results]))
+            for m in measures
+        }
+        for results_path, question_results in zip(
+            results_paths, question_results_by_model
+        )
+    }
+    if 'result_paths' in job:
+      return scores_by_model
+    return scores_by_model[job['result_path']]
+
+
+def _get_split(splits: dict[str, Any], job: util.JsonData) -> Any:
+  split = job.get('split')
+  if split not in splits:
+    raise ValueError(
+        f'Unknown split {split} for task {job.get("task")}, available: '
+        f'{sorted(splits)}'
+    )
+  return splits[split]
+
+
+def make_http_server(
+    server: EvaluationServer, host: str, port: int
+) -> http.server.HTTPServer:
+  """Create an HTTP server, which handles one request at a time."""
+
+  class Handler(http.server.BaseHTTPRequestHandler):
+    """Handles GET /splits and POST /evaluate."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+      if self.path != '/splits':
+        self._send_json(404, {'error': f'Unknown path: {self.path}'})
+        return
+      self._send_json(200, server.get_splits())
+
+    def do_POST(self):  # pylint: disable=invalid-name
+      if self.path != '/evaluate':
+        self._send_json(404, {'error': f'Unknown path: {self.path}'})
+        return
+      try:
+        length = int(self.headers.get('Content-Length', 0))
+        job = json.loads(self.rfile.read(length))
+        result = server.evaluate_job(job)
+      except Exception as e:  # pylint: disable=broad-except
+        # Report the error to the client and keep serving.
+        traceback.print_exc()
+        self._send_json(400, {'error': f'{type(e).__name__}: {e}'})
+        return
+      self._send_json(200, result)
+
+    def _send_json(self, status: int, data: util.JsonData) -> None:
+      body = json.dumps(data).encode('utf-8')
+      self.send_response(status)
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+  return http.server.HTTPServer((host, port), Handler)
+
+
+def request_evaluation(
+    job: util.JsonData, host: str = 'localhost', port: int = DEFAULT_PORT
+) -> util.JsonData:
+  """Send a job to a running server and return the scores.
+
+  Args:
+    job: the evaluation job, see the module docstring.
+    host: the host of the server.
+    port: the port of the server.
+
+  Returns:
+    The scores.
+
+  Raises:
+    urllib.error.HTTPError: if the evaluation failed. The error message of
+      the server is in the body of the error.
+  """
+  request = urllib.request.Request(
+      f'http://{host}:{port}/evaluate',
+      data=json.dumps(job).encode('utf-8'),
+      headers={'Content-Type': 'application/json'},
+  )
+  with urllib.request.urlopen(request) as response:
+    return json.loads(response.read())
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  config = util.load_json_data(_CONFIG_FLAG.value)
+  server = EvaluationServer(
+      config,
+      _PARALLEL_FLAG.value,
+      _NUM_WORKERS_FLAG.value,
+      _MASK_CACHE_BYTES_FLAG.value,
+  )
+  http_server = make_http_server(server, _HOST_FLAG.value, _PORT_FLAG.value)
+  print(
+      f'Serving {server.get_splits()} on '
+      f'http://{_HOST_FLAG.value}:{_PORT_FLAG.value}'
+  )
+  try:
+    http_server.serve_forever()
+  finally:
+    http_server.server_close()
+    server.close()
+
+
+if __name__ == '__main__':
+  app.run(main)
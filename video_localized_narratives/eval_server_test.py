@@ -0,0 +1,204 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import threading
+import urllib.error
+
+import numpy as np
+
+from video_localized_narratives import eval_server
+from video_localized_narratives.video_narrative_grounding import vng_aggregation
+from video_localized_narratives.video_narrative_grounding import vng_evaluation
+from video_localized_narratives.video_narrative_grounding import vng_test_utils
+from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import location_output_evaluation
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import location_output_test_utils
+
+from absl.testing import absltest
+
+
+class EvalServerTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    vng_folder = os.path.join(tmp_dir.name, 'vng')
+    os.makedirs(vng_folder)
+    vng_data = vng_test_utils.write_dataset(vng_folder, num_videos=4)
+    self.vng_dataset = vng_data.load_dataset()
+    self.vng_result_folder = os.path.join(vng_folder, 'results')
+    vng_test_utils.write_png_results(
+        vng_data.pred_masks, self.vng_result_folder
+    )
+    location_output_folder = os.path.join(tmp_dir.name, 'location_output')
+    os.makedirs(location_output_folder)
+    self.location_output_data = location_output_test_utils.write_dataset(
+        location_output_folder
+    )
+    config = {
+        'vng': {
+            'test': {
+                'meta_filename': vng_data.meta_filename,
+                'orig_masks_filename': vng_data.orig_masks_filename,
+                'extra_masks_filename': vng_data.extra_masks_filename,
+            }
+        },
+        'location_output': {
+            'test': {'gt_json_path': self.location_output_data.gt_json_path}
+        },
+    }
+    self.server = eval_server.EvaluationServer(
+        config, run_parallel=True, num_workers=2
+    )
+    self.addCleanup(self.server.close)
+
+  def _expected_vng_scores(self):
+    """The scores of eval_vng.py, which evaluates like this."""
+    jf, j, f, js_by_video_by_exp, fs_by_video_by_exp = vng_evaluation.evaluate(
+        self.vng_dataset, self.vng_result_folder, run_parallel=False
+    )
+    return {
+        'jf': jf,
+        'j': j,
+        'f': f,
+        'js_by_video_by_exp': vng_aggregation.scores_to_json(
+            js_by_video_by_exp
+        ),
+        'fs_by_video_by_exp': vng_aggregation.scores_to_json(
+            fs_by_video_by_exp
+        ),
+    }
+
+  def _expected_location_output_scores(self):
+    """The means of eval_location_output.py, which evaluates like this."""
+    questions = list(
+        location_output_question.iterate_location_output_questions(
+            self.location_output_data.gt_json_path
+        )
+    )
+    question_results = location_output_evaluation.evaluate_questions(
+        questions, self.location_output_data.results_folder, False
+    )
+    return {
+        m: float(np.mean([getattr(r, m) for r in question_results]))
+        for m in eval_utils.FrameEvaluationResult.__annotations__
+    }
+
+  def _vng_job(self, **kwargs):
+    return {
+        'task': 'vng',
+        'split': 'test',
+        'result_path': self.vng_result_folder,
+        **kwargs,
+    }
+
+  def _location_output_job(self, **kwargs):
+    return {
+        'task': 'location_output',
+        'split': 'test',
+        'result_path': self.location_output_data.results_folder,
+        **kwargs,
+    }
+
+  def test_scores_equal_the_command_line_evaluation(self):
+    self.assertEqual(
+        self.server.evaluate_job(self._vng_job()), self._expected_vng_scores()
+    )
+    self.assertEqual(
+        self.server.evaluate_job(self._vng_job(chunk_size=2)),
+        self._expected_vng_scores(),
+    )
+    self.assertEqual(
+        self.server.evaluate_job(self._location_output_job()),
+        self._expected_location_output_scores(),
+    )
+    self.assertEqual(
+        self.server.evaluate_job(
+            self._location_output_job(engine='box', batch_size=3)
+        ),
+        self._expected_location_output_scores(),
+    )
+
+  def test_approximate_vng_scores(self):
+    options = vng_evaluation.EvaluationOptions(max_frames_per_expression=2)
+    approximate_scores, _, _ = vng_evaluation.evaluate_approximate(
+        self.vng_dataset, self.vng_result_folder, False, options
+    )
+
+    scores = self.server.evaluate_job(
+        self._vng_job(max_frames_per_expression=2)
+    )
+
+    self.assertEqual(scores['jf'], approximate_scores.jf)
+    self.assertEqual(
+        scores['jf_standard_error'], approximate_scores.jf_standard_error
+    )
+    self.assertEqual(
+        scores['num_evaluated_frames'], approximate_scores.num_evaluated_frames
+    )
+
+  def test_malformed_jobs_do_not_break_the_pool(self):
+    malformed_jobs = [
+        {'task': 'unknown', 'split': 'test'},
+        self._vng_job(split='unknown'),
+        self._vng_job(result_path=os.path.join(self.vng_result_folder, 'x')),
+        self._location_output_job(
+            result_path=os.path.join(
+                self.location_output_data.results_folder, 'x'
+            )
+        ),
+        {'task': 'vng', 'split': 'test'},
+    ]
+    for job in malformed_jobs:
+      with self.subTest(job=job):
+        with self.assertRaises((ValueError, KeyError, FileNotFoundError)):
+          self.server.evaluate_job(job)
+
+    self.assertEqual(
+        self.server.evaluate_job(self._vng_job()), self._expected_vng_scores()
+    )
+    self.assertEqual(
+        self.server.evaluate_job(self._location_output_job()),
+        self._expected_location_output_scores(),
+    )
+
+  def test_http_server_reports_errors_and_keeps_serving(self):
+    http_server = eval_server.make_http_server(self.server, 'localhost', 0)
+    port = http_server.server_address[1]
+    thread = threading.Thread(target=http_server.serve_forever)
+    thread.start()
+    self.addCleanup(http_server.server_close)
+    self.addCleanup(thread.join)
+    self.addCleanup(http_server.shutdown)
+
+    with self.assertRaises(urllib.error.HTTPError) as error:
+      eval_server.request_evaluation(self._vng_job(split='unknown'), port=port)
+    self.assertEqual(error.exception.code, 400)
+    self.assertIn(
+        'Unknown split unknown', json.loads(error.exception.read())['error']
+    )
+
+    self.assertEqual(
+        eval_server.request_evaluation(self._vng_job(), port=port),
+        self._expected_vng_scores(),
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
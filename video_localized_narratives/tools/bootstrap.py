@@ -0,0 +1,226 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bootstrap confidence intervals and paired tests for per-item scores.
+
+The evaluations compute a score per item, e.g. whether a text-output answer is
+correct, the combined score of a location-output question or the J&F of a VNG
+expression. The reported metric is the mean over the items. Here, the mean is
+resampled to get its confidence interval, and the mean difference between two
+models on the same items is resampled for a paired test.
+
+Items of the same video are correlated, so they can be resampled as clusters:
+then whole videos are drawn with replacement, and the mean of a resample is the
+sum of the scores of the drawn videos divided by their number of items.
+
+The resampling is vectorized: each chunk of resamples draws a matrix of unit
+indices at once, and the chunks are resampled in parallel threads. Each chunk
+has its own random number generator, spawned from the seed, so the resamples do
+not depend on the number of threads. If there are few distinct units, e.g. for
+binary scores, the number of draws of each distinct unit is drawn from a
+multinomial distribution instead, which gives the same distribution of the
+means much faster.
+
+Usage example:
+  ci = bootstrap.confidence_interval(scores, clusters=video_names)
+  test = bootstrap.paired_test(scores_a, scores_b, clusters=video_names)
+"""
+
+from concurrent import futures
+import dataclasses
+from typing import Optional
+
+import numpy as np
+
+from video_localized_narratives.tools import progress
+
+
+DEFAULT_NUM_RESAMPLES = 10000
+DEFAULT_CONFIDENCE = 0.95
+
+# Above this many distinct units, the resamples draw index matrices.
+_MAX_DISTINCT_UNITS = 1000
+# The maximum number of elements of an index matrix, to bound the memory.
+_MAX_CHUNK_ELEMENTS = 1 << 22
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfidenceInterval:
+  """A mean with its percentile bootstrap confidence interval."""
+  estimate: float
+  lower: float
+  upper: float
+  standard_error: float
+
+
+@dataclasses.dataclass(frozen=True)
+class PairedTest:
+  """The mean difference between two models and its two-sided p-value."""
+  difference: ConfidenceInterval
+  p_value: float
+
+
+def resample_means(
+    scores: np.ndarray,
+    num_resamples: int = DEFAULT_NUM_RESAMPLES,
+    clusters: Optional[np.ndarray] = None,
+    seed: int = 0,
+) -> np.ndarray:
+  """Draw bootstrap resamples of the mean of the scores.
+
+  Args:
+    scores: the score of each item.
+    num_resamples: the number of resamples.
+    clusters: optionally, the cluster of each item, e.g. the video name. Then
+      the clusters are resampled instead of the items.
+    seed: the seed of the random number generator.
+
+  Returns:
+    The mean of each resample.
+  """
+  scores = np.asarray(scores, dtype=np.float64)
+  if scores.ndim != 1 or not scores.size:
+    raise ValueError('Expected a non-empty 1D array of scores.')
+  if clusters is None:
+    unit_sums = scores
+    unit_counts = np.ones_like(scores)
+  else:
+    _, cluster_indices = np.unique(np.asarray(clusters), return_inverse=True)
+    unit_sums = np.bincount(cluster_indices, weights=scores)
+    unit_counts = np.bincount(cluster_indices).astype(np.float64)
+  num_units = len(unit_sums)
+
+  distinct_units, multiplicities = np.unique(
+      np.stack([unit_sums, unit_counts], axis=1), axis=0, return_counts=True
+  )
+  if len(distinct_units) <= _MAX_DISTINCT_UNITS:
+    rng = np.random.default_rng(seed)
+    draws = rng.multinomial(
+        num_units, multiplicities / num_units, size=num_resamples
+    )
+    totals = draws @ distinct_units
+    return totals[:, 0] / totals[:, 1]
+
+  sums = np.empty(num_resamples)
+  counts = np.full(num_resamples, float(num_units))
+  is_clustered = np.any(unit_counts != 1)
+  chunk_size = max(1, _MAX_CHUNK_ELEMENTS // num_units)
+  starts = range(0, num_resamples, chunk_size)
+
+  def resample_chunk(start: int, seed_sequence: np.random.SeedSequence):
+    stop = min(start + chunk_size, num_resamples)
+    rng = np.random.default_rng(seed_sequence)
+    indices = rng.integers(0, num_units, size=(stop - start, num_units))
+    sums[start:stop] = unit_sums[indices].sum(axis=1)
+    if is_clustered:
+      counts[start:stop] = unit_counts[indices].sum(axis=1)
+
+  seed_sequences = np.random.SeedSequence(seed).spawn(len(starts))
+  num_threads = min(len(starts), progress.available_cpu_count())
+  with futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+    # Consume the results to raise exceptions of the threads.
+    list(executor.map(resample_chunk, starts, seed_sequences))
+  return sums / counts
+
+
+def confidence_interval(
+    scores: np.ndarray,
+    num_resamples: int = DEFAULT_NUM_RESAMPLES,
+    confidence: float = DEFAULT_CONFIDENCE,
+    clusters: Optional[np.ndarray] = None,
+    seed: int = 0,
+) -> ConfidenceInterval:
+  """The percentile bootstrap confidence interval of the mean score.
+
+  Args:
+    scores: the score of each item.
+    num_resamples: the number of resamples.
+    confidence: the confidence level, e.g. 0.95.
+    clusters: optionally, the cluster of each item, see resample_means.
+    seed: the seed of the random number generator.
+
+  Returns:
+    The mean score with its confidence interval.
+  """
+  means = resample_means(scores, num_resamples, clusters, seed)
+  return _interval(float(np.mean(scores)), means, confidence)
+
+
+def paired_test(
+    scores_a: np.ndarray,
+    scores_b: np.ndarray,
+    num_resamples: int = DEFAULT_NUM_RESAMPLES,
+    confidence: float = DEFAULT_CONFIDENCE,
+    clusters: Optional[np.ndarray] = None,
+    seed: int = 0,
+) -> PairedTest:
+  """Test whether two models have a different mean score on the same items.
+
+  Args:
+    scores_a: the score of each item for model a.
+    scores_b: the score of each item for model b, in the same order.
+    num_resamples: the number of resamples.
+    confidence: the confidence level of the interval of the difference.
+    clusters: optionally, the cluster of each item, see resample_means.
+    seed: the seed of the random number generator.
+
+  Returns:
+    The mean difference a - b with its confidence interval, and the p-value of
+    the null hypothesis that the mean difference is zero.
+  """
+  differences = np.asarray(scores_a, dtype=np.float64) - np.asarray(
+      scores_b, dtype=np.float64
+  )
+  means = resample_means(differences, num_resamples, clusters, seed)
+  estimate = float(np.mean(differences))
+  # The resampled differences are centered on the estimate to approximate
+  # their distribution under the null hypothesis.
+  num_extreme = np.count_nonzero(
+      np.abs(means - estimate) >= abs(estimate) - 1e-12
+  )
+  return PairedTest(
+      difference=_interval(estimate, means, confidence),
+      p_value=(1 + num_extreme) / (1 + num_resamples),
+  )
+
+
+def format_confidence_interval(
+    ci: ConfidenceInterval, confidence: float = DEFAULT_CONFIDENCE
+) -> str:
+  return (
+      f'{ci.estimate:.4f} ({confidence:.0%} CI [{ci.lower:.4f}, '
+      f'{ci.upper:.4f}], standard error {ci.standard_error:.4f})'
+  )
+
+
+def format_paired_test(
+    test: PairedTest, confidence: float = DEFAULT_CONFIDENCE
+) -> str:
+  return (
+      f'difference {format_confidence_interval(test.difference, confidence)}, '
+      f'p={test.p_value:.4f}'
+  )
+
+
+def _interval(
+    estimate: float, means: np.ndarray, confidence: float
+) -> ConfidenceInterval:
+  alpha = 1 - confidence
+  lower, upper = np.quantile(means, [alpha / 2, 1 - alpha / 2])
+  return ConfidenceInterval(
+      estimate=estimate,
+      lower=float(lower),
+      upper=float(upper),
+      standard_error=float(np.std(means, ddof=1)),
+  )
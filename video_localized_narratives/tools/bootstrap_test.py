@@ -0,0 +1,113 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest import mock
+
+import numpy as np
+
+from video_localized_narratives.tools import bootstrap
+
+from absl.testing import absltest
+
+
+class BootstrapTest(absltest.TestCase):
+
+  def test_confidence_interval_contains_mean(self):
+    rng = np.random.default_rng(1)
+    scores = rng.random(500)
+
+    ci = bootstrap.confidence_interval(scores, num_resamples=2000)
+
+    self.assertEqual(ci.estimate, float(np.mean(scores)))
+    self.assertLess(ci.lower, ci.estimate)
+    self.assertGreater(ci.upper, ci.estimate)
+    # The standard error of the mean of uniform scores.
+    self.assertAlmostEqual(
+        ci.standard_error, np.sqrt(1 / 12 / len(scores)), delta=0.002
+    )
+
+  def test_resample_paths_agree(self):
+    rng = np.random.default_rng(2)
+    # Binary scores take the multinomial path, continuous ones index matrices.
+    binary_scores = (rng.random(2000) < 0.3).astype(np.float64)
+    continuous_scores = binary_scores + rng.normal(scale=1e-6, size=2000)
+
+    binary_means = bootstrap.resample_means(binary_scores, 4000)
+    continuous_means = bootstrap.resample_means(continuous_scores, 4000)
+
+    self.assertAlmostEqual(
+        np.mean(binary_means), np.mean(continuous_means), delta=0.002
+    )
+    self.assertAlmostEqual(
+        np.std(binary_means), np.std(continuous_means), delta=0.001
+    )
+
+  def test_resamples_do_not_depend_on_the_number_of_threads(self):
+    scores = np.random.default_rng(5).random(2000)
+
+    means_by_num_threads = {}
+    # Small chunks, so that there are many of them.
+    with mock.patch.object(bootstrap, '_MAX_CHUNK_ELEMENTS', 5000):
+      for num_threads in (1, 4):
+        with mock.patch.object(
+            bootstrap.progress, 'available_cpu_count', return_value=num_threads
+        ):
+          means_by_num_threads[num_threads] = bootstrap.resample_means(
+              scores, 1000, seed=7
+          )
+
+    np.testing.assert_array_equal(
+        means_by_num_threads[1], means_by_num_threads[4]
+    )
+    self.assertLen(np.unique(means_by_num_threads[1]), 1000)
+
+  def test_clusters(self):
+    # All items of a cluster have the same score, so resampling the items
+    # underestimates the standard error compared to resampling the clusters.
+    rng = np.random.default_rng(3)
+    cluster_scores = rng.random(50)
+    clusters = np.repeat(np.arange(50), 20)
+    scores = cluster_scores[clusters]
+
+    items_ci = bootstrap.confidence_interval(scores, 2000)
+    clusters_ci = bootstrap.confidence_interval(scores, 2000, clusters=clusters)
+
+    self.assertEqual(clusters_ci.estimate, items_ci.estimate)
+    self.assertAlmostEqual(
+        clusters_ci.standard_error,
+        np.std(cluster_scores) / np.sqrt(50),
+        delta=0.005,
+    )
+    self.assertGreater(
+        clusters_ci.standard_error, 3 * items_ci.standard_error
+    )
+
+  def test_paired_test(self):
+    rng = np.random.default_rng(4)
+    scores = rng.random(300)
+
+    same = bootstrap.paired_test(scores, scores, num_resamples=1000)
+    better = bootstrap.paired_test(scores + 0.1, scores, num_resamples=1000)
+
+    self.assertEqual(same.p_value, 1.0)
+    self.assertAlmostEqual(better.difference.estimate, 0.1)
+    self.assertEqual(better.p_value, 1 / 1001)
+
+  def test_empty_scores(self):
+    with self.assertRaises(ValueError):
+      bootstrap.confidence_interval(np.array([]))
+
+
+if __name__ == '__main__':
+  absltest.main()
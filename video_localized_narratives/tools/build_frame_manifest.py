@@ -0,0 +1,89 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Build the frame manifest for the frames of a dataset.
+
+See frame_manifest.py for details.
+"""
+
+from collections.abc import Sequence
+from concurrent import futures
+import os
+
+from absl import app
+from absl import flags
+
+from video_localized_narratives.tools import frame_manifest
+from video_localized_narratives.tools import packed_frames
+from video_localized_narratives.tools import util
+
+
+_FRAMES_PATH_FLAG = flags.DEFINE_string(
+    'frames_path',
+    default=None,
+    required=True,
+    help='The path to the frames of a dataset, e.g. "data/frames/OVIS_train/"',
+)
+_NUM_THREADS_FLAG = flags.DEFINE_integer(
+    'num_threads',
+    default=32,
+    help='The number of video folders which are listed in parallel.',
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  frames_path = _FRAMES_PATH_FLAG.value
+  entries = build_manifest_entries(frames_path, _NUM_THREADS_FLAG.value)
+  frame_manifest.write_manifest(frames_path, entries)
+  print(f'Wrote manifest for {len(entries)} videos to {frames_path}')
+
+
+def build_manifest_entries(
+    frames_path: str, num_threads: int
+) -> dict[str, frame_manifest.VideoEntry]:
+  video_names = sorted(e.name for e in os.scandir(frames_path) if e.is_dir())
+  video_folders = [os.path.join(frames_path, n) for n in video_names]
+  with futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+    entries = executor.map(_build_video_entry, video_folders)
+    return dict(zip(video_names, entries))
+
+
+def _build_video_entry(video_folder: str) -> frame_manifest.VideoEntry:
+  """List a video folder once, with the same semantics as get_all_frames."""
+  jpg_stems = []
+  png_stems = []
+  is_packed = False
+  with os.scandir(video_folder) as it:
+    for entry in it:
+      stem, ext = os.path.splitext(entry.name)
+      if ext == '.jpg':
+        jpg_stems.append(stem)
+      elif ext == '.png':
+        png_stems.append(stem)
+      elif entry.name == packed_frames.PACKED_INDEX_FILENAME:
+        is_packed = True
+  is_jpg = bool(jpg_stems)
+  stems = jpg_stems if is_jpg else png_stems
+  return frame_manifest.VideoEntry(
+      names=tuple(sorted(stems, key=util.frame_number_from_filename)),
+      is_jpg=is_jpg,
+      is_packed=is_packed,
+  )
+
+
+if __name__ == '__main__':
+  app.run(main)
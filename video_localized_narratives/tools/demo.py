@@ -24,6 +24,7 @@ from absl import app
 
 from video_localized_narratives.tools import actor_narrative
 from video_localized_narratives.tools import frame
+from video_localized_narratives.tools import frame_cache
 from video_localized_narratives.tools import vidln_dataset
 from video_localized_narratives.tools import mouse_trace
 from video_localized_narratives.tools import vidln
@@ -34,6 +35,8 @@ JSONL_PATH = 'data/vidlns/OVIS_train_sample.jsonl'
 FRAMES_PATH = 'data/frames/OVIS_train/'
 
 N_VIDEOS = 2
+# The keyframes are shown once for every word, so we cache the decoded frames.
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
 # This list is not exhaustive. For these words we usually do not want to process
 # or show the mouse trace.
 STOP_WORDS = [
@@ -109,6 +112,7 @@ def main(argv: Sequence[str]) -> None:
   if len(argv) > 1:
     raise app.UsageError('Too many command-line arguments.')
 
+  frame_cache.configure_default_cache(FRAME_CACHE_BYTES, read_only=True)
   dataset = vidln_dataset.VideoLocalizedNarrativeDataset(
       JSONL_PATH, FRAMES_PATH)
   for vln in itertools.islice(dataset, N_VIDEOS):
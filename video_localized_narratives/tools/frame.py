@@ -21,6 +21,9 @@ from typing import Optional
 import numpy as np
 import PIL.Image
 
+from video_localized_narratives.tools import frame_cache
+from video_localized_narratives.tools import frame_manifest
+
 
 @dataclasses.dataclass(frozen=True)
 class Frame:
@@ -36,12 +39,27 @@ class Frame:
     return os.path.join(self.root_folder, self.name)
 
   def load(self) -> np.ndarray:
-    """Loads the frame as an np.ndarray. Works both for jpg and png."""
+    """Loads the frame as an np.ndarray. Works both for jpg and png.
+
+    If the process-wide frame cache is enabled (see
+    frame_cache.configure_default_cache), the decoded frame is taken from or
+    added to the cache.
+    """
+    return frame_cache.get_default_cache().get_or_load(self, self._decode)
+
+  def _decode(self) -> np.ndarray:
     assert self.root_folder is not None
     base = os.path.join(self.root_folder, self.name)
 
-    if self.is_jpg is not None:
-      if self.is_jpg:
+    is_jpg = self.is_jpg
+    if is_jpg is None:
+      # Avoid probing for the file extension if the frame manifest exists.
+      manifest_entry = frame_manifest.lookup(self.root_folder)
+      if manifest_entry is not None:
+        is_jpg = manifest_entry.is_jpg
+
+    if is_jpg is not None:
+      if is_jpg:
         return load_img(base + '.jpg')
       else:
         return load_img(base + '.png')
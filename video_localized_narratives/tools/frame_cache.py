@@ -0,0 +1,127 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A least-recently-used cache for decoded frames with a memory budget."""
+
+import collections
+import dataclasses
+import threading
+from typing import Callable, Hashable
+
+import numpy as np
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheStats:
+  hits: int
+  misses: int
+  evictions: int
+  num_entries: int
+  num_bytes: int
+  max_bytes: int
+
+
+class FrameCache:
+  """A thread-safe LRU cache for decoded images, bounded by a byte budget.
+
+  If read_only is True, the cached arrays are marked as read-only and returned
+  without copying. Otherwise each lookup returns a copy, so that callers can
+  modify the returned array without changing the cached one.
+
+  A cache with max_bytes=0 is disabled and always calls the load function.
+  """
+
+  def __init__(self, max_bytes: int, read_only: bool = False):
+    if max_bytes < 0:
+      raise ValueError(f'Invalid cache size: {max_bytes}')
+    self._max_bytes = max_bytes
+    self._read_only = read_only
+    self._entries: collections.OrderedDict[Hashable, np.ndarray] = (
+        collections.OrderedDict()
+    )
+    self._num_bytes = 0
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
+    self._lock = threading.Lock()
+
+  def get_or_load(
+      self, key: Hashable, load_fn: Callable[[], np.ndarray]
+  ) -> np.ndarray:
+    """Return the cached array for key or load it with load_fn and cache it."""
+    if self._max_bytes == 0:
+      return load_fn()
+
+    with self._lock:
+      arr = self._entries.get(key)
+      if arr is not None:
+        self._entries.move_to_end(key)
+        self._hits += 1
+      else:
+        self._misses += 1
+    if arr is not None:
+      return arr if self._read_only else arr.copy()
+
+    # Decode outside of the lock, so that other threads are not blocked.
+    arr = load_fn()
+    if self._read_only:
+      arr.setflags(write=False)
+      result = arr
+    else:
+      result = arr.copy()
+    self._insert(key, arr)
+    return result
+
+  def _insert(self, key: Hashable, arr: np.ndarray) -> None:
+    if arr.nbytes > self._max_bytes:
+      return
+    with self._lock:
+      if key in self._entries:
+        return
+      self._entries[key] = arr
+      self._num_bytes += arr.nbytes
+      while self._num_bytes > self._max_bytes:
+        _, evicted = self._entries.popitem(last=False)
+        self._num_bytes -= evicted.nbytes
+        self._evictions += 1
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+      self._num_bytes = 0
+
+  def get_stats(self) -> CacheStats:
+    with self._lock:
+      return CacheStats(
+          hits=self._hits,
+          misses=self._misses,
+          evictions=self._evictions,
+          num_entries=len(self._entries),
+          num_bytes=self._num_bytes,
+          max_bytes=self._max_bytes,
+      )
+
+
+# The process-wide cache used by frame.Frame.load. It is disabled by default.
+_default_cache = FrameCache(max_bytes=0)
+
+
+def get_default_cache() -> FrameCache:
+  return _default_cache
+
+
+def configure_default_cache(max_bytes: int, read_only: bool = False) -> None:
+  """Replace the process-wide frame cache with a cache of the given size."""
+  global _default_cache
+  _default_cache = FrameCache(max_bytes, read_only)
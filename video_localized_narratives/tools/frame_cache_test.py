@@ -0,0 +1,74 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from video_localized_narratives.tools import frame_cache
+
+from absl.testing import absltest
+
+
+class FrameCacheTest(absltest.TestCase):
+
+  def test_disabled_cache_always_loads(self):
+    cache = frame_cache.FrameCache(max_bytes=0)
+    loads = []
+
+    for _ in range(3):
+      cache.get_or_load('a', lambda: loads.append(1) or np.zeros(4))
+
+    self.assertLen(loads, 3)
+    self.assertEqual(cache.get_stats().num_entries, 0)
+
+  def test_hits_return_copies_unless_read_only(self):
+    cache = frame_cache.FrameCache(max_bytes=100)
+    first = cache.get_or_load('a', lambda: np.zeros(4, dtype=np.uint8))
+    first[0] = 42
+    second = cache.get_or_load('a', lambda: np.ones(4, dtype=np.uint8))
+
+    np.testing.assert_array_equal(second, np.zeros(4, dtype=np.uint8))
+
+    read_only_cache = frame_cache.FrameCache(max_bytes=100, read_only=True)
+    first = read_only_cache.get_or_load('a', lambda: np.zeros(4))
+    second = read_only_cache.get_or_load('a', lambda: np.ones(4))
+
+    self.assertIs(first, second)
+    self.assertFalse(first.flags.writeable)
+
+  def test_evicts_least_recently_used_entries(self):
+    cache = frame_cache.FrameCache(max_bytes=20)
+    for key in 'abc':
+      cache.get_or_load(key, lambda: np.zeros(8, dtype=np.uint8))
+    # Touching 'b' makes 'c' the least recently used entry after 'a' is gone.
+    cache.get_or_load('b', lambda: np.ones(8, dtype=np.uint8))
+    cache.get_or_load('d', lambda: np.zeros(8, dtype=np.uint8))
+
+    stats = cache.get_stats()
+    self.assertEqual(stats.num_entries, 2)
+    self.assertEqual(stats.num_bytes, 16)
+    self.assertEqual(stats.evictions, 2)
+    self.assertEqual(stats.hits, 1)
+    self.assertEqual(stats.misses, 4)
+    loaded = cache.get_or_load('c', lambda: np.ones(8, dtype=np.uint8))
+    np.testing.assert_array_equal(loaded, np.ones(8, dtype=np.uint8))
+
+  def test_does_not_cache_arrays_larger_than_budget(self):
+    cache = frame_cache.FrameCache(max_bytes=4)
+    cache.get_or_load('a', lambda: np.zeros(8, dtype=np.uint8))
+
+    self.assertEqual(cache.get_stats().num_entries, 0)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,106 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A per-dataset manifest of the frame files of all videos.
+
+The manifest is stored as MANIFEST_FILENAME in the frames folder of a dataset,
+e.g. data/frames/OVIS_train/frame_manifest.json, and is created with
+build_frame_manifest.py. If it exists, the frames of a video are looked up in
+the manifest instead of listing the video folder and probing for file
+extensions, which is slow on network filesystems.
+
+The manifest of a dataset is read once per process, and if there is none, this
+is remembered as well, so that looking up frames does not touch the filesystem.
+A manifest which is written by another process is only read after calling
+reload_manifests. If frames are added or removed, or if videos are packed (see
+pack_frames.py), the manifest has to be rebuilt. Until then, util.get_all_frames
+checks whether videos which the manifest lists as packed still have their
+packed frames.
+"""
+
+import dataclasses
+import functools
+import json
+import os
+from typing import Optional
+
+
+MANIFEST_FILENAME = 'frame_manifest.json'
+
+
+@dataclasses.dataclass(frozen=True)
+class VideoEntry:
+  """The frames of one video, sorted by frame number."""
+
+  names: tuple[str, ...]
+  is_jpg: bool
+  is_packed: bool = False
+
+
+def lookup(video_folder: str) -> Optional[VideoEntry]:
+  """Return the manifest entry for the video or None if there is none."""
+  dataset_folder, video_name = os.path.split(os.path.normpath(video_folder))
+  manifest = load_manifest(dataset_folder)
+  if manifest is None:
+    return None
+  return manifest.get(video_name)
+
+
+@functools.lru_cache(maxsize=None)
+def load_manifest(dataset_folder: str) -> Optional[dict[str, VideoEntry]]:
+  """Load the manifest of the dataset or return None if there is none.
+
+  The result is cached for the life of the process, see reload_manifests.
+
+  Args:
+    dataset_folder: the frames folder of the dataset.
+
+  Returns:
+    The manifest entries by video name, or None.
+  """
+  filename = os.path.join(dataset_folder, MANIFEST_FILENAME)
+  try:
+    with open(filename) as f:
+      data = json.load(f)
+  except FileNotFoundError:
+    return None
+  return {
+      video_name: VideoEntry(
+          names=tuple(entry['names']),
+          is_jpg=entry['is_jpg'],
+          is_packed=entry['is_packed'],
+      )
+      for video_name, entry in data['videos'].items()
+  }
+
+
+def reload_manifests() -> None:
+  """Read the manifests again the next time they are used."""
+  load_manifest.cache_clear()
+
+
+def write_manifest(
+    dataset_folder: str, entries_by_video_name: dict[str, VideoEntry]
+) -> None:
+  data = {
+      'videos': {
+          video_name: dataclasses.asdict(entry)
+          for video_name, entry in sorted(entries_by_video_name.items())
+      }
+  }
+  filename = os.path.join(dataset_folder, MANIFEST_FILENAME)
+  with open(filename + '.tmp', 'w') as f:
+    json.dump(data, f)
+  os.replace(filename + '.tmp', filename)
+  reload_manifests()
@@ -0,0 +1,134 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import builtins
+import json
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+import PIL.Image
+
+from video_localized_narratives.tools import build_frame_manifest
+from video_localized_narratives.tools import frame_manifest
+from video_localized_narratives.tools import packed_frames
+from video_localized_narratives.tools import util
+
+from absl.testing import absltest
+
+
+def _write_frames(video_folder, frame_numbers):
+  os.makedirs(video_folder)
+  for frame_number in frame_numbers:
+    img = np.full((8, 8, 3), frame_number, dtype=np.uint8)
+    PIL.Image.fromarray(img).save(
+        os.path.join(video_folder, f'{frame_number}.png')
+    )
+
+
+def _build_manifest(dataset_folder):
+  frame_manifest.write_manifest(
+      dataset_folder,
+      build_frame_manifest.build_manifest_entries(
+          dataset_folder, num_threads=2
+      ),
+  )
+
+
+class FrameManifestTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    self.dataset_folder = tmp_dir.name
+    self.addCleanup(frame_manifest.reload_manifests)
+    self.video_folder = os.path.join(self.dataset_folder, 'video')
+    # Frame 10 sorts before frame 2 by name, but not by frame number.
+    _write_frames(self.video_folder, [0, 1, 2, 10])
+
+  def test_manifest_lists_the_same_frames_as_the_folder(self):
+    self.assertIsNone(frame_manifest.lookup(self.video_folder))
+    frames = util.get_all_frames(self.video_folder)
+
+    _build_manifest(self.dataset_folder)
+    entry = frame_manifest.lookup(self.video_folder)
+
+    self.assertEqual(entry.names, ('0', '1', '2', '10'))
+    self.assertFalse(entry.is_jpg)
+    self.assertFalse(entry.is_packed)
+    self.assertEqual(util.get_all_frames(self.video_folder), frames)
+    self.assertIsNone(
+        frame_manifest.lookup(os.path.join(self.dataset_folder, 'missing'))
+    )
+
+  def test_manifest_is_read_again_only_after_reloading(self):
+    _build_manifest(self.dataset_folder)
+    self.assertLen(frame_manifest.lookup(self.video_folder).names, 4)
+    manifest_filename = os.path.join(
+        self.dataset_folder, frame_manifest.MANIFEST_FILENAME
+    )
+    with open(manifest_filename) as f:
+      data = json.load(f)
+    data['videos']['video']['names'] = ['0', '1']
+    # Write the file directly like another process, which does not reload the
+    # manifests of this process.
+    with open(manifest_filename, 'w') as f:
+      json.dump(data, f)
+
+    self.assertLen(frame_manifest.lookup(self.video_folder).names, 4)
+    frame_manifest.reload_manifests()
+    self.assertEqual(frame_manifest.lookup(self.video_folder).names, ('0', '1'))
+
+  def test_lookups_do_not_access_the_filesystem(self):
+    self.assertIsNone(frame_manifest.lookup(self.video_folder))
+    with mock.patch.object(os.path, 'getmtime') as getmtime, mock.patch.object(
+        builtins, 'open'
+    ) as open_:
+      self.assertIsNone(frame_manifest.lookup(self.video_folder))
+    getmtime.assert_not_called()
+    open_.assert_not_called()
+
+    _build_manifest(self.dataset_folder)
+    self.assertLen(frame_manifest.lookup(self.video_folder).names, 4)
+    os.remove(
+        os.path.join(self.dataset_folder, frame_manifest.MANIFEST_FILENAME)
+    )
+    self.assertLen(frame_manifest.lookup(self.video_folder).names, 4)
+
+  def test_stale_packed_entry_falls_back_to_the_frame_files(self):
+    packed_frames.write_packed_frames(
+        self.video_folder, util.get_all_frame_files(self.video_folder)
+    )
+    _build_manifest(self.dataset_folder)
+    self.assertTrue(frame_manifest.lookup(self.video_folder).is_packed)
+    frames = util.get_all_frames(self.video_folder)
+    self.assertIsInstance(frames[0], packed_frames.PackedFrame)
+
+    for filename in (
+        packed_frames.PACKED_FRAMES_FILENAME,
+        packed_frames.PACKED_INDEX_FILENAME,
+    ):
+      os.remove(os.path.join(self.video_folder, filename))
+    frames = util.get_all_frames(self.video_folder)
+
+    self.assertEqual([f.name for f in frames], ['0', '1', '2', '10'])
+    for f in frames:
+      self.assertNotIsInstance(f, packed_frames.PackedFrame)
+    self.assertEqual([int(f.load()[0, 0, 0]) for f in frames], [0, 1, 2, 10])
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,178 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Opt-in timers and counters for finding the bottlenecks of the evaluations.
+
+Usage example:
+  instrumentation.enable()
+  with instrumentation.phase('decode_png'):
+    img = load(...)
+  instrumentation.count('pixels', img.size)
+  print(instrumentation.format_report(instrumentation.get_stats(), wall_time))
+
+Instrumentation is disabled by default. Then phase() returns a shared no-op
+context manager and count() returns immediately, so the calls can stay in the
+code.
+
+The stats of a process are plain json data. Worker processes return them with
+pop_stats() together with their results, and the main process adds them to its
+own stats with add_stats().
+"""
+
+import json
+import threading
+import time
+from typing import Any, ContextManager, Optional
+
+
+Stats = dict[str, Any]
+
+_enabled = False
+_lock = threading.Lock()
+# Phase name -> [number of calls, total seconds].
+_phases: dict[str, list[float]] = {}
+# Counter name -> total value.
+_counters: dict[str, float] = {}
+
+
+class _NoOpPhase:
+
+  def __enter__(self) -> None:
+    return None
+
+  def __exit__(self, *exc_info) -> None:
+    return None
+
+
+_NO_OP_PHASE = _NoOpPhase()
+
+
+class _Phase:
+  """Adds the time spent inside the with statement to the phase."""
+
+  def __init__(self, name: str):
+    self._name = name
+    self._start = 0.0
+
+  def __enter__(self) -> None:
+    self._start = time.perf_counter()
+
+  def __exit__(self, *exc_info) -> None:
+    seconds = time.perf_counter() - self._start
+    with _lock:
+      stats = _phases.setdefault(self._name, [0, 0.0])
+      stats[0] += 1
+      stats[1] += seconds
+
+
+def enable(enabled: bool = True) -> None:
+  global _enabled
+  _enabled = enabled
+
+
+def is_enabled() -> bool:
+  return _enabled
+
+
+def phase(name: str) -> ContextManager[None]:
+  """Time the code inside the with statement as the given phase."""
+  if not _enabled:
+    return _NO_OP_PHASE
+  return _Phase(name)
+
+
+def count(name: str, value: float = 1) -> None:
+  if not _enabled:
+    return
+  with _lock:
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def get_stats() -> Stats:
+  with _lock:
+    return {
+        'phases': {
+            name: {'calls': calls, 'seconds': seconds}
+            for name, (calls, seconds) in _phases.items()
+        },
+        'counters': dict(_counters),
+    }
+
+
+def pop_stats() -> Optional[Stats]:
+  """Return and reset the stats of this process, or None if disabled."""
+  if not _enabled:
+    return None
+  stats = get_stats()
+  reset()
+  return stats
+
+
+def add_stats(stats: Optional[Stats]) -> None:
+  """Add the stats of another process, e.g. returned by a pool worker."""
+  if stats is None:
+    return
+  with _lock:
+    for name, phase_stats in stats['phases'].items():
+      own = _phases.setdefault(name, [0, 0.0])
+      own[0] += phase_stats['calls']
+      own[1] += phase_stats['seconds']
+    for name, value in stats['counters'].items():
+      _counters[name] = _counters.get(name, 0) + value
+
+
+def reset() -> None:
+  with _lock:
+    _phases.clear()
+    _counters.clear()
+
+
+def format_report(stats: Stats, wall_seconds: float) -> str:
+  """Format the stats as a table.
+
+  Args:
+    stats: the stats, e.g. from get_stats().
+    wall_seconds: the wall time of the whole run, for the throughput.
+
+  Returns:
+    The table. The phase times are summed over all processes, so their total
+    can exceed the wall time.
+  """
+  phases = stats['phases']
+  total_seconds = sum(p['seconds'] for p in phases.values())
+  lines = [
+      f'{"Phase":<24} {"Calls":>10} {"Total [s]":>11} {"Mean [ms]":>11} '
+      f'{"Share":>7}'
+  ]
+  for name, p in sorted(phases.items(), key=lambda item: -item[1]['seconds']):
+    mean_ms = 1000 * p['seconds'] / p['calls'] if p['calls'] else 0.0
+    share = p['seconds'] / total_seconds if total_seconds else 0.0
+    lines.append(
+        f'{name:<24} {p["calls"]:>10} {p["seconds"]:>11.3f} {mean_ms:>11.3f} '
+        f'{share:>7.1%}'
+    )
+  lines.append('')
+  lines.append(f'{"Counter":<24} {"Total":>16} {"Per second":>16}')
+  for name, value in sorted(stats['counters'].items()):
+    per_second = value / wall_seconds if wall_seconds > 0 else 0.0
+    lines.append(f'{name:<24} {value:>16.0f} {per_second:>16.1f}')
+  lines.append(f'Wall time: {wall_seconds:.3f} s')
+  return '\n'.join(lines)
+
+
+def write_report_json(
+    filename: str, stats: Stats, wall_seconds: float
+) -> None:
+  with open(filename, 'w') as f:
+    json.dump({'wall_seconds': wall_seconds, **stats}, f, indent=2)
@@ -0,0 +1,60 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from video_localized_narratives.tools import instrumentation
+
+from absl.testing import absltest
+
+
+class InstrumentationTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    instrumentation.reset()
+    self.addCleanup(instrumentation.reset)
+    self.addCleanup(instrumentation.enable, False)
+
+  def test_disabled_records_nothing(self):
+    with instrumentation.phase('decode'):
+      instrumentation.count('frames', 3)
+
+    self.assertIsNone(instrumentation.pop_stats())
+    self.assertEqual(
+        instrumentation.get_stats(), {'phases': {}, 'counters': {}}
+    )
+
+  def test_stats_of_workers_are_added(self):
+    instrumentation.enable()
+    with instrumentation.phase('decode'):
+      instrumentation.count('frames', 3)
+    worker_stats = instrumentation.pop_stats()
+    self.assertEqual(
+        instrumentation.get_stats(), {'phases': {}, 'counters': {}}
+    )
+
+    with instrumentation.phase('decode'):
+      instrumentation.count('frames', 2)
+    instrumentation.add_stats(worker_stats)
+
+    stats = instrumentation.get_stats()
+    self.assertEqual(stats['phases']['decode']['calls'], 2)
+    self.assertGreaterEqual(stats['phases']['decode']['seconds'], 0.0)
+    self.assertEqual(stats['counters'], {'frames': 5})
+    report = instrumentation.format_report(stats, wall_seconds=1.0)
+    self.assertIn('decode', report)
+    self.assertIn('frames', report)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -14,6 +14,7 @@
 
 """A mouse trace of a Video Localized Narrative."""
 
+from collections.abc import Sequence
 from typing import Optional
 
 import matplotlib.pyplot as plt
@@ -111,6 +112,20 @@ class SingleFrameMouseTrace(MouseTrace):
         self._raw_data['traces'], height, width, trace_line_width_pixels
     )
 
+  def as_masks(
+      self,
+      trace_line_widths_pixels: Sequence[int],
+      height: Optional[int] = None,
+      width: Optional[int] = None,
+  ) -> dict[int, np.ndarray]:
+    """Masks for several trace line widths, rendering the trace at most once."""
+    if height is None or width is None:
+      img = self._keyframe.load()
+      height, width, _ = img.shape
+    return mouse_trace_to_mask.raw_trace_to_masks(
+        self._raw_data['traces'], height, width, trace_line_widths_pixels
+    )
+
   def as_overlaid_image(
       self, trace_line_width_pixels: int = DEFAULT_TRACE_WIDTH
   ) -> np.ndarray:
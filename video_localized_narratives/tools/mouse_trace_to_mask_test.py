@@ -59,6 +59,11 @@ class MouseTraceToMaskTest(parameterized.TestCase):
     expected[py, px0 : px1 + 1] = 1
     self.assertTrue((mask == expected).all())
 
+    packed = mouse_trace_to_mask.raw_trace_to_packed_mask(
+        trace, height=height, width=width, trace_line_width_pixels=1
+    )
+    np.testing.assert_array_equal(packed.to_dense(), expected)
+
   @parameterized.named_parameters(
       ('line_width_1', 1),
       ('line_width_2', 2),
@@ -98,6 +103,104 @@ class MouseTraceToMaskTest(parameterized.TestCase):
     ] = 1
     self.assertTrue((mask == expected).all())
 
+  def test_trace_to_masks_for_empty_trace(self):
+    trace: Trace = []
+    masks = mouse_trace_to_mask.raw_trace_to_masks(
+        trace, height=48, width=64, trace_line_widths_pixels=[1, 2, 3]
+    )
+
+    self.assertEqual(set(masks), {1, 2, 3})
+    for mask in masks.values():
+      self.assertEqual(mask.shape, (48, 64))
+      self.assertFalse(mask.any())
+
+  def test_trace_to_masks_matches_single_width_rendering(self):
+    height = 480
+    width = 640
+    trace_el0 = _make_trace_element(
+        x_absolute=100, y_absolute=200, width=width, height=height, time=42
+    )
+    trace_el1 = _make_trace_element(
+        x_absolute=300, y_absolute=200, width=width, height=height, time=43
+    )
+    trace_el2 = _make_trace_element(
+        x_absolute=400, y_absolute=50, width=width, height=height, time=44
+    )
+    trace_el3 = _make_trace_element(
+        x_absolute=400, y_absolute=300, width=width, height=height, time=45
+    )
+    trace: Trace = [[trace_el0, trace_el1], [trace_el2, trace_el3]]
+    line_widths = [1, 2, 3, 4, 5, 6, 7]
+
+    masks = mouse_trace_to_mask.raw_trace_to_masks(
+        trace, height=height, width=width, trace_line_widths_pixels=line_widths
+    )
+
+    for line_width_px in line_widths:
+      expected = mouse_trace_to_mask.raw_trace_to_mask(
+          trace,
+          height=height,
+          width=width,
+          trace_line_width_pixels=line_width_px,
+      )
+      # Horizontal and vertical lines are the same, apart from a few pixels at
+      # the corners of the round caps of wide lines.
+      self.assertLessEqual(
+          np.count_nonzero(masks[line_width_px] != expected),
+          0.005 * expected.sum(),
+      )
+
+  def test_trace_to_masks_for_diagonal_and_joined_strokes(self):
+    height = 240
+    width = 320
+    diagonal = [
+        _make_trace_element(
+            x_absolute=20, y_absolute=20, width=width, height=height, time=0
+        ),
+        _make_trace_element(
+            x_absolute=120, y_absolute=120, width=width, height=height, time=1
+        ),
+    ]
+    zigzag = [
+        _make_trace_element(
+            x_absolute=x, y_absolute=y, width=width, height=height, time=t
+        )
+        for t, (x, y) in enumerate(
+            [(30, 200), (80, 40), (140, 210), (200, 60), (300, 180)]
+        )
+    ]
+    # Mouse traces can leave the image.
+    leaving = [
+        _make_trace_element(
+            x_absolute=x, y_absolute=y, width=width, height=height, time=t
+        )
+        for t, (x, y) in enumerate([(250, 100), (310, 20), (340, -15)])
+    ]
+    line_widths = [1, 2, 3, 4, 5, 6, 7]
+
+    for trace in [[diagonal], [zigzag], [diagonal, zigzag], [leaving]]:
+      masks = mouse_trace_to_mask.raw_trace_to_masks(
+          trace,
+          height=height,
+          width=width,
+          trace_line_widths_pixels=line_widths,
+      )
+      for line_width_px in line_widths:
+        expected = mouse_trace_to_mask.raw_trace_to_mask(
+            trace,
+            height=height,
+            width=width,
+            trace_line_width_pixels=line_width_px,
+        )
+        if line_width_px == mouse_trace_to_mask.DEFAULT_TRACE_LINE_WIDTH_PIXELS:
+          np.testing.assert_array_equal(masks[line_width_px], expected)
+          continue
+        # Only pixels at the outline of the lines can differ.
+        added = np.count_nonzero(masks[line_width_px] & ~expected)
+        missed = np.count_nonzero(expected & ~masks[line_width_px])
+        self.assertLessEqual(added, 0.03 * expected.sum())
+        self.assertLessEqual(missed, 0.03 * expected.sum())
+
   def test_traces_as_masks_for_diagonal_line_width_1(self):
     height = 540
     width = 960
@@ -0,0 +1,67 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pack the frames of each video of a dataset into a memory-mapped file.
+
+Afterwards, util.get_all_frames returns packed_frames.PackedFrame objects for
+this dataset, which load without decoding any images. This trades disk space
+(the frames are stored uncompressed) for loading speed, so it can be decided
+per dataset whether to pack the frames. To undo, remove the packed_frames.*
+files from the video folders. If the dataset has a frame manifest, rebuild it
+afterwards with build_frame_manifest.py.
+"""
+
+from collections.abc import Sequence
+import os
+
+from absl import app
+from absl import flags
+
+from video_localized_narratives.tools import packed_frames
+from video_localized_narratives.tools import util
+
+
+_FRAMES_PATH_FLAG = flags.DEFINE_string(
+    'frames_path',
+    default=None,
+    required=True,
+    help='The path to the frames of a dataset, e.g. "data/frames/OVIS_train/"',
+)
+_OVERWRITE_FLAG = flags.DEFINE_boolean(
+    'overwrite',
+    default=False,
+    help='Whether to pack videos again, which have already been packed.',
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  frames_path = _FRAMES_PATH_FLAG.value
+  video_names = sorted(e.name for e in os.scandir(frames_path) if e.is_dir())
+  for idx, video_name in enumerate(video_names):
+    print(idx, '/', len(video_names), video_name)
+    pack_video(os.path.join(frames_path, video_name), _OVERWRITE_FLAG.value)
+
+
+def pack_video(video_folder: str, overwrite: bool = False) -> None:
+  if packed_frames.has_packed_frames(video_folder) and not overwrite:
+    return
+  frames = util.get_all_frame_files(video_folder)
+  packed_frames.write_packed_frames(video_folder, frames)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,118 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Frames of a video packed into a single memory-mapped .npy file.
+
+A packed video folder contains, next to the original frame files, a
+(T, H, W, 3) uint8 array with all frames in PACKED_FRAMES_FILENAME and an index
+with the frame names in PACKED_INDEX_FILENAME. Use pack_frames.py to create
+them. Loading a packed frame returns a read-only view into the memory-mapped
+array, so no image decoding is necessary.
+"""
+
+import dataclasses
+import functools
+import json
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+from video_localized_narratives.tools import frame
+
+
+PACKED_FRAMES_FILENAME = 'packed_frames.npy'
+PACKED_INDEX_FILENAME = 'packed_frames.json'
+
+# The number of memory-mapped videos which are kept open.
+_MAX_OPEN_VIDEOS = 256
+
+
+@dataclasses.dataclass(frozen=True)
+class PackedFrame(frame.Frame):
+  """A frame which is loaded from the packed frames of its video."""
+
+  frame_idx: Optional[int] = None
+
+  def load(self) -> np.ndarray:
+    """Returns a read-only view of the frame in the memory-mapped array."""
+    assert self.root_folder is not None
+    assert self.frame_idx is not None
+    return _open_packed_frames(self.root_folder)[self.frame_idx]
+
+
+def has_packed_frames(folder: str) -> bool:
+  return os.path.exists(os.path.join(folder, PACKED_INDEX_FILENAME))
+
+
+def get_all_packed_frames(folder: str) -> list[PackedFrame]:
+  index = load_index(folder)
+  return [
+      PackedFrame(name, folder, index['is_jpg'], idx)
+      for idx, name in enumerate(index['names'])
+  ]
+
+
+def load_index(folder: str) -> dict[str, Any]:
+  with open(os.path.join(folder, PACKED_INDEX_FILENAME)) as f:
+    return json.load(f)
+
+
+def write_packed_frames(folder: str, frames: list[frame.Frame]) -> None:
+  """Pack the frames into a single array file and write the index."""
+  if not frames:
+    raise FileNotFoundError(f'Did not find frames in {folder}')
+  first = frames[0].load()
+  shape = (len(frames), *first.shape)
+  if first.dtype != np.uint8 or first.ndim != 3 or first.shape[2] != 3:
+    raise ValueError(
+        f'Can only pack RGB uint8 frames, got {first.dtype} {first.shape}'
+    )
+
+  # Write to temporary files first, so that readers never see a partial
+  # result. The index is moved last, since it marks the folder as packed.
+  packed_filename = os.path.join(folder, PACKED_FRAMES_FILENAME)
+  tmp_packed_filename = packed_filename + '.tmp'
+  try:
+    packed = np.lib.format.open_memmap(
+        tmp_packed_filename, mode='w+', dtype=np.uint8, shape=shape
+    )
+    for idx, f in enumerate(frames):
+      img = first if idx == 0 else f.load()
+      if img.shape != first.shape:
+        raise ValueError(f'Frame {f} has shape {img.shape}, not {first.shape}')
+      packed[idx] = img
+    packed.flush()
+    del packed
+    os.replace(tmp_packed_filename, packed_filename)
+  finally:
+    # Do not leave a partial file behind if a frame could not be packed.
+    if os.path.exists(tmp_packed_filename):
+      os.remove(tmp_packed_filename)
+
+  index = {
+      'names': [f.name for f in frames],
+      'is_jpg': frames[0].is_jpg,
+      'shape': list(shape),
+  }
+  index_filename = os.path.join(folder, PACKED_INDEX_FILENAME)
+  with open(index_filename + '.tmp', 'w') as f:
+    json.dump(index, f)
+  os.replace(index_filename + '.tmp', index_filename)
+  _open_packed_frames.cache_clear()
+
+
+@functools.lru_cache(maxsize=_MAX_OPEN_VIDEOS)
+def _open_packed_frames(folder: str) -> np.ndarray:
+  return np.load(os.path.join(folder, PACKED_FRAMES_FILENAME), mmap_mode='r')
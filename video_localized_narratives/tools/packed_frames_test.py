@@ -0,0 +1,78 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+import numpy as np
+import PIL.Image
+
+from video_localized_narratives.tools import packed_frames
+from video_localized_narratives.tools import util
+
+from absl.testing import absltest
+
+
+def _write_frames(video_folder, shapes, extension='jpg'):
+  os.makedirs(video_folder)
+  rng = np.random.default_rng(0)
+  for frame_number, shape in enumerate(shapes):
+    img = rng.integers(0, 256, size=(*shape, 3), dtype=np.uint8)
+    PIL.Image.fromarray(img).save(
+        os.path.join(video_folder, f'{frame_number:05d}.{extension}')
+    )
+
+
+class PackedFramesTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    self.video_folder = os.path.join(tmp_dir.name, 'video')
+
+  def test_packed_frames_have_the_pixels_of_the_frame_files(self):
+    _write_frames(self.video_folder, [(24, 32)] * 12)
+    frame_files = util.get_all_frames(self.video_folder)
+
+    packed_frames.write_packed_frames(
+        self.video_folder, util.get_all_frame_files(self.video_folder)
+    )
+    frames = util.get_all_frames(self.video_folder)
+
+    self.assertTrue(packed_frames.has_packed_frames(self.video_folder))
+    for f in frames:
+      self.assertIsInstance(f, packed_frames.PackedFrame)
+    self.assertEqual([f.name for f in frames], [f.name for f in frame_files])
+    for packed_frame, frame_file in zip(frames, frame_files):
+      packed_img = packed_frame.load()
+      self.assertFalse(packed_img.flags.writeable)
+      np.testing.assert_array_equal(packed_img, frame_file.load())
+
+  def test_frames_of_different_shapes_leave_no_files_behind(self):
+    _write_frames(self.video_folder, [(24, 32), (24, 32), (16, 32)], 'png')
+
+    with self.assertRaisesRegex(ValueError, 'has shape'):
+      packed_frames.write_packed_frames(
+          self.video_folder, util.get_all_frame_files(self.video_folder)
+      )
+
+    self.assertFalse(packed_frames.has_packed_frames(self.video_folder))
+    self.assertCountEqual(
+        os.listdir(self.video_folder), ['00000.png', '00001.png', '00002.png']
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,162 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Provides the PackedMask class for boolean masks with one bit per pixel.
+
+The rows of a mask are packed with np.packbits, so a mask of shape (H, W) takes
+H * ceil(W / 8) bytes instead of H * W bytes for uint8 or bool masks. A packed
+mask can also hold a batch of masks of the same size, e.g. of shape (B, H, W).
+
+The areas of masks and of their intersections and unions are counted on the
+packed bytes with a popcount lookup table, without unpacking them.
+
+Usage example:
+  traces = packed_mask.PackedMask.stack(
+      [packed_mask.PackedMask.from_rle(q.trace) for q in questions]
+  )
+  boxes = packed_mask.PackedMask.from_boxes(result_boxes, height, width)
+  recalls = boxes.intersection_count(traces) / traces.count()
+"""
+
+import dataclasses
+from typing import Any, Union
+
+import numpy as np
+from pycocotools import mask as cocomask
+
+
+# The number of set bits of each byte value.
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+@dataclasses.dataclass(frozen=True)
+class PackedMask:
+  """One or more boolean masks with their rows packed into bits.
+
+  The bits of shape (..., H, ceil(W / 8)) are the result of np.packbits along
+  the rows. The padding bits at the end of each row are always 0, so they never
+  count as foreground.
+  """
+
+  bits: np.ndarray
+  width: int
+
+  @classmethod
+  def from_dense(cls, mask: np.ndarray) -> 'PackedMask':
+    """Pack a mask of shape (..., H, W). Non-zero pixels are foreground."""
+    mask = np.asarray(mask)
+    if mask.dtype != bool:
+      mask = mask != 0
+    return cls(bits=np.packbits(mask, axis=-1), width=mask.shape[-1])
+
+  @classmethod
+  def from_rle(cls, rle: dict[str, Any]) -> 'PackedMask':
+    """Pack a COCO RLE mask, with compressed or uncompressed counts."""
+    if isinstance(rle['counts'], list):
+      rle = cocomask.frPyObjects(rle, *rle['size'])
+    return cls.from_dense(cocomask.decode(rle))
+
+  @classmethod
+  def from_boxes(
+      cls, boxes: np.ndarray, height: int, width: int
+  ) -> 'PackedMask':
+    """Pack the masks of boxes, without creating the full-resolution masks.
+
+    Args:
+      boxes: the boxes [x0, y0, x1, y1] of shape (B, 4), each covering the
+        pixels [x0, x1) x [y0, y1) with coordinates inside the image.
+      height: the height of the masks.
+      width: the width of the masks.
+
+    Returns:
+      The box masks of shape (B, H, W).
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    x0, y0, x1, y1 = (boxes[:, i, np.newaxis] for i in range(4))
+    xs = np.arange(width)[np.newaxis, :]
+    ys = np.arange(height)[np.newaxis, :]
+    # All rows inside a box have the same packed bytes.
+    packed_rows = np.packbits((xs >= x0) & (xs < x1), axis=-1)
+    rows_inside = (ys >= y0) & (ys < y1)
+    bits = np.where(
+        rows_inside[:, :, np.newaxis], packed_rows[:, np.newaxis, :], 0
+    ).astype(np.uint8, copy=False)
+    return cls(bits=bits, width=width)
+
+  @classmethod
+  def stack(cls, masks: list['PackedMask']) -> 'PackedMask':
+    """Stack masks of the same size into a batch."""
+    widths = {m.width for m in masks}
+    if len(widths) != 1:
+      raise ValueError(f'Cannot stack masks of different widths: {widths}')
+    return cls(bits=np.stack([m.bits for m in masks]), width=widths.pop())
+
+  @property
+  def shape(self) -> tuple[int, ...]:
+    """The shape of the unpacked masks, e.g. (H, W) or (B, H, W)."""
+    return (*self.bits.shape[:-1], self.width)
+
+  @property
+  def nbytes(self) -> int:
+    return self.bits.nbytes
+
+  def to_dense(self) -> np.ndarray:
+    """Unpack the masks to a bool array of shape (..., H, W)."""
+    return np.unpackbits(self.bits, axis=-1, count=self.width).astype(bool)
+
+  def to_rle(self) -> Union[dict[str, Any], list[dict[str, Any]]]:
+    """Encode a mask of shape (H, W) or each mask of a batch as a COCO RLE."""
+    dense = self.to_dense().astype(np.uint8)
+    if dense.ndim == 2:
+      return cocomask.encode(np.asfortranarray(dense))
+    return cocomask.encode(np.asfortranarray(np.moveaxis(dense, 0, -1)))
+
+  def count(self) -> Union[int, np.ndarray]:
+    """The number of foreground pixels of each mask."""
+    return _count_bits(self.bits)
+
+  def intersection_count(self, other: 'PackedMask') -> Union[int, np.ndarray]:
+    """The number of pixels which are foreground in both masks."""
+    self._check_same_shape(other)
+    return _count_bits(self.bits & other.bits)
+
+  def union_count(self, other: 'PackedMask') -> Union[int, np.ndarray]:
+    """The number of pixels which are foreground in either mask."""
+    self._check_same_shape(other)
+    return _count_bits(self.bits | other.bits)
+
+  def any(self) -> Union[bool, np.ndarray]:
+    """Whether each mask has a foreground pixel."""
+    return self.bits.any(axis=(-2, -1))
+
+  def __and__(self, other: 'PackedMask') -> 'PackedMask':
+    self._check_same_shape(other)
+    return PackedMask(bits=self.bits & other.bits, width=self.width)
+
+  def __or__(self, other: 'PackedMask') -> 'PackedMask':
+    self._check_same_shape(other)
+    return PackedMask(bits=self.bits | other.bits, width=self.width)
+
+  def _check_same_shape(self, other: 'PackedMask') -> None:
+    if self.shape != other.shape:
+      raise ValueError(
+          f'The masks have different shapes: {self.shape} and {other.shape}'
+      )
+
+
+def _count_bits(bits: np.ndarray) -> Union[int, np.ndarray]:
+  counts = _POPCOUNT[bits].sum(axis=(-2, -1), dtype=np.int64)
+  if counts.ndim == 0:
+    return int(counts)
+  return counts
@@ -0,0 +1,101 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.tools import packed_mask
+
+from absl.testing import absltest
+
+
+class PackedMaskTest(absltest.TestCase):
+
+  def test_counts_match_dense_masks(self):
+    rng = np.random.default_rng(0)
+    # Widths which are and are not multiples of 8.
+    for height, width in [(5, 1), (7, 8), (9, 13), (30, 65)]:
+      a = rng.random((4, height, width)) < 0.4
+      b = rng.random((4, height, width)) < 0.3
+      packed_a = packed_mask.PackedMask.from_dense(a)
+      packed_b = packed_mask.PackedMask.from_dense(b)
+
+      self.assertEqual(packed_a.shape, a.shape)
+      np.testing.assert_array_equal(packed_a.to_dense(), a)
+      np.testing.assert_array_equal(packed_a.count(), a.sum(axis=(1, 2)))
+      np.testing.assert_array_equal(
+          packed_a.intersection_count(packed_b), (a & b).sum(axis=(1, 2))
+      )
+      np.testing.assert_array_equal(
+          packed_a.union_count(packed_b), (a | b).sum(axis=(1, 2))
+      )
+      np.testing.assert_array_equal(
+          (packed_a & packed_b).to_dense(), a & b
+      )
+      np.testing.assert_array_equal(
+          (packed_a | packed_b).to_dense(), a | b
+      )
+
+  def test_single_mask(self):
+    arr = np.zeros((6, 10), dtype=np.uint8)
+    arr[1:3, 2:9] = 1
+
+    packed = packed_mask.PackedMask.from_dense(arr)
+
+    self.assertEqual(packed.count(), 14)
+    self.assertIsInstance(packed.count(), int)
+    self.assertEqual(packed.nbytes, 6 * 2)
+    self.assertTrue(packed.any())
+
+  def test_rle_round_trip(self):
+    rng = np.random.default_rng(1)
+    arr = (rng.random((3, 11, 19)) < 0.5).astype(np.uint8)
+    packed = packed_mask.PackedMask.from_dense(arr)
+
+    rles = packed.to_rle()
+
+    for rle, expected in zip(rles, arr):
+      np.testing.assert_array_equal(cocomask.decode(rle), expected)
+      np.testing.assert_array_equal(
+          packed_mask.PackedMask.from_rle(rle).to_dense(), expected
+      )
+    uncompressed = {'size': [2, 3], 'counts': [1, 2, 3]}
+    np.testing.assert_array_equal(
+        packed_mask.PackedMask.from_rle(uncompressed).to_dense(),
+        [[False, True, False], [True, False, False]],
+    )
+
+  def test_from_boxes(self):
+    height, width = 7, 12
+    boxes = np.array([[0, 0, 12, 7], [3, 2, 11, 5], [0, 0, 0, 0], [5, 6, 6, 7]])
+
+    packed = packed_mask.PackedMask.from_boxes(boxes, height, width)
+
+    for (x0, y0, x1, y1), actual in zip(boxes, packed.to_dense()):
+      expected = np.zeros((height, width), dtype=bool)
+      expected[y0:y1, x0:x1] = True
+      np.testing.assert_array_equal(actual, expected)
+
+  def test_different_shapes(self):
+    a = packed_mask.PackedMask.from_dense(np.ones((4, 9)))
+    b = packed_mask.PackedMask.from_dense(np.ones((4, 10)))
+
+    with self.assertRaises(ValueError):
+      a.intersection_count(b)
+    with self.assertRaises(ValueError):
+      packed_mask.PackedMask.stack([a, b])
+
+
+if __name__ == '__main__':
+  absltest.main()
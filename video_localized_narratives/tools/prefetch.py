@@ -0,0 +1,132 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Load frames ahead of the consumer in a pool of threads.
+
+Usage example:
+  for img in prefetch.prefetch_frames(vln.get_all_frames()):
+    do_something_with(img)
+
+  async for img in prefetch.aprefetch_frames(vln.get_all_frames()):
+    await do_something_with(img)
+"""
+
+import asyncio
+import collections
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent import futures
+import itertools
+from typing import TypeVar
+
+import numpy as np
+
+from video_localized_narratives.tools import frame
+
+
+DEFAULT_NUM_WORKERS = 4
+DEFAULT_MAX_PREFETCH = 16
+
+_T = TypeVar('_T')
+_R = TypeVar('_R')
+
+
+def prefetch(
+    items: Iterable[_T],
+    load_fn: Callable[[_T], _R],
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    max_prefetch: int = DEFAULT_MAX_PREFETCH,
+) -> Iterator[_R]:
+  """Yield load_fn(item) for all items in order, loading ahead in threads.
+
+  Args:
+    items: the items to load.
+    load_fn: the function which loads one item.
+    num_workers: the number of threads used for loading.
+    max_prefetch: the maximum number of items which are loaded (or being
+      loaded) but not yet consumed. This bounds the memory usage.
+
+  Yields:
+    The loaded items, in the same order as items.
+  """
+  if max_prefetch < 1:
+    raise ValueError(f'Invalid max_prefetch: {max_prefetch}')
+  items_iter = iter(items)
+  with futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+    pending = collections.deque(
+        executor.submit(load_fn, item)
+        for item in itertools.islice(items_iter, max_prefetch)
+    )
+    try:
+      while pending:
+        future = pending.popleft()
+        for item in itertools.islice(items_iter, 1):
+          pending.append(executor.submit(load_fn, item))
+        yield future.result()
+    finally:
+      # Do not wait for items which will never be consumed.
+      for future in pending:
+        future.cancel()
+
+
+async def aprefetch(
+    items: Iterable[_T],
+    load_fn: Callable[[_T], _R],
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    max_prefetch: int = DEFAULT_MAX_PREFETCH,
+) -> AsyncIterator[_R]:
+  """The asyncio variant of prefetch, which does not block the event loop."""
+  if max_prefetch < 1:
+    raise ValueError(f'Invalid max_prefetch: {max_prefetch}')
+  loop = asyncio.get_running_loop()
+  items_iter = iter(items)
+  executor = futures.ThreadPoolExecutor(max_workers=num_workers)
+  pending = collections.deque()
+  try:
+    pending.extend(
+        loop.run_in_executor(executor, load_fn, item)
+        for item in itertools.islice(items_iter, max_prefetch)
+    )
+    while pending:
+      future = pending.popleft()
+      for item in itertools.islice(items_iter, 1):
+        pending.append(loop.run_in_executor(executor, load_fn, item))
+      yield await future
+  finally:
+    for future in pending:
+      future.cancel()
+    # Waiting for the executor would block the event loop until the running
+    # loads finish, and cancelling the asyncio futures only cancels the queued
+    # loads in a later iteration of the loop. So the queued loads are cancelled
+    # here, and the running ones finish in the background.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def prefetch_frames(
+    frames: Iterable[frame.Frame],
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    max_prefetch: int = DEFAULT_MAX_PREFETCH,
+) -> Iterator[np.ndarray]:
+  return prefetch(frames, _load_frame, num_workers, max_prefetch)
+
+
+def aprefetch_frames(
+    frames: Iterable[frame.Frame],
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    max_prefetch: int = DEFAULT_MAX_PREFETCH,
+) -> AsyncIterator[np.ndarray]:
+  return aprefetch(frames, _load_frame, num_workers, max_prefetch)
+
+
+def _load_frame(f: frame.Frame) -> np.ndarray:
+  return f.load()
@@ -0,0 +1,131 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import random
+import time
+
+from video_localized_narratives.tools import prefetch
+
+from absl.testing import absltest
+
+
+def _slow_square(x):
+  time.sleep(random.uniform(0, 0.005))
+  return x * x
+
+
+class _CountingItems:
+  """Yields the numbers 0, ..., n - 1 and counts how many were pulled."""
+
+  def __init__(self, n):
+    self.n = n
+    self.num_pulled = 0
+
+  def __iter__(self):
+    for i in range(self.n):
+      self.num_pulled += 1
+      yield i
+
+
+def _fail_at_3(x):
+  if x == 3:
+    raise ValueError('cannot load 3')
+  return x
+
+
+class PrefetchTest(absltest.TestCase):
+
+  def test_results_are_in_order(self):
+    self.assertEqual(
+        list(prefetch.prefetch(range(50), _slow_square, num_workers=4)),
+        [x * x for x in range(50)],
+    )
+
+  def test_in_flight_items_are_bounded(self):
+    items = _CountingItems(30)
+    for num_consumed, _ in enumerate(
+        prefetch.prefetch(items, _slow_square, num_workers=2, max_prefetch=5),
+        start=1,
+    ):
+      self.assertLessEqual(items.num_pulled, num_consumed + 5)
+    self.assertEqual(items.num_pulled, 30)
+
+  def test_exception_is_raised_at_the_failing_item(self):
+    results = []
+    with self.assertRaisesRegex(ValueError, 'cannot load 3'):
+      for x in prefetch.prefetch(range(10), _fail_at_3, num_workers=2):
+        results.append(x)
+    self.assertEqual(results, [0, 1, 2])
+
+
+class AsyncPrefetchTest(absltest.TestCase):
+
+  def test_results_are_in_order(self):
+    async def consume():
+      return [
+          x
+          async for x in prefetch.aprefetch(
+              range(50), _slow_square, num_workers=4
+          )
+      ]
+
+    self.assertEqual(asyncio.run(consume()), [x * x for x in range(50)])
+
+  def test_in_flight_items_are_bounded(self):
+    items = _CountingItems(30)
+
+    async def consume():
+      num_consumed = 0
+      async for _ in prefetch.aprefetch(
+          items, _slow_square, num_workers=2, max_prefetch=5
+      ):
+        num_consumed += 1
+        self.assertLessEqual(items.num_pulled, num_consumed + 5)
+
+    asyncio.run(consume())
+    self.assertEqual(items.num_pulled, 30)
+
+  def test_exception_is_raised_at_the_failing_item(self):
+    async def consume(results):
+      async for x in prefetch.aprefetch(range(10), _fail_at_3, num_workers=2):
+        results.append(x)
+
+    results = []
+    with self.assertRaisesRegex(ValueError, 'cannot load 3'):
+      asyncio.run(consume(results))
+    self.assertEqual(results, [0, 1, 2])
+
+  def test_closing_early_does_not_wait_for_queued_loads(self):
+    def slow_load(x):
+      time.sleep(0.05)
+      return x
+
+    async def consume():
+      results = prefetch.aprefetch(
+          range(100), slow_load, num_workers=1, max_prefetch=40
+      )
+      first = await results.__anext__()
+      start = time.perf_counter()
+      await results.aclose()
+      return first, time.perf_counter() - start
+
+    first, close_seconds = asyncio.run(consume())
+    self.assertEqual(first, 0)
+    # Waiting for the 39 queued loads would take about 2 seconds.
+    self.assertLess(close_seconds, 0.5)
+
+
+if __name__ == '__main__':
+  absltest.main()
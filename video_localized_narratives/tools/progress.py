@@ -0,0 +1,85 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Progress reporting and worker counts for long-running evaluations."""
+
+import datetime
+import os
+import time
+from typing import Callable
+
+
+class ProgressReporter:
+  """Prints the progress and the estimated remaining time of a job.
+
+  Progress is measured in units of work (e.g. frames) instead of items, so that
+  the estimate is sensible even if the items differ a lot in size.
+  """
+
+  def __init__(
+      self,
+      total_items: int,
+      total_work: int,
+      description: str = '',
+      min_interval_seconds: float = 10.0,
+      clock: Callable[[], float] = time.monotonic,
+  ):
+    self._total_items = total_items
+    self._total_work = total_work
+    self._description = description
+    self._min_interval_seconds = min_interval_seconds
+    self._clock = clock
+    self._start_time = clock()
+    self._last_report_time = None
+    self._done_items = 0
+    self._done_work = 0
+
+  def update(self, work: int = 1) -> None:
+    """Mark one item with the given amount of work as done."""
+    self._done_items += 1
+    self._done_work += work
+    now = self._clock()
+    is_done = self._done_items == self._total_items
+    if (
+        is_done
+        or self._last_report_time is None
+        or now - self._last_report_time >= self._min_interval_seconds
+    ):
+      self._last_report_time = now
+      print(self.format_progress(now))
+
+  def format_progress(self, now: float) -> str:
+    elapsed = now - self._start_time
+    fraction = self._done_work / self._total_work if self._total_work else 1.0
+    if fraction > 0:
+      eta = _format_seconds(elapsed / fraction - elapsed)
+    else:
+      eta = '?'
+    return (
+        f'{self._description}{self._done_items} / {self._total_items} '
+        f'({fraction:.1%}), elapsed {_format_seconds(elapsed)}, ETA {eta}'
+    )
+
+
+def available_cpu_count() -> int:
+  """The number of CPUs this process may run on."""
+  try:
+    return len(os.sched_getaffinity(0))
+  except AttributeError:
+    # sched_getaffinity is not available on all platforms, e.g. macOS.
+    return os.cpu_count() or 1
+
+
+def _format_seconds(seconds: float) -> str:
+  return str(datetime.timedelta(seconds=round(seconds)))
@@ -0,0 +1,43 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from video_localized_narratives.tools import progress
+
+from absl.testing import absltest
+
+
+class ProgressTest(absltest.TestCase):
+
+  def test_eta_is_based_on_work(self):
+    now = [100.0]
+    reporter = progress.ProgressReporter(
+        total_items=3,
+        total_work=40,
+        description='Done: ',
+        clock=lambda: now[0],
+    )
+    now[0] = 130.0
+    reporter.update(work=30)
+
+    self.assertEqual(
+        reporter.format_progress(now[0]),
+        'Done: 1 / 3 (75.0%), elapsed 0:00:30, ETA 0:00:10',
+    )
+
+  def test_available_cpu_count(self):
+    self.assertGreaterEqual(progress.available_cpu_count(), 1)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,119 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Split an evaluation into shards and merge the partial results of the shards.
+
+Each item (e.g. a video or a question) is assigned to a shard based on a stable
+hash of its key, so that all machines agree on the assignment without
+coordination. Each shard writes a partial result file:
+  {"kind": "vng", "num_shards": 4, "shard_index": 0, "num_items": 1234,
+   "scores": ...}
+
+num_items is the number of items of the full evaluation, so that merging can
+check that the partial results are complete. The format of the scores depends
+on the kind of evaluation.
+"""
+
+from collections.abc import Iterable, Sequence
+import json
+import zlib
+
+from video_localized_narratives.tools import util
+
+
+def get_shard_index(key: str, num_shards: int) -> int:
+  """The shard of the item with the given key, stable across processes."""
+  return zlib.crc32(key.encode('utf-8')) % num_shards
+
+
+def is_in_shard(key: str, num_shards: int, shard_index: int) -> bool:
+  return get_shard_index(key, num_shards) == shard_index
+
+
+def select_shard(
+    keys: Iterable[str], num_shards: int, shard_index: int
+) -> list[str]:
+  """Select the keys in the shard, keeping their order."""
+  check_shard_flags(num_shards, shard_index)
+  return [k for k in keys if is_in_shard(k, num_shards, shard_index)]
+
+
+def check_shard_flags(num_shards: int, shard_index: int) -> None:
+  if num_shards < 1 or not 0 <= shard_index < num_shards:
+    raise ValueError(
+        f'Invalid shard {shard_index} for {num_shards} shards. The shard index '
+        'must be in [0, num_shards).'
+    )
+
+
+def write_partial_results(
+    filename: str,
+    kind: str,
+    num_shards: int,
+    shard_index: int,
+    num_items: int,
+    scores: util.JsonData,
+) -> None:
+  partial = {
+      'kind': kind,
+      'num_shards': num_shards,
+      'shard_index': shard_index,
+      'num_items': num_items,
+      'scores': scores,
+  }
+  with open(filename, 'w') as f:
+    json.dump(partial, f, separators=(',', ':'))
+
+
+def load_partial_results(
+    filenames: Sequence[str], kind: str
+) -> tuple[int, list[util.JsonData]]:
+  """Load the partial results of all shards of an evaluation.
+
+  Args:
+    filenames: the partial result files, one per shard, in any order.
+    kind: the expected kind of evaluation, e.g. 'vng'.
+
+  Returns:
+    The number of items of the full evaluation and the scores of each shard,
+    ordered by shard index.
+
+  Raises:
+    ValueError: if the partial results are not exactly one for each shard of
+      the same evaluation.
+  """
+  partials = [util.load_json_data(filename) for filename in filenames]
+  if not partials:
+    raise ValueError('No partial results given.')
+  for filename, partial in zip(filenames, partials):
+    if partial['kind'] != kind:
+      raise ValueError(
+          f'Expected partial results of kind {kind}, got {partial["kind"]}: '
+          f'{filename}'
+      )
+  num_shards = partials[0]['num_shards']
+  num_items = partials[0]['num_items']
+  if any(
+      p['num_shards'] != num_shards or p['num_items'] != num_items
+      for p in partials
+  ):
+    raise ValueError('The partial results are from different evaluations.')
+  shard_indices = sorted(p['shard_index'] for p in partials)
+  if shard_indices != list(range(num_shards)):
+    raise ValueError(
+        f'Expected one partial result for each of {num_shards} shards, got '
+        f'shards {shard_indices}.'
+    )
+  partials.sort(key=lambda p: p['shard_index'])
+  return num_items, [p['scores'] for p in partials]
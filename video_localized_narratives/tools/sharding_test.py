@@ -0,0 +1,61 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from video_localized_narratives.tools import sharding
+
+from absl.testing import absltest
+
+
+class ShardingTest(absltest.TestCase):
+
+  def test_shards_partition_the_keys(self):
+    keys = [f'video_{i}' for i in range(100)]
+
+    shards = [sharding.select_shard(keys, 3, idx) for idx in range(3)]
+
+    self.assertCountEqual(sum(shards, []), keys)
+    for shard in shards:
+      self.assertNotEmpty(shard)
+      self.assertEqual(shard, sorted(shard, key=keys.index))
+    self.assertEqual(sharding.select_shard(keys, 3, 1), shards[1])
+
+  def test_invalid_shard_index(self):
+    with self.assertRaises(ValueError):
+      sharding.select_shard(['a'], 2, 2)
+
+  def test_load_partial_results(self):
+    with tempfile.TemporaryDirectory() as temp_dir:
+      filenames = [os.path.join(temp_dir, f'{idx}.json') for idx in range(2)]
+      for idx, filename in enumerate(filenames):
+        sharding.write_partial_results(
+            filename, 'test', 2, idx, 5, {'shard': idx}
+        )
+
+      num_items, scores = sharding.load_partial_results(
+          filenames[::-1], 'test'
+      )
+      self.assertEqual(num_items, 5)
+      self.assertEqual(scores, [{'shard': 0}, {'shard': 1}])
+
+      with self.assertRaisesRegex(ValueError, 'each of 2 shards'):
+        sharding.load_partial_results(filenames[:1], 'test')
+      with self.assertRaisesRegex(ValueError, 'kind'):
+        sharding.load_partial_results(filenames, 'other')
+
+
+if __name__ == '__main__':
+  absltest.main()
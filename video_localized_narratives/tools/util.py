@@ -24,6 +24,8 @@ import numpy as np
 from pathlib import Path
 
 from video_localized_narratives.tools import frame
+from video_localized_narratives.tools import frame_manifest
+from video_localized_narratives.tools import packed_frames
 
 JsonData = dict[str, Any]
 
@@ -52,6 +54,29 @@ def load_json_data(filename: str) -> JsonData:
 
 
 def get_all_frames(folder: str) -> list[frame.Frame]:
+  """Get all frames in folder, from the packed frames if they exist."""
+  manifest_entry = frame_manifest.lookup(folder)
+  if manifest_entry is not None and not manifest_entry.is_packed:
+    return get_all_frame_files(folder)
+  if packed_frames.has_packed_frames(folder):
+    return packed_frames.get_all_packed_frames(folder)
+  # Without a manifest entry or if the packed frames have been removed since
+  # the manifest was built. Then its frame names may be stale as well.
+  return _glob_frame_files(folder)
+
+
+def get_all_frame_files(folder: str) -> list[frame.Frame]:
+  """Get all frame files in folder, using the frame manifest if it exists."""
+  manifest_entry = frame_manifest.lookup(folder)
+  if manifest_entry is not None:
+    return [
+        frame.Frame(name, folder, manifest_entry.is_jpg)
+        for name in manifest_entry.names
+    ]
+  return _glob_frame_files(folder)
+
+
+def _glob_frame_files(folder: str) -> list[frame.Frame]:
   frames = glob.glob(os.path.join(folder, '*.jpg'))
   if frames:
     jpg = True
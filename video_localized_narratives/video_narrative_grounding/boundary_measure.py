@@ -0,0 +1,241 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An implementation of the DAVIS boundary F-measure for batches of frames.
+
+This computes the same scores as davis2017.metrics.db_eval_boundary (without
+void pixels). A boundary pixel of one mask matches if the other mask has a
+boundary pixel within a disk of radius bound_pix. Instead of dilating the
+boundaries of each full frame with the disk, we treat the disk as a stack of
+horizontal runs and only do work per pixel of the sparser boundary. The frames
+of a batch are processed together, restricted to the bounding box of all their
+boundaries. Frames for which a boundary is empty are scored without any
+matching.
+
+On 1080p frames this is faster than davis2017 for clean masks, e.g. about 1.5x
+for a large object and 4x for a small object, and about as fast for very noisy
+predicted masks.
+"""
+
+import numpy as np
+
+
+DEFAULT_BOUND_TH = 0.008
+# The maximum number of pixels of the frames matched together, which bounds the
+# memory used by the prefix counts of their boundaries.
+_MAX_BATCH_PIXELS = 2**24
+
+
+def db_eval_boundary(
+    annotation: np.ndarray,
+    segmentation: np.ndarray,
+    bound_th: float = DEFAULT_BOUND_TH,
+) -> np.ndarray:
+  """Compute the boundary F-measure for each frame.
+
+  Args:
+    annotation: the ground truth masks, either (T, H, W) or (H, W).
+    segmentation: the predicted masks with the same shape as annotation.
+    bound_th: the tolerance for matching boundary pixels. Values below 1 are
+      relative to the image diagonal, otherwise it is given in pixels.
+
+  Returns:
+    The F-measure for each frame, or a scalar array for a single frame.
+  """
+  assert annotation.shape == segmentation.shape, (
+      annotation.shape,
+      segmentation.shape,
+  )
+  is_single_frame = annotation.ndim == 2
+  if is_single_frame:
+    annotation = annotation[np.newaxis]
+    segmentation = segmentation[np.newaxis]
+
+  height, width = annotation.shape[1:]
+  if bound_th >= 1:
+    bound_pix = bound_th
+  else:
+    bound_pix = np.ceil(bound_th * np.linalg.norm((height, width)))
+
+  fg_boundaries = seg2bmap(segmentation)
+  gt_boundaries = seg2bmap(annotation)
+  n_fgs = fg_boundaries.sum(axis=(1, 2))
+  n_gts = gt_boundaries.sum(axis=(1, 2))
+
+  fg_matches = np.zeros(len(annotation), dtype=np.int64)
+  gt_matches = np.zeros(len(annotation), dtype=np.int64)
+  (to_match,) = np.nonzero((n_fgs > 0) & (n_gts > 0))
+  batch_size = max(1, _MAX_BATCH_PIXELS // (height * width))
+  for start in range(0, len(to_match), batch_size):
+    batch = to_match[start : start + batch_size]
+    fg_matches[batch], gt_matches[batch] = _count_boundary_matches(
+        fg_boundaries[batch], gt_boundaries[batch], bound_pix
+    )
+
+  f_res = np.zeros(len(annotation))
+  for idx, (n_fg, n_gt) in enumerate(zip(n_fgs, n_gts)):
+    if n_fg == 0 and n_gt > 0:
+      precision = 1
+      recall = 0
+    elif n_fg > 0 and n_gt == 0:
+      precision = 0
+      recall = 1
+    elif n_fg == 0 and n_gt == 0:
+      precision = 1
+      recall = 1
+    else:
+      precision = fg_matches[idx] / float(n_fg)
+      recall = gt_matches[idx] / float(n_gt)
+
+    if precision + recall == 0:
+      f_res[idx] = 0
+    else:
+      f_res[idx] = 2 * precision * recall / (precision + recall)
+
+  if is_single_frame:
+    return f_res[0]
+  return f_res
+
+
+def seg2bmap(seg: np.ndarray) -> np.ndarray:
+  """Compute the boundary maps of masks with shape (..., H, W).
+
+  This follows _seg2bmap from davis2017, but works on a batch of masks.
+
+  Args:
+    seg: the masks. Non-zero values are foreground.
+
+  Returns:
+    The boolean boundary maps with the same shape as seg.
+  """
+  seg = seg.astype(bool)
+  e = np.zeros_like(seg)
+  s = np.zeros_like(seg)
+  se = np.zeros_like(seg)
+  e[..., :, :-1] = seg[..., :, 1:]
+  s[..., :-1, :] = seg[..., 1:, :]
+  se[..., :-1, :-1] = seg[..., 1:, 1:]
+
+  b = (seg ^ e) | (seg ^ s) | (seg ^ se)
+  b[..., -1, :] = seg[..., -1, :] ^ e[..., -1, :]
+  b[..., :, -1] = seg[..., :, -1] ^ s[..., :, -1]
+  b[..., -1, -1] = 0
+  return b
+
+
+def _count_boundary_matches(
+    fg_boundaries: np.ndarray, gt_boundaries: np.ndarray, bound_pix: float
+) -> tuple[np.ndarray, np.ndarray]:
+  """Count the boundary pixels within bound_pix of the other boundary.
+
+  Args:
+    fg_boundaries: the predicted boundary maps with shape (T, H, W).
+    gt_boundaries: the ground truth boundary maps with the same shape.
+    bound_pix: the radius of the disk.
+
+  Returns:
+    The number of matching predicted and ground truth boundary pixels for each
+    frame.
+  """
+  # All boundary pixels lie inside their joint bounding box, so the matches
+  # inside this box are the same as for the full frames.
+  boundaries = np.any(fg_boundaries | gt_boundaries, axis=0)
+  (ys,) = np.nonzero(boundaries.any(axis=1))
+  (xs,) = np.nonzero(boundaries.any(axis=0))
+  crop = np.s_[:, ys[0] : ys[-1] + 1, xs[0] : xs[-1] + 1]
+  fg_boundaries = fg_boundaries[crop]
+  gt_boundaries = gt_boundaries[crop]
+
+  half_widths = _disk_half_widths(bound_pix)
+  return (
+      _count_near(fg_boundaries, gt_boundaries, half_widths),
+      _count_near(gt_boundaries, fg_boundaries, half_widths),
+  )
+
+
+def _disk_half_widths(radius: float) -> np.ndarray:
+  """The half widths of the rows of the disk, from dy = -r to dy = r.
+
+  The disk contains the offsets (dy, dx) with dy**2 + dx**2 <= radius**2, like
+  the disk used by davis2017.
+
+  Args:
+    radius: the radius of the disk.
+
+  Returns:
+    For each row dy of the disk the largest dx, such that the row is [-dx, dx].
+  """
+  r = int(np.floor(radius))
+  offsets = np.arange(-r, r + 1)
+  in_disk = offsets[:, np.newaxis] ** 2 + offsets**2 <= radius**2
+  return in_disk.sum(axis=1) // 2
+
+
+def _count_near(
+    boundaries: np.ndarray, others: np.ndarray, half_widths: np.ndarray
+) -> np.ndarray:
+  """Count the boundary pixels with another boundary pixel within the disk.
+
+  The work per pixel is proportional to the height of the disk, so it is done
+  for the pixels of whichever boundary has fewer of them. If these are the
+  pixels of boundaries, the rows of their disks are tested against the prefix
+  counts of the rows of others. Otherwise the rows of the disks around others
+  are drawn into a map of the covered pixels, which is intersected with
+  boundaries.
+
+  Args:
+    boundaries: the boundary maps with shape (T, H, W).
+    others: the other boundary maps with the same shape.
+    half_widths: the half widths of the rows of the disk.
+
+  Returns:
+    The number of matching boundary pixels for each frame.
+  """
+  num_frames, height, width = boundaries.shape
+  r = len(half_widths) // 2
+  # Rows of length width + 1 with r extra rows above and below, so that the
+  # rows of all disks are inside. Pixel (t, y, x) is at (t, y + r, x) and the
+  # row dy of the disk around it is row y + dy.
+  shape = (num_frames, height + 2 * r, width + 1)
+  if np.count_nonzero(boundaries) <= np.count_nonzero(others):
+    # The number of pixels of others left of each position in its row.
+    counts = np.zeros(shape, dtype=np.int32)
+    np.cumsum(others, axis=2, out=counts[:, r : r + height, 1:])
+    ts, ys, xs = np.nonzero(boundaries)
+    is_near = np.zeros(len(ts), dtype=bool)
+    for dy, half_width in enumerate(half_widths):
+      x_starts = np.maximum(xs - half_width, 0)
+      x_ends = np.minimum(xs + half_width + 1, width)
+      row_ys = ys + dy
+      is_near |= counts[ts, row_ys, x_ends] > counts[ts, row_ys, x_starts]
+    return np.bincount(ts[is_near], minlength=num_frames)
+
+  # Each row of each disk adds one at its start and subtracts one after its
+  # end, the prefix sums of the rows count the disks covering each pixel.
+  ts, ys, xs = np.nonzero(others)
+  starts = []
+  ends = []
+  for dy, half_width in enumerate(half_widths):
+    rows = (ts, ys + dy)
+    x_starts = np.maximum(xs - half_width, 0)
+    x_ends = np.minimum(xs + half_width + 1, width)
+    starts.append(np.ravel_multi_index(rows + (x_starts,), shape))
+    ends.append(np.ravel_multi_index(rows + (x_ends,), shape))
+  size = np.prod(shape)
+  coverage = np.bincount(np.concatenate(starts), minlength=size) - (
+      np.bincount(np.concatenate(ends), minlength=size)
+  )
+  coverage = np.cumsum(coverage.reshape(shape), axis=2)
+  is_covered = coverage[:, r : r + height, :width] > 0
+  return np.count_nonzero(boundaries & is_covered, axis=(1, 2))
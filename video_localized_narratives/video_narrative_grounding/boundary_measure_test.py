@@ -0,0 +1,99 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from davis2017 import metrics
+import numpy as np
+
+from video_localized_narratives.video_narrative_grounding import boundary_measure
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+
+class BoundaryMeasureTest(parameterized.TestCase):
+
+  @parameterized.named_parameters(
+      ('relative_threshold', boundary_measure.DEFAULT_BOUND_TH),
+      ('pixel_threshold', 2),
+  )
+  def test_matches_dilation_based_f_measure(self, bound_th: float):
+    rng = np.random.default_rng(42)
+    gt_masks = _random_masks(rng, num_frames=20, height=96, width=128)
+    pred_masks = _random_masks(rng, num_frames=20, height=96, width=128)
+    # Include frames for which one or both masks are empty or full.
+    gt_masks[0] = 0
+    pred_masks[0] = 0
+    gt_masks[1] = 0
+    pred_masks[2] = 0
+    gt_masks[3] = 1
+    pred_masks[4] = gt_masks[4]
+
+    f_per_frame = boundary_measure.db_eval_boundary(
+        gt_masks, pred_masks, bound_th
+    )
+
+    np.testing.assert_allclose(
+        f_per_frame,
+        metrics.db_eval_boundary(gt_masks, pred_masks, bound_th=bound_th),
+    )
+    self.assertEqual(f_per_frame[0], 1.0)
+    self.assertEqual(f_per_frame[4], 1.0)
+
+  def test_single_frame(self):
+    rng = np.random.default_rng(7)
+    gt_mask, pred_mask = _random_masks(rng, num_frames=2, height=50, width=70)
+
+    f = boundary_measure.db_eval_boundary(gt_mask, pred_mask)
+
+    self.assertAlmostEqual(f, metrics.db_eval_boundary(gt_mask, pred_mask))
+
+  def test_noisy_prediction(self):
+    # The noisy prediction has many more boundary pixels than the ground truth,
+    # so the matches of each side are counted from the pixels of the other.
+    rng = np.random.default_rng(3)
+    gt_masks = _random_masks(rng, num_frames=5, height=120, width=160)
+    noise = rng.random(gt_masks.shape) < 0.1
+    pred_masks = np.where(noise, 1 - gt_masks, gt_masks)
+
+    f_per_frame = boundary_measure.db_eval_boundary(gt_masks, pred_masks)
+
+    np.testing.assert_allclose(
+        f_per_frame, metrics.db_eval_boundary(gt_masks, pred_masks)
+    )
+
+  def test_seg2bmap(self):
+    rng = np.random.default_rng(5)
+    masks = _random_masks(rng, num_frames=4, height=30, width=40)
+    masks[0] = 1
+
+    np.testing.assert_array_equal(
+        boundary_measure.seg2bmap(masks),
+        [metrics._seg2bmap(mask) for mask in masks],
+    )
+
+
+def _random_masks(
+    rng: np.random.Generator, num_frames: int, height: int, width: int
+) -> np.ndarray:
+  masks = np.zeros((num_frames, height, width), dtype=np.uint8)
+  for mask in masks:
+    for _ in range(rng.integers(1, 4)):
+      y, x = rng.integers(0, height), rng.integers(0, width)
+      h, w = rng.integers(1, height // 2), rng.integers(1, width // 2)
+      mask[y : y + h, x : x + w] = 1
+  return masks
+
+
+if __name__ == '__main__':
+  absltest.main()
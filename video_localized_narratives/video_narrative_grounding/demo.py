@@ -24,6 +24,7 @@ import os
 from absl import app
 import matplotlib.pyplot as plt
 
+from video_localized_narratives.tools import frame_cache
 from video_localized_narratives.tools import util
 from video_localized_narratives.video_narrative_grounding import vng_dataset
 from video_localized_narratives.video_narrative_grounding import vng_expression
@@ -48,6 +49,8 @@ ORIG_MASKS_FILENAME = os.path.join(
 FIRST_VIDEO_IDX = 60
 N_VIDEOS = 3
 MAX_FRAMES_PER_OBJ_TO_SHOW = 3
+# Expressions of the same video show the same frames, so we cache them.
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
 
 
 def visualize_vng(vng_vid: vng_video.VNGVideo) -> None:
@@ -77,6 +80,7 @@ def main(argv: Sequence[str]) -> None:
   if len(argv) > 1:
     raise app.UsageError('Too many command-line arguments.')
 
+  frame_cache.configure_default_cache(FRAME_CACHE_BYTES, read_only=True)
   dataset = vng_dataset.VNGDataset(
       meta_filename=META_FILENAME, orig_masks_filename=ORIG_MASKS_FILENAME,
       extra_masks_filename=EXTRA_MASKS_FILENAME, frames_path=FRAMES_PATH)
@@ -15,19 +15,19 @@
 """Evaluate a VNG result against the ground truth to get the J&F score."""
 
 from collections.abc import Sequence
+import time
 
 from absl import app
 from absl import flags
-from davis2017 import metrics
-import numpy as np
-from multiprocessing import Pool
 
-from pathlib import Path
-from video_localized_narratives.tools import frame
-from video_localized_narratives.tools import util
+from video_localized_narratives.tools import bootstrap
+from video_localized_narratives.tools import instrumentation
+from video_localized_narratives.tools import sharding
+from video_localized_narratives.video_narrative_grounding import score_cache
+from video_localized_narratives.video_narrative_grounding import vng_aggregation
 from video_localized_narratives.video_narrative_grounding import vng_dataset
-from video_localized_narratives.video_narrative_grounding import vng_expression
-from video_localized_narratives.video_narrative_grounding import vng_video
+from video_localized_narratives.video_narrative_grounding import vng_evaluation
+from video_localized_narratives.video_narrative_grounding import vng_results
 
 
 _META_FILENAME_FLAG = flags.DEFINE_string(
@@ -52,14 +52,115 @@ _RESULT_FOLDER_FLAG = flags.DEFINE_string(
     'result_folder',
     default=None,
     required=True,
-    help='The path to the folder with VNG results.'
+    help='The path to the folder with VNG results, or to a json or jsonl '
+         'file with RLE-encoded VNG results (see vng_results.py).'
 )
 _PARALLEL_FLAG = flags.DEFINE_boolean(
     'parallel',
     default=True,
     help='Whether to run in parallel. Disable for better debuggability.')
+_NUM_WORKERS_FLAG = flags.DEFINE_integer(
+    'num_workers',
+    default=None,
+    lower_bound=1,
+    help='The number of worker processes when running in parallel. Defaults '
+         'to the number of CPUs available to this process.'
+)
+_SCORE_CACHE_FILENAME_FLAG = flags.DEFINE_string(
+    'score_cache_filename',
+    default=None,
+    help='Optional jsonl file in which the scores of the expressions are '
+         'cached. Expressions for which the predicted masks did not change are '
+         'not evaluated again, and an interrupted evaluation resumes where it '
+         'stopped.'
+)
+_NUM_SHARDS_FLAG = flags.DEFINE_integer(
+    'num_shards',
+    default=1,
+    lower_bound=1,
+    help='The number of shards into which the videos are split, e.g. to '
+         'evaluate on several machines. See merge_eval_vng.py.'
+)
+_SHARD_INDEX_FLAG = flags.DEFINE_integer(
+    'shard_index',
+    default=0,
+    lower_bound=0,
+    help='The shard to evaluate, in [0, num_shards).'
+)
+_PARTIAL_RESULT_FILENAME_FLAG = flags.DEFINE_string(
+    'partial_result_filename',
+    default=None,
+    help='Optional json file to which the scores of the evaluated expressions '
+         'are written, for merging the shards with merge_eval_vng.py.'
+)
+_INSTRUMENT_FLAG = flags.DEFINE_boolean(
+    'instrument',
+    default=False,
+    help='Whether to measure the time of each phase of the evaluation (e.g. '
+         'loading, decoding, metrics) and count frames, pixels and bytes read. '
+         'The report is printed at the end.'
+)
+_INSTRUMENTATION_FILENAME_FLAG = flags.DEFINE_string(
+    'instrumentation_filename',
+    default=None,
+    help='Optional json file for the report of --instrument.'
+)
+_CHUNK_SIZE_FLAG = flags.DEFINE_integer(
+    'chunk_size',
+    default=None,
+    lower_bound=1,
+    help='If set, the frames of an expression are evaluated in chunks of this '
+         'many frames, so that the memory usage does not depend on the length '
+         'of the video. By default, all frames are evaluated at once.'
+)
+_BOUNDARY_ENGINE_FLAG = flags.DEFINE_enum(
+    'boundary_engine',
+    default='davis2017',
+    enum_values=['davis2017', 'builtin'],
+    help='The implementation of the boundary F-measure. "davis2017" uses the '
+         'DAVIS 2017 toolkit, "builtin" uses boundary_measure.py, which gives '
+         'the same scores up to numerical precision and is faster for masks '
+         'without noise.'
+)
+_MASK_CACHE_BYTES_FLAG = flags.DEFINE_integer(
+    'mask_cache_bytes',
+    default=128 * 1024 * 1024,
+    lower_bound=0,
+    help='The memory budget per worker for decoded ground truth masks, which '
+         'are shared by the expressions of the same object. 0 disables it.'
+)
+_BOOTSTRAP_RESAMPLES_FLAG = flags.DEFINE_integer(
+    'bootstrap_resamples',
+    default=0,
+    lower_bound=0,
+    help='If positive, the 95% confidence interval of J&F is estimated with '
+         'this many bootstrap resamples of the videos, see tools/bootstrap.py.'
+)
+_FRAME_STRIDE_FLAG = flags.DEFINE_integer(
+    'frame_stride',
+    default=1,
+    lower_bound=1,
+    help='If larger than 1, only every frame_stride-th annotated frame of each '
+         'expression is evaluated, for a quick approximate J&F with its '
+         'standard error, see frame_subsampling.py.'
+)
+_MAX_FRAMES_PER_EXPRESSION_FLAG = flags.DEFINE_integer(
+    'max_frames_per_expression',
+    default=None,
+    lower_bound=1,
+    help='If set, at most this many evenly spaced annotated frames of each '
+         'expression are evaluated, for a quick approximate J&F with its '
+         'standard error, see frame_subsampling.py.'
+)
 
-_WORKER_COUNT = 12
+# The evaluation moved to vng_evaluation.py and vng_results.py. These aliases
+# keep the old entry points working for code which imports eval_vng.
+evaluate = vng_evaluation.evaluate
+evaluate_video = vng_evaluation.evaluate_video
+evaluate_expression = vng_evaluation.evaluate_expression
+_load_pred_mask_filename_by_frame_number = (
+    vng_results._load_pred_mask_filename_by_frame_number
+)
 
 
 def main(argv: Sequence[str]) -> None:
@@ -71,121 +172,100 @@ def main(argv: Sequence[str]) -> None:
   orig_masks_filename = _ORIG_MASKS_FILENAME_FLAG.value
   extra_masks_filename = _EXTRA_MASKS_FILENAME_FLAG.value
   run_parallel = _PARALLEL_FLAG.value
+  num_shards = _NUM_SHARDS_FLAG.value
+  shard_index = _SHARD_INDEX_FLAG.value
+  if shard_index >= num_shards:
+    raise app.UsageError('--shard_index must be smaller than --num_shards.')
+  options = vng_evaluation.EvaluationOptions(
+      chunk_size=_CHUNK_SIZE_FLAG.value,
+      boundary_engine=_BOUNDARY_ENGINE_FLAG.value,
+      mask_cache_bytes=_MASK_CACHE_BYTES_FLAG.value,
+      frame_stride=_FRAME_STRIDE_FLAG.value,
+      max_frames_per_expression=_MAX_FRAMES_PER_EXPRESSION_FLAG.value,
+  )
+  if options.subsamples_frames() and (
+      _SCORE_CACHE_FILENAME_FLAG.value is not None
+      or _PARTIAL_RESULT_FILENAME_FLAG.value is not None
+  ):
+    raise app.UsageError(
+        '--score_cache_filename and --partial_result_filename require '
+        'evaluating all frames.'
+    )
 
   dataset = vng_dataset.VNGDataset(
       meta_filename=meta_filename, orig_masks_filename=orig_masks_filename,
       extra_masks_filename=extra_masks_filename, frames_path=None)
 
-  jf, j, f, js_by_video_by_exp, fs_by_video_by_exp = evaluate(
-      dataset, result_folder, run_parallel
+  scores = None
+  if _SCORE_CACHE_FILENAME_FLAG.value is not None:
+    scores = score_cache.ScoreCache(_SCORE_CACHE_FILENAME_FLAG.value)
+
+  video_names = sharding.select_shard(
+      dataset.get_video_names(), num_shards, shard_index
   )
-  print('=======')
-  print(js_by_video_by_exp)
-  print('=======')
-  print(fs_by_video_by_exp)
-  print('=======')
-  print(result_folder)
-  print(f'J&F: {jf}')
-  print(f'J: {j}')
-  print(f'F: {f}')
-
-
-def evaluate(
-    dataset: vng_dataset.VNGDataset, result_folder: str, run_parallel: bool
-) -> tuple[float, float, float, util.JsonData, util.JsonData]:
-  """Evaluate the VNG result against the VNG ground truth."""
-  if run_parallel:
-    args = ((v, result_folder) for v in dataset)
-    with Pool(processes=_WORKER_COUNT) as pool:
-      video_results = pool.starmap(
-          evaluate_video, args)
+
+  instrumentation.enable(_INSTRUMENT_FLAG.value)
+  start_time = time.perf_counter()
+
+  approximate_scores = None
+  if options.subsamples_frames():
+    approximate_scores, js_by_video_by_exp, fs_by_video_by_exp = (
+        vng_evaluation.evaluate_approximate(
+            dataset,
+            result_folder,
+            run_parallel,
+            options,
+            _NUM_WORKERS_FLAG.value,
+            video_names,
+        )
+    )
   else:
-    video_results = []
-    for vid_idx, vng_vid in enumerate(dataset):
-      print(vid_idx, '/', len(dataset))
-      video_result = evaluate_video(vng_vid, result_folder)
-      video_results.append(video_result)
-  assert len(dataset) == len(video_results)
-
-  js_by_video_by_exp = {}
-  fs_by_video_by_exp = {}
-  all_js = []
-  all_fs = []
-  for video_name, video_result in zip(dataset.get_video_names(), video_results):
-    j_by_exp, f_by_exp = video_result
-    js_by_video_by_exp[video_name] = j_by_exp
-    fs_by_video_by_exp[video_name] = f_by_exp
-    all_js.extend(j_by_exp.values())
-    all_fs.extend(f_by_exp.values())
-  j = float(np.mean(all_js))
-  f = float(np.mean(all_fs))
-  jf = 0.5 * (j + f)
-  return jf, j, f, js_by_video_by_exp, fs_by_video_by_exp
-
-
-def evaluate_video(
-    vng_vid: vng_video.VNGVideo, result_folder: str
-) -> tuple[dict[int, float], dict[int, float]]:
-  vid_name = vng_vid.get_name()
-  j_by_exp_id = {}
-  f_by_exp_id = {}
-  for exp_id, vng_exp in enumerate(vng_vid):
-    j_exp, f_exp = evaluate_expression(vng_exp, result_folder, vid_name, exp_id)
-    j_by_exp_id[exp_id] = j_exp
-    f_by_exp_id[exp_id] = f_exp
-  return j_by_exp_id, f_by_exp_id
-
-
-def evaluate_expression(
-    vng_exp: vng_expression.VNGExpression,
-    result_folder: str,
-    vid_name: str,
-    exp_id: int,
-) -> tuple[float, float]:
-  """Evaluate the result for one VNG expression. Return J and F scores."""
-  pred_mask_filename_by_frame_number = _load_pred_mask_filename_by_frame_number(
-      result_folder, vid_name, exp_id
+    _, _, _, js_by_video_by_exp, fs_by_video_by_exp = vng_evaluation.evaluate(
+        dataset,
+        result_folder,
+        run_parallel,
+        options,
+        _NUM_WORKERS_FLAG.value,
+        scores,
+        video_names,
+    )
+  wall_seconds = time.perf_counter() - start_time
+  vng_aggregation.print_scores(
+      result_folder, js_by_video_by_exp, fs_by_video_by_exp
   )
-  gt_masks = []
-  pred_masks = []
-
-  for frame_number, mask in enumerate(vng_exp.get_all_masks()):
-    if mask is None:
-      continue
-    pred_mask_filename = pred_mask_filename_by_frame_number[frame_number]
-    pred_mask = frame.load_img(pred_mask_filename)
-    gt_mask = mask.load()
-    gt_masks.append(gt_mask)
-    pred_masks.append(pred_mask)
-
-  stacked_pred_masks = np.stack(pred_masks)
-  stacked_gt_masks = np.stack(gt_masks)
-  j_per_frame = metrics.db_eval_iou(stacked_gt_masks, stacked_pred_masks)
-  f_per_frame = metrics.db_eval_boundary(stacked_gt_masks, stacked_pred_masks)
-  j = j_per_frame.mean()
-  f = f_per_frame.mean()
-  return j, f
-
-
-def _load_pred_mask_filename_by_frame_number(
-    result_folder: str, vid_name: str, exp_id: int
-) -> dict[int, str]:
-  masks_dir = Path(result_folder) / vid_name / str(exp_id)
-  mask_files = sorted(masks_dir.glob('*.png'))
-  if not mask_files:
-    raise FileNotFoundError(f'Did not find result files: {masks_dir}/*.png')
-  result = {util.frame_number_from_filename(str(f)): str(f) for f in mask_files}
-
-  # Assume contiguous frames.
-  for x in range(1, max(result)):
-    if x not in result:
-      raise ValueError(f'Result pngs are not contiguous: {masks_dir}, {x}')
-
-  # Normalize to 0-indexing.
-  if 0 not in result:
-    assert 1 in result
-    result = {k - 1: v for k, v in result.items()}
-  return result
+  if approximate_scores is not None:
+    print(
+        f'Approximate J&F from {approximate_scores.num_evaluated_frames} of '
+        f'{approximate_scores.num_annotated_frames} annotated frames, '
+        f'standard error: {approximate_scores.jf_standard_error}'
+    )
+  if _BOOTSTRAP_RESAMPLES_FLAG.value:
+    jfs, jf_video_names = vng_aggregation.jf_by_expression(
+        js_by_video_by_exp, fs_by_video_by_exp
+    )
+    ci = bootstrap.confidence_interval(
+        jfs, _BOOTSTRAP_RESAMPLES_FLAG.value, clusters=jf_video_names
+    )
+    print(f'J&F bootstrap: {bootstrap.format_confidence_interval(ci)}')
+  if instrumentation.is_enabled():
+    stats = instrumentation.get_stats()
+    print('=======')
+    print(instrumentation.format_report(stats, wall_seconds))
+    if _INSTRUMENTATION_FILENAME_FLAG.value is not None:
+      instrumentation.write_report_json(
+          _INSTRUMENTATION_FILENAME_FLAG.value, stats, wall_seconds
+      )
+  if _PARTIAL_RESULT_FILENAME_FLAG.value is not None:
+    sharding.write_partial_results(
+        _PARTIAL_RESULT_FILENAME_FLAG.value,
+        vng_aggregation.PARTIAL_RESULTS_KIND,
+        num_shards,
+        shard_index,
+        len(dataset),
+        vng_aggregation.scores_to_partial(
+            result_folder, js_by_video_by_exp, fs_by_video_by_exp
+        ),
+    )
 
 
 if __name__ == '__main__':
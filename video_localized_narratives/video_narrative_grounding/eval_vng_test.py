@@ -0,0 +1,130 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from video_localized_narratives.video_narrative_grounding import vng_evaluation
+from video_localized_narratives.video_narrative_grounding import vng_results
+from video_localized_narratives.video_narrative_grounding import vng_test_utils
+
+from absl.testing import absltest
+
+
+_REPO_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+# eval_vng is imported in a separate process, because its flags would clash
+# with the flags of other binaries imported by tests in the same process.
+_OLD_ENTRY_POINTS_SCRIPT = """
+import json
+import sys
+
+from video_localized_narratives.video_narrative_grounding import eval_vng
+from video_localized_narratives.video_narrative_grounding import vng_dataset
+
+meta_filename, orig_masks_filename, extra_masks_filename, result_folder = (
+    sys.argv[1:]
+)
+dataset = vng_dataset.VNGDataset(
+    meta_filename, orig_masks_filename, extra_masks_filename, None
+)
+vng_vid = dataset[0]
+jf, j, f, js, fs = eval_vng.evaluate(dataset, result_folder, False)
+j_by_exp_id, f_by_exp_id = eval_vng.evaluate_video(vng_vid, result_folder)
+j_exp, f_exp = eval_vng.evaluate_expression(
+    vng_vid[0], result_folder, vng_vid.get_name(), 0
+)
+filename_by_frame_number = eval_vng._load_pred_mask_filename_by_frame_number(
+    result_folder, vng_vid.get_name(), 0
+)
+print(json.dumps({
+    'evaluate': [jf, j, f, js, fs],
+    'evaluate_video': [j_by_exp_id, f_by_exp_id],
+    'evaluate_expression': [j_exp, f_exp],
+    'filename_by_frame_number': filename_by_frame_number,
+}))
+"""
+
+
+def _to_json(data):
+  """Convert like json.dumps and json.loads, e.g. np.float64 to float."""
+  return json.loads(json.dumps(data, default=float))
+
+
+class EvalVngTest(absltest.TestCase):
+
+  def test_old_entry_points(self):
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    data = vng_test_utils.write_dataset(tmp_dir.name, num_videos=3)
+    result_folder = os.path.join(tmp_dir.name, 'results')
+    vng_test_utils.write_png_results(data.pred_masks, result_folder)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [_REPO_ROOT] + env.get('PYTHONPATH', '').split(os.pathsep)
+    )
+
+    output = subprocess.run(
+        [
+            sys.executable,
+            '-c',
+            _OLD_ENTRY_POINTS_SCRIPT,
+            data.meta_filename,
+            data.orig_masks_filename,
+            data.extra_masks_filename,
+            result_folder,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    # The last line is the json, after the progress of the evaluation.
+    scores = json.loads(output.splitlines()[-1])
+
+    dataset = data.load_dataset()
+    vng_vid = dataset[0]
+    self.assertEqual(
+        scores['evaluate'],
+        _to_json(vng_evaluation.evaluate(dataset, result_folder, False)),
+    )
+    self.assertEqual(
+        scores['evaluate_video'],
+        _to_json(vng_evaluation.evaluate_video(vng_vid, result_folder)),
+    )
+    self.assertEqual(
+        scores['evaluate_expression'],
+        _to_json(
+            vng_evaluation.evaluate_expression(
+                vng_vid[0], result_folder, vng_vid.get_name(), 0
+            )
+        ),
+    )
+    self.assertEqual(
+        scores['filename_by_frame_number'],
+        _to_json(
+            vng_results._load_pred_mask_filename_by_frame_number(
+                result_folder, vng_vid.get_name(), 0
+            )
+        ),
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,97 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Select a subset of the annotated frames for an approximate J&F.
+
+The J and F of an expression are means over its annotated frames. Evaluating
+only a deterministic, evenly spaced subset of the frames gives an estimate of
+these means, e.g. for a quick validation during training. The subset is
+stratified: the annotated frames are split into consecutive strata of equal
+length and one frame is taken from each, so the whole expression is covered.
+
+The standard error of the estimated J&F treats the frames of each expression as
+a simple random sample without replacement from its annotated frames. This is
+usually conservative for evenly spaced frames, since consecutive frames are
+similar. If all frames are evaluated, the standard error is 0 and the scores
+are exact.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+def select_frames(
+    num_frames: int,
+    frame_stride: int = 1,
+    max_frames: Optional[int] = None,
+) -> list[int]:
+  """Select the frames to evaluate among the annotated frames of an expression.
+
+  Args:
+    num_frames: the number of annotated frames of the expression.
+    frame_stride: every frame_stride-th annotated frame is selected.
+    max_frames: if given, at most this many frames are selected, evenly spaced
+      from the middle of equally long strata.
+
+  Returns:
+    The sorted indices of the selected frames among the annotated frames.
+  """
+  if frame_stride < 1 or (max_frames is not None and max_frames < 1):
+    raise ValueError(
+        f'Invalid frame subsampling: frame_stride={frame_stride}, '
+        f'max_frames={max_frames}.'
+    )
+  indices = list(range(0, num_frames, frame_stride))
+  if max_frames is not None and len(indices) > max_frames:
+    strata_length = len(indices) / max_frames
+    indices = [
+        indices[int((i + 0.5) * strata_length)] for i in range(max_frames)
+    ]
+  return indices
+
+
+def variance_of_mean(values: np.ndarray, num_frames: int) -> float:
+  """The variance of the mean of the selected values as an estimate.
+
+  Args:
+    values: the per-frame scores of the selected frames.
+    num_frames: the number of annotated frames the values were selected from.
+
+  Returns:
+    The estimated variance, with the finite population correction, i.e. 0 if
+    all frames were selected. A single selected frame gives no estimate of the
+    spread, then the variance is 0 as well.
+  """
+  num_values = len(values)
+  if num_values < 2 or num_values >= num_frames:
+    return 0.0
+  finite_population_correction = 1 - num_values / num_frames
+  return float(
+      finite_population_correction * np.var(values, ddof=1) / num_values
+  )
+
+
+def standard_error_of_mean(variances: list[float]) -> float:
+  """The standard error of the mean over the expressions of their estimates.
+
+  Args:
+    variances: the variance of the estimate of each expression, see
+      variance_of_mean. The estimates of different expressions are treated as
+      independent, so the variances add up.
+
+  Returns:
+    The standard error.
+  """
+  return float(np.sqrt(np.sum(variances)) / len(variances))
@@ -0,0 +1,80 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from video_localized_narratives.video_narrative_grounding import frame_subsampling
+
+from absl.testing import absltest
+
+
+class FrameSubsamplingTest(absltest.TestCase):
+
+  def test_select_frames(self):
+    self.assertEqual(frame_subsampling.select_frames(5), [0, 1, 2, 3, 4])
+    self.assertEqual(
+        frame_subsampling.select_frames(7, frame_stride=3), [0, 3, 6]
+    )
+    self.assertEqual(
+        frame_subsampling.select_frames(10, max_frames=3), [1, 5, 8]
+    )
+    self.assertEqual(
+        frame_subsampling.select_frames(10, frame_stride=2, max_frames=2),
+        [2, 6],
+    )
+    self.assertEqual(
+        frame_subsampling.select_frames(3, max_frames=10), [0, 1, 2]
+    )
+    self.assertEqual(frame_subsampling.select_frames(0, max_frames=3), [])
+
+  def test_invalid_subsampling(self):
+    with self.assertRaises(ValueError):
+      frame_subsampling.select_frames(10, frame_stride=0)
+    with self.assertRaises(ValueError):
+      frame_subsampling.select_frames(10, max_frames=0)
+
+  def test_variance_of_mean(self):
+    values = np.array([0.2, 0.4, 0.9])
+
+    self.assertEqual(frame_subsampling.variance_of_mean(values, 3), 0.0)
+    self.assertEqual(frame_subsampling.variance_of_mean(values[:1], 3), 0.0)
+    self.assertAlmostEqual(
+        frame_subsampling.variance_of_mean(values, 12),
+        0.75 * np.var(values, ddof=1) / 3,
+    )
+
+  def test_standard_error_converges(self):
+    # The standard error over many subsampled expressions matches the spread
+    # of the estimates, and shrinks to 0 as the budget grows.
+    rng = np.random.default_rng(0)
+    scores = rng.random((200, 40))
+    standard_errors = []
+    for max_frames in [4, 10, 40]:
+      indices = frame_subsampling.select_frames(40, max_frames=max_frames)
+      variances = [
+          frame_subsampling.variance_of_mean(s[indices], 40) for s in scores
+      ]
+      standard_errors.append(
+          frame_subsampling.standard_error_of_mean(variances)
+      )
+      estimate = scores[:, indices].mean(axis=1).mean()
+      self.assertLess(
+          abs(estimate - scores.mean()), 4 * standard_errors[-1] + 1e-12
+      )
+    self.assertGreater(standard_errors[0], standard_errors[1])
+    self.assertEqual(standard_errors[2], 0.0)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -12,19 +12,87 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Provides the Mask class for a segmentation mask in a single frame."""
+"""Provides the Mask class for a segmentation mask in a single frame.
 
+Decoded masks are kept in a process-wide LRU cache with a byte budget, so that
+expressions referring to the same object share their decoded masks. The cache
+is disabled by default, see configure_mask_cache. The area and the bounding box
+of a mask are computed from its RLE, without decoding it. load_packed decodes a
+mask to one bit per pixel, so that 8 times more masks fit into the cache.
+"""
 
-from typing import Any
+
+from typing import Any, Hashable, Optional
 import numpy as np
 from pycocotools import mask as cocomask
 
+from video_localized_narratives.tools import frame_cache
+from video_localized_narratives.tools import packed_mask
+
 
 class Mask:
   """A segmentation mask in a single frame of a video."""
 
   def __init__(self, rle: dict[str, Any]):
     self._rle = rle
+    self._area: Optional[int] = None
+    self._bbox: Optional[tuple[float, float, float, float]] = None
+
+  def get_rle(self) -> dict[str, Any]:
+    return self._rle
 
   def load(self) -> np.ndarray:
+    """Decode the mask. The result is read-only if the mask cache is enabled."""
+    return _mask_cache.get_or_load(self._get_cache_key(), self._decode)
+
+  def load_packed(self) -> packed_mask.PackedMask:
+    """Decode the mask to bits. They are read-only if the cache is enabled."""
+    _, width = self._rle['size']
+    bits = _mask_cache.get_or_load(
+        (self._get_cache_key(), 'packed'),
+        lambda: packed_mask.PackedMask.from_rle(self._rle).bits,
+    )
+    return packed_mask.PackedMask(bits=bits, width=width)
+
+  def get_area(self) -> int:
+    if self._area is None:
+      self._area = int(cocomask.area(self._rle))
+    return self._area
+
+  def get_bbox(self) -> tuple[float, float, float, float]:
+    """The bounding box [x, y, width, height] of the mask."""
+    if self._bbox is None:
+      self._bbox = tuple(float(v) for v in cocomask.toBbox(self._rle))
+    return self._bbox
+
+  def is_empty(self) -> bool:
+    return self.get_area() == 0
+
+  def get_num_pixels(self) -> int:
+    height, width = self._rle['size']
+    return height * width
+
+  def _decode(self) -> np.ndarray:
     return cocomask.decode(self._rle)
+
+  def _get_cache_key(self) -> Hashable:
+    # The key is the content of the RLE, so that equal masks of different
+    # Mask objects (e.g. of different expressions) share the cache entry.
+    counts = self._rle['counts']
+    if isinstance(counts, list):
+      counts = tuple(counts)
+    return tuple(self._rle['size']), counts
+
+
+# The process-wide cache for decoded masks. It is disabled by default.
+_mask_cache = frame_cache.FrameCache(max_bytes=0, read_only=True)
+
+
+def configure_mask_cache(max_bytes: int) -> None:
+  """Replace the process-wide mask cache with a cache of the given size."""
+  global _mask_cache
+  _mask_cache = frame_cache.FrameCache(max_bytes, read_only=True)
+
+
+def get_mask_cache_stats() -> frame_cache.CacheStats:
+  return _mask_cache.get_stats()
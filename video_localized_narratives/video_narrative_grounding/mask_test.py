@@ -0,0 +1,80 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.video_narrative_grounding import mask
+
+from absl.testing import absltest
+
+
+def _encode(arr: np.ndarray) -> dict[str, str]:
+  rle = cocomask.encode(np.asfortranarray(arr))
+  rle['counts'] = rle['counts'].decode()
+  return rle
+
+
+class MaskTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.addCleanup(mask.configure_mask_cache, 0)
+
+  def test_area_and_bbox_without_decoding(self):
+    arr = np.zeros((20, 30), dtype=np.uint8)
+    arr[5:9, 10:16] = 1
+    m = mask.Mask(_encode(arr))
+
+    self.assertEqual(m.get_area(), 24)
+    self.assertEqual(m.get_bbox(), (10.0, 5.0, 6.0, 4.0))
+    self.assertFalse(m.is_empty())
+    self.assertEqual(m.get_num_pixels(), 600)
+    self.assertTrue(mask.Mask(_encode(np.zeros_like(arr))).is_empty())
+
+  def test_equal_masks_share_decoded_array(self):
+    mask.configure_mask_cache(max_bytes=1024 * 1024)
+    arr = np.zeros((20, 30), dtype=np.uint8)
+    arr[2:4, 3:7] = 1
+    # Two expressions of the same object have separate Mask objects.
+    first = mask.Mask(_encode(arr))
+    second = mask.Mask(_encode(arr))
+
+    first_loaded = first.load()
+    second_loaded = second.load()
+
+    np.testing.assert_array_equal(first_loaded, arr)
+    self.assertIs(first_loaded, second_loaded)
+    self.assertFalse(second_loaded.flags.writeable)
+    stats = mask.get_mask_cache_stats()
+    self.assertEqual((stats.hits, stats.misses), (1, 1))
+
+  def test_load_packed(self):
+    mask.configure_mask_cache(max_bytes=1024 * 1024)
+    arr = np.zeros((20, 30), dtype=np.uint8)
+    arr[2:4, 3:17] = 1
+    m = mask.Mask(_encode(arr))
+
+    packed = m.load_packed()
+
+    np.testing.assert_array_equal(packed.to_dense(), arr)
+    self.assertEqual(packed.count(), m.get_area())
+    self.assertEqual(packed.nbytes, 20 * 4)
+    self.assertIs(m.load_packed().bits, packed.bits)
+    # The packed and the unpacked mask are cached separately.
+    np.testing.assert_array_equal(m.load(), arr)
+
+
+if __name__ == '__main__':
+  absltest.main()
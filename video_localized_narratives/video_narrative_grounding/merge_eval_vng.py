@@ -0,0 +1,61 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Merge the partial results of a sharded VNG evaluation.
+
+Run eval_vng.py once per shard with --num_shards, --shard_index and
+--partial_result_filename, then merge the partial result files. This prints
+the same scores as evaluating all shards at once.
+"""
+
+from collections.abc import Sequence
+
+from absl import app
+from absl import flags
+
+from video_localized_narratives.tools import sharding
+from video_localized_narratives.video_narrative_grounding import vng_aggregation
+
+
+_PARTIAL_RESULT_FILENAMES_FLAG = flags.DEFINE_list(
+    'partial_result_filenames',
+    default=None,
+    required=True,
+    help='Comma-separated list of the partial result files of all shards.'
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  num_videos, partial_scores = sharding.load_partial_results(
+      _PARTIAL_RESULT_FILENAMES_FLAG.value,
+      vng_aggregation.PARTIAL_RESULTS_KIND,
+  )
+  result_folder, js_by_video_by_exp, fs_by_video_by_exp = (
+      vng_aggregation.scores_from_partials(partial_scores)
+  )
+  if len(js_by_video_by_exp) != num_videos:
+    raise ValueError(
+        f'Expected scores for {num_videos} videos, got '
+        f'{len(js_by_video_by_exp)}.'
+    )
+  vng_aggregation.print_scores(
+      result_folder, js_by_video_by_exp, fs_by_video_by_exp
+  )
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,93 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A persistent cache for the J and F scores of VNG expressions.
+
+The cache is a jsonl file with one line per evaluated expression:
+  {"key": "...", "j": 0.5, "f": 0.5}
+
+The key identifies the expression, its ground truth annotation, the content of
+the predicted masks and the evaluation options which change the scores (see
+make_key). Scores are appended as soon as they are computed, so an interrupted
+evaluation resumes where it stopped, and a re-evaluation only recomputes the
+expressions for which the predictions changed.
+"""
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+
+class ScoreCache:
+  """The J and F scores of expressions, backed by a jsonl file."""
+
+  def __init__(self, filename: str):
+    self._filename = filename
+    self._scores = _load_scores(filename)
+    _terminate_last_line(filename)
+
+  def __len__(self) -> int:
+    return len(self._scores)
+
+  def get(self, key: str) -> Optional[tuple[np.float64, np.float64]]:
+    """Return J and F for the key, or None if they are not cached."""
+    if key not in self._scores:
+      return None
+    j, f = self._scores[key]
+    # evaluate_expression returns np.float64, so we do the same.
+    return np.float64(j), np.float64(f)
+
+  def put(self, key: str, j: float, f: float) -> None:
+    self._scores[key] = (float(j), float(f))
+    line = json.dumps({'key': key, 'j': float(j), 'f': float(f)})
+    with open(self._filename, 'a') as f_out:
+      f_out.write(line + '\n')
+
+
+def make_key(
+    vid_name: str,
+    exp_id: int,
+    ann_id: int,
+    pred_content_hash: str,
+    boundary_engine: str,
+) -> str:
+  return f'{vid_name}/{exp_id}/{ann_id}/{boundary_engine}/{pred_content_hash}'
+
+
+def _terminate_last_line(filename: str) -> None:
+  """Make sure new lines are not appended to an incomplete last line."""
+  if not os.path.exists(filename) or os.path.getsize(filename) == 0:
+    return
+  with open(filename, 'rb+') as f:
+    f.seek(-1, os.SEEK_END)
+    if f.read(1) != b'\n':
+      f.write(b'\n')
+
+
+def _load_scores(filename: str) -> dict[str, tuple[float, float]]:
+  scores = {}
+  if not os.path.exists(filename):
+    return scores
+  with open(filename) as f:
+    for line in f:
+      try:
+        d = json.loads(line)
+      except json.JSONDecodeError:
+        # The last line is incomplete if the evaluation was killed while
+        # writing it.
+        continue
+      scores[d['key']] = (d['j'], d['f'])
+  return scores
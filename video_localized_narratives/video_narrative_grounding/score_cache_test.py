@@ -0,0 +1,64 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+import numpy as np
+
+from video_localized_narratives.video_narrative_grounding import score_cache
+
+from absl.testing import absltest
+
+
+class ScoreCacheTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self._filename = os.path.join(temp_dir.name, 'scores.jsonl')
+
+  def test_scores_persist_exactly(self):
+    filename = self._filename
+    key = score_cache.make_key('video', 0, 7, 'abc', 'davis2017')
+    j = np.float64(1 / 3)
+    f = np.float64(2 / 7)
+
+    score_cache.ScoreCache(filename).put(key, j, f)
+    scores = score_cache.ScoreCache(filename)
+
+    self.assertLen(scores, 1)
+    self.assertEqual(scores.get(key), (j, f))
+    self.assertIsInstance(scores.get(key)[0], np.float64)
+    self.assertIsNone(scores.get(key + 'x'))
+
+  def test_resumes_after_incomplete_line(self):
+    filename = self._filename
+    score_cache.ScoreCache(filename).put('a', 0.5, 0.25)
+    with open(filename, 'a') as f:
+      f.write('{"key": "b", "j"')
+
+    scores = score_cache.ScoreCache(filename)
+    scores.put('c', 0.75, 1.0)
+    scores = score_cache.ScoreCache(filename)
+
+    self.assertLen(scores, 2)
+    self.assertEqual(scores.get('a'), (0.5, 0.25))
+    self.assertIsNone(scores.get('b'))
+    self.assertEqual(scores.get('c'), (0.75, 1.0))
+
+
+if __name__ == '__main__':
+  absltest.main()
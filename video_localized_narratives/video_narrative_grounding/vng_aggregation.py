@@ -0,0 +1,126 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Aggregate and print the per-expression scores of a VNG evaluation.
+
+The scores are dicts video_name -> exp_id -> score, ordered like the dataset,
+i.e. by video name and then by expression id. The order matters, because it
+determines the order of the summation for the means.
+"""
+
+import numpy as np
+
+from video_localized_narratives.tools import util
+
+
+PARTIAL_RESULTS_KIND = 'vng'
+
+
+def aggregate_scores(
+    js_by_video_by_exp: util.JsonData, fs_by_video_by_exp: util.JsonData
+) -> tuple[float, float, float]:
+  """Return J&F, J and F averaged over all expressions."""
+  all_js = []
+  all_fs = []
+  for vid_name, j_by_exp in js_by_video_by_exp.items():
+    all_js.extend(j_by_exp.values())
+    all_fs.extend(fs_by_video_by_exp[vid_name].values())
+  j = float(np.mean(all_js))
+  f = float(np.mean(all_fs))
+  jf = 0.5 * (j + f)
+  return jf, j, f
+
+
+def jf_by_expression(
+    js_by_video_by_exp: util.JsonData, fs_by_video_by_exp: util.JsonData
+) -> tuple[np.ndarray, list[str]]:
+  """Return the J&F of each expression and its video name, e.g. to bootstrap.
+
+  The mean of the J&F of the expressions is the J&F of aggregate_scores, up to
+  the rounding of the summation.
+  """
+  jfs = []
+  video_names = []
+  for vid_name, j_by_exp in js_by_video_by_exp.items():
+    f_by_exp = fs_by_video_by_exp[vid_name]
+    for exp_id, j in j_by_exp.items():
+      jfs.append(0.5 * (j + f_by_exp[exp_id]))
+      video_names.append(vid_name)
+  return np.array(jfs, dtype=np.float64), video_names
+
+
+def print_scores(
+    result_folder: str,
+    js_by_video_by_exp: util.JsonData,
+    fs_by_video_by_exp: util.JsonData,
+) -> None:
+  jf, j, f = aggregate_scores(js_by_video_by_exp, fs_by_video_by_exp)
+  print('=======')
+  print(js_by_video_by_exp)
+  print('=======')
+  print(fs_by_video_by_exp)
+  print('=======')
+  print(result_folder)
+  print(f'J&F: {jf}')
+  print(f'J: {j}')
+  print(f'F: {f}')
+
+
+def scores_to_partial(
+    result_folder: str,
+    js_by_video_by_exp: util.JsonData,
+    fs_by_video_by_exp: util.JsonData,
+) -> util.JsonData:
+  """Convert the scores of a shard to json, see tools/sharding.py."""
+  return {
+      'result_folder': result_folder,
+      'j': scores_to_json(js_by_video_by_exp),
+      'f': scores_to_json(fs_by_video_by_exp),
+  }
+
+
+def scores_from_partials(
+    partial_scores: list[util.JsonData],
+) -> tuple[str, util.JsonData, util.JsonData]:
+  """Merge the scores of all shards, restoring the order of the dataset."""
+  js_by_video_by_exp = {}
+  fs_by_video_by_exp = {}
+  for scores in partial_scores:
+    js_by_video_by_exp.update(_from_json(scores['j']))
+    fs_by_video_by_exp.update(_from_json(scores['f']))
+  result_folder = partial_scores[0]['result_folder']
+  return (
+      result_folder,
+      dict(sorted(js_by_video_by_exp.items())),
+      dict(sorted(fs_by_video_by_exp.items())),
+  )
+
+
+def scores_to_json(scores_by_video_by_exp: util.JsonData) -> util.JsonData:
+  """Convert the scores to json data with string keys and Python floats."""
+  # Python floats are written with enough digits to be read back exactly.
+  return {
+      vid_name: {str(exp_id): float(s) for exp_id, s in s_by_exp.items()}
+      for vid_name, s_by_exp in scores_by_video_by_exp.items()
+  }
+
+
+def _from_json(scores_by_video_by_exp: util.JsonData) -> util.JsonData:
+  # evaluate_expression returns np.float64, so we do the same.
+  return {
+      vid_name: dict(
+          sorted((int(exp_id), np.float64(s)) for exp_id, s in s_by_exp.items())
+      )
+      for vid_name, s_by_exp in scores_by_video_by_exp.items()
+  }
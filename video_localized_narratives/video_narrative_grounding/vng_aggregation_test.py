@@ -0,0 +1,114 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+import numpy as np
+
+from video_localized_narratives.tools import sharding
+from video_localized_narratives.video_narrative_grounding import vng_aggregation
+
+from absl.testing import absltest
+
+
+def _random_scores(rng, video_names, num_exps_by_video):
+  scores = {}
+  for vid_name in video_names:
+    values = rng.random(num_exps_by_video[vid_name])
+    # Include the special values of empty and perfect masks.
+    values[rng.random(len(values)) < 0.2] = 1.0
+    scores[vid_name] = {
+        exp_id: np.float64(s) for exp_id, s in enumerate(values)
+    }
+  return scores
+
+
+class VngAggregationTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    self.tmp_dir = tmp_dir.name
+    rng = np.random.default_rng(0)
+    self.video_names = sorted(f'video_{i}' for i in range(40))
+    num_exps_by_video = {
+        vid_name: int(rng.integers(1, 5)) for vid_name in self.video_names
+    }
+    self.js = _random_scores(rng, self.video_names, num_exps_by_video)
+    self.fs = _random_scores(rng, self.video_names, num_exps_by_video)
+
+  def test_merged_shards_equal_the_unsharded_scores(self):
+    num_shards = 3
+    filenames = []
+    # Write the shards in reverse order, the order of the files is arbitrary.
+    for shard_index in reversed(range(num_shards)):
+      shard_video_names = sharding.select_shard(
+          self.video_names, num_shards, shard_index
+      )
+      filename = os.path.join(self.tmp_dir, f'partial_{shard_index}.json')
+      sharding.write_partial_results(
+          filename,
+          vng_aggregation.PARTIAL_RESULTS_KIND,
+          num_shards,
+          shard_index,
+          len(self.video_names),
+          vng_aggregation.scores_to_partial(
+              'results',
+              {v: self.js[v] for v in shard_video_names},
+              {v: self.fs[v] for v in shard_video_names},
+          ),
+      )
+      filenames.append(filename)
+
+    num_videos, partial_scores = sharding.load_partial_results(
+        filenames, vng_aggregation.PARTIAL_RESULTS_KIND
+    )
+    result_folder, js, fs = vng_aggregation.scores_from_partials(
+        partial_scores
+    )
+
+    self.assertEqual(num_videos, len(self.video_names))
+    self.assertEqual(result_folder, 'results')
+    self.assertEqual(js, self.js)
+    self.assertEqual(fs, self.fs)
+    # The same order gives exactly the same sums.
+    self.assertEqual(list(js), self.video_names)
+    self.assertEqual(
+        vng_aggregation.aggregate_scores(js, fs),
+        vng_aggregation.aggregate_scores(self.js, self.fs),
+    )
+
+  def test_jf_by_expression_agrees_with_aggregate_scores(self):
+    jf, _, _ = vng_aggregation.aggregate_scores(self.js, self.fs)
+    jfs, video_names = vng_aggregation.jf_by_expression(self.js, self.fs)
+
+    self.assertEqual(
+        video_names,
+        [v for v in self.video_names for _ in range(len(self.js[v]))],
+    )
+    np.testing.assert_array_equal(
+        jfs,
+        [
+            0.5 * (self.js[v][exp_id] + self.fs[v][exp_id])
+            for v in self.video_names
+            for exp_id in self.js[v]
+        ],
+    )
+    self.assertAlmostEqual(jfs.mean(), jf, places=12)
+
+
+if __name__ == '__main__':
+  absltest.main()
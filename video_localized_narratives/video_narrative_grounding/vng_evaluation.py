@@ -0,0 +1,602 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Evaluate VNG results against the ground truth.
+
+This is the library behind eval_vng.py, e.g. for evaluating from other tools
+without the command line flags of eval_vng.py.
+
+For a quick approximate J&F, e.g. for validation during training, only a
+subset of the annotated frames can be evaluated with the frame_stride and
+max_frames_per_expression options, see evaluate_approximate.
+"""
+
+from collections.abc import Callable, Iterable, Iterator, Sequence
+import contextlib
+import dataclasses
+from typing import Any, Optional
+
+from davis2017 import metrics
+import numpy as np
+from multiprocessing import Pool
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.tools import instrumentation
+from video_localized_narratives.tools import progress
+from video_localized_narratives.tools import util
+from video_localized_narratives.video_narrative_grounding import boundary_measure
+from video_localized_narratives.video_narrative_grounding import frame_subsampling
+from video_localized_narratives.video_narrative_grounding import mask
+from video_localized_narratives.video_narrative_grounding import score_cache
+from video_localized_narratives.video_narrative_grounding import vng_aggregation
+from video_localized_narratives.video_narrative_grounding import vng_dataset
+from video_localized_narratives.video_narrative_grounding import vng_expression
+from video_localized_narratives.video_narrative_grounding import vng_results
+from video_localized_narratives.video_narrative_grounding import vng_video
+
+
+# The number of tasks per worker, which determines the chunk size for the pool.
+# Since the tasks are sorted by size, small chunks are only used at the end.
+_TASKS_PER_WORKER = 32
+_MAX_CHUNK_SIZE = 16
+
+
+@dataclasses.dataclass(frozen=True)
+class EvaluationOptions:
+  """Options for how the evaluation is run.
+
+  They do not change the scores, except for frame_stride and
+  max_frames_per_expression, which evaluate only a subset of the frames.
+  """
+
+  # The number of frames of an expression which are evaluated at once. If None,
+  # all frames are evaluated at once.
+  chunk_size: Optional[int] = None
+  # Either 'davis2017' or 'builtin'.
+  boundary_engine: str = 'davis2017'
+  # The memory budget per worker for decoded ground truth masks.
+  mask_cache_bytes: int = 0
+  # Only every frame_stride-th annotated frame of an expression is evaluated.
+  frame_stride: int = 1
+  # If set, at most this many annotated frames of an expression are evaluated.
+  max_frames_per_expression: Optional[int] = None
+
+  def subsamples_frames(self) -> bool:
+    return self.frame_stride != 1 or self.max_frames_per_expression is not None
+
+  def select_frames(self, num_frames: int) -> list[int]:
+    """The indices of the annotated frames to evaluate."""
+    return frame_subsampling.select_frames(
+        num_frames, self.frame_stride, self.max_frames_per_expression
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class ApproximateScores:
+  """Scores estimated from a subset of the frames, see evaluate_approximate."""
+
+  jf: float
+  j: float
+  f: float
+  # The standard error of jf due to the subsampling of the frames.
+  jf_standard_error: float
+  num_evaluated_frames: int
+  num_annotated_frames: int
+
+
+def evaluate(
+    dataset: vng_dataset.VNGDataset,
+    result_folder: str,
+    run_parallel: bool,
+    options: EvaluationOptions = EvaluationOptions(),
+    num_workers: Optional[int] = None,
+    scores: Optional[score_cache.ScoreCache] = None,
+    video_names: Optional[Sequence[str]] = None,
+    pool: Optional[Pool] = None,
+) -> tuple[float, float, float, util.JsonData, util.JsonData]:
+  """Evaluate the VNG result against the VNG ground truth.
+
+  Args:
+    dataset: the VNG ground truth.
+    result_folder: the folder or file with the VNG results, see vng_results.py.
+    run_parallel: whether to evaluate the expressions in worker processes.
+    options: the options for running the evaluation.
+    num_workers: the number of worker processes. Defaults to the number of
+      available CPUs.
+    scores: if given, the cached scores are reused and the newly computed
+      scores are added to it.
+    video_names: the videos to evaluate, e.g. of one shard. Defaults to all
+      videos of the dataset.
+    pool: an existing pool created with create_pool, which is used instead of
+      starting new worker processes if run_parallel is True. num_workers has
+      to match the size of the pool.
+
+  Returns:
+    J&F, J, F and the J and F scores by video name and expression id.
+
+  Each expression is a separate task. The tasks are started in decreasing order
+  of their number of annotated frames, so that long expressions do not end up
+  at the tail of the evaluation.
+  """
+  if scores is not None and options.subsamples_frames():
+    raise ValueError('The score cache requires evaluating all frames.')
+  videos, tasks, scores_by_task = _evaluate_tasks(
+      dataset,
+      result_folder,
+      run_parallel,
+      options,
+      num_workers,
+      scores,
+      video_names,
+      pool,
+  )
+  js_by_video_by_exp, fs_by_video_by_exp = _scores_by_video_by_exp(
+      videos, tasks, scores_by_task
+  )
+  jf, j, f = vng_aggregation.aggregate_scores(
+      js_by_video_by_exp, fs_by_video_by_exp
+  )
+  return jf, j, f, js_by_video_by_exp, fs_by_video_by_exp
+
+
+def evaluate_approximate(
+    dataset: vng_dataset.VNGDataset,
+    result_folder: str,
+    run_parallel: bool,
+    options: EvaluationOptions,
+    num_workers: Optional[int] = None,
+    video_names: Optional[Sequence[str]] = None,
+    pool: Optional[Pool] = None,
+) -> tuple[ApproximateScores, util.JsonData, util.JsonData]:
+  """Estimate the scores from a subset of the frames of each expression.
+
+  Args:
+    dataset: the VNG ground truth.
+    result_folder: the folder or file with the VNG results, see vng_results.py.
+    run_parallel: whether to evaluate the expressions in worker processes.
+    options: the options for running the evaluation, with the frame_stride and
+      max_frames_per_expression of the subsampling, see frame_subsampling.py.
+    num_workers: the number of worker processes, see evaluate.
+    video_names: the videos to evaluate, see evaluate.
+    pool: an existing pool, see evaluate.
+
+  Returns:
+    The estimated scores with the standard error of J&F, and the estimated J
+    and F scores by video name and expression id. If all frames are selected,
+    the scores are the same as for evaluate.
+  """
+  videos, tasks, scores_by_task = _evaluate_tasks(
+      dataset,
+      result_folder,
+      run_parallel,
+      options,
+      num_workers,
+      None,
+      video_names,
+      pool,
+  )
+  js_by_video_by_exp, fs_by_video_by_exp = _scores_by_video_by_exp(
+      videos, tasks, scores_by_task
+  )
+  jf, j, f = vng_aggregation.aggregate_scores(
+      js_by_video_by_exp, fs_by_video_by_exp
+  )
+  jf_variances = [scores_by_task[i][2] for i in range(len(tasks))]
+  num_annotated_frames = [t[0].get_num_annotated_frames() for t in tasks]
+  approximate_scores = ApproximateScores(
+      jf=jf,
+      j=j,
+      f=f,
+      jf_standard_error=frame_subsampling.standard_error_of_mean(jf_variances),
+      num_evaluated_frames=sum(
+          len(options.select_frames(n)) for n in num_annotated_frames
+      ),
+      num_annotated_frames=sum(num_annotated_frames),
+  )
+  return approximate_scores, js_by_video_by_exp, fs_by_video_by_exp
+
+
+def _evaluate_tasks(
+    dataset: vng_dataset.VNGDataset,
+    result_folder: str,
+    run_parallel: bool,
+    options: EvaluationOptions,
+    num_workers: Optional[int],
+    scores: Optional[score_cache.ScoreCache],
+    video_names: Optional[Sequence[str]],
+    pool: Optional[Pool],
+) -> tuple[
+    list[vng_video.VNGVideo],
+    list[tuple[Any, ...]],
+    dict[int, tuple[float, float, float]],
+]:
+  """Evaluate each expression as a task, see evaluate.
+
+  Returns:
+    The evaluated videos, the tasks and the J, F and the variance of the
+    estimated J&F (see frame_subsampling.py) by task index.
+  """
+  if video_names is None:
+    video_names = dataset.get_video_names()
+  videos = [dataset[vid_name] for vid_name in sorted(video_names)]
+  tasks = []
+  for vng_vid in videos:
+    vid_name = vng_vid.get_name()
+    for exp_id, vng_exp in enumerate(vng_vid):
+      tasks.append((vng_exp, result_folder, vid_name, exp_id, options))
+  task_sizes = [
+      len(options.select_frames(t[0].get_num_annotated_frames()))
+      for t in tasks
+  ]
+  ann_ids = [t[0].get_annotation_id() for t in tasks]
+
+  if run_parallel:
+    if num_workers is None:
+      num_workers = progress.available_cpu_count()
+    # Expressions of the same object have the same size, so sorting them next
+    # to each other lets them share the decoded masks in the same worker.
+    order = sorted(
+        range(len(tasks)),
+        key=lambda i: (-task_sizes[i], tasks[i][2], ann_ids[i]),
+    )
+    chunk_size = _pool_chunk_size(len(tasks), num_workers)
+    if pool is None:
+      pool_context = create_pool(num_workers, options)
+    else:
+      pool_context = contextlib.nullcontext(pool)
+  else:
+    order = list(range(len(tasks)))
+    chunk_size = 1
+    _init_worker(options, instrumentation.is_enabled())
+    pool_context = contextlib.nullcontext()
+
+  j_and_f_by_task = {}
+  with pool_context as pool:
+    cache_keys = {}
+    if scores is not None:
+      key_results = _imap_unordered(
+          pool, _cache_key_task, ((i, tasks[i]) for i in order), chunk_size
+      )
+      for task_idx, key, stats in key_results:
+        instrumentation.add_stats(stats)
+        cache_keys[task_idx] = key
+        cached = scores.get(key)
+        if cached is not None:
+          j_and_f_by_task[task_idx] = (*cached, 0.0)
+      print(f'Reusing the cached scores of {len(j_and_f_by_task)} expressions.')
+
+    order = [i for i in order if i not in j_and_f_by_task]
+    reporter = progress.ProgressReporter(
+        len(order),
+        sum(task_sizes[i] for i in order),
+        description='Evaluated expressions: ',
+    )
+    task_results = _imap_unordered(
+        pool,
+        _evaluate_expression_task,
+        ((i, tasks[i]) for i in order),
+        chunk_size,
+    )
+    for task_idx, j_exp, f_exp, jf_variance, stats in task_results:
+      instrumentation.add_stats(stats)
+      j_and_f_by_task[task_idx] = j_exp, f_exp, jf_variance
+      if scores is not None:
+        scores.put(cache_keys[task_idx], j_exp, f_exp)
+      reporter.update(task_sizes[task_idx])
+  return videos, tasks, j_and_f_by_task
+
+
+def _pool_chunk_size(num_tasks: int, num_workers: int) -> int:
+  """The number of tasks which are sent to a worker at once."""
+  chunk_size = num_tasks // (num_workers * _TASKS_PER_WORKER)
+  return min(max(chunk_size, 1), _MAX_CHUNK_SIZE)
+
+
+def _scores_by_video_by_exp(
+    videos: list[vng_video.VNGVideo],
+    tasks: list[tuple[Any, ...]],
+    scores_by_task: dict[int, tuple[float, float, float]],
+) -> tuple[util.JsonData, util.JsonData]:
+  # The results arrive in arbitrary order, so we aggregate them in the order of
+  # the dataset.
+  js_by_video_by_exp = {vng_vid.get_name(): {} for vng_vid in videos}
+  fs_by_video_by_exp = {vng_vid.get_name(): {} for vng_vid in videos}
+  for task_idx, (_, _, vid_name, exp_id, _) in enumerate(tasks):
+    j_exp, f_exp, _ = scores_by_task[task_idx]
+    js_by_video_by_exp[vid_name][exp_id] = j_exp
+    fs_by_video_by_exp[vid_name][exp_id] = f_exp
+  return js_by_video_by_exp, fs_by_video_by_exp
+
+
+def evaluate_video(
+    vng_vid: vng_video.VNGVideo,
+    result_folder: str,
+    options: EvaluationOptions = EvaluationOptions(),
+) -> tuple[dict[int, float], dict[int, float]]:
+  vid_name = vng_vid.get_name()
+  j_by_exp_id = {}
+  f_by_exp_id = {}
+  for exp_id, vng_exp in enumerate(vng_vid):
+    j_exp, f_exp = evaluate_expression(
+        vng_exp, result_folder, vid_name, exp_id, options
+    )
+    j_by_exp_id[exp_id] = j_exp
+    f_by_exp_id[exp_id] = f_exp
+  return j_by_exp_id, f_by_exp_id
+
+
+def _imap_unordered(
+    pool: Optional[Pool],
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    chunk_size: int,
+) -> Iterator[Any]:
+  if pool is None:
+    return map(func, items)
+  return pool.imap_unordered(func, items, chunksize=chunk_size)
+
+
+def create_pool(num_workers: int, options: EvaluationOptions) -> Pool:
+  """Create a pool of worker processes for evaluate.
+
+  The pool can be kept and reused for several evaluations with the same
+  options, so that the workers keep their cached ground truth masks.
+
+  Args:
+    num_workers: the number of worker processes.
+    options: the options of the evaluations.
+
+  Returns:
+    The pool.
+  """
+  return Pool(
+      processes=num_workers,
+      initializer=_init_worker,
+      initargs=(options, instrumentation.is_enabled()),
+  )
+
+
+def _init_worker(
+    options: EvaluationOptions, instrumentation_enabled: bool
+) -> None:
+  mask.configure_mask_cache(options.mask_cache_bytes)
+  instrumentation.enable(instrumentation_enabled)
+
+
+# The tasks return the instrumentation stats of the worker, or None if
+# instrumentation is disabled.
+def _cache_key_task(
+    indexed_task: tuple[int, tuple[Any, ...]]
+) -> tuple[int, str, Optional[instrumentation.Stats]]:
+  task_idx, (vng_exp, result_folder, vid_name, exp_id, options) = indexed_task
+  with instrumentation.phase('open_results'):
+    results = vng_results.open_results(result_folder)
+    expression_results = results.open_expression(vid_name, exp_id)
+  with instrumentation.phase('hash_predictions'):
+    pred_content_hash = expression_results.get_content_hash(
+        vng_exp.get_annotated_frame_numbers()
+    )
+  key = score_cache.make_key(
+      vid_name,
+      exp_id,
+      vng_exp.get_annotation_id(),
+      pred_content_hash,
+      options.boundary_engine,
+  )
+  return task_idx, key, instrumentation.pop_stats()
+
+
+def _evaluate_expression_task(
+    indexed_task: tuple[int, tuple[Any, ...]]
+) -> tuple[int, float, float, float, Optional[instrumentation.Stats]]:
+  task_idx, task = indexed_task
+  j_per_frame, f_per_frame, num_annotated_frames = _evaluate_expression_frames(
+      *task
+  )
+  jf_variance = frame_subsampling.variance_of_mean(
+      0.5 * (j_per_frame + f_per_frame), num_annotated_frames
+  )
+  return (
+      task_idx,
+      j_per_frame.mean(),
+      f_per_frame.mean(),
+      jf_variance,
+      instrumentation.pop_stats(),
+  )
+
+
+def evaluate_expression(
+    vng_exp: vng_expression.VNGExpression,
+    result_folder: str,
+    vid_name: str,
+    exp_id: int,
+    options: EvaluationOptions = EvaluationOptions(),
+) -> tuple[float, float]:
+  """Evaluate the result for one VNG expression. Return J and F scores.
+
+  Args:
+    vng_exp: the VNG expression with the ground truth masks.
+    result_folder: the folder or file with the VNG results, see vng_results.py.
+    vid_name: the name of the video of the expression.
+    exp_id: the id of the expression inside the video.
+    options: the options for running the evaluation.
+
+  Returns:
+    The J and F scores for the expression. If options subsample the frames,
+    the scores are the means over the selected frames.
+
+  Only the per-frame scores are kept for all frames, so the memory used for the
+  masks is bounded by options.chunk_size. The scores are the same as for
+  evaluating all frames at once.
+  """
+  j_per_frame, f_per_frame, _ = _evaluate_expression_frames(
+      vng_exp, result_folder, vid_name, exp_id, options
+  )
+  return j_per_frame.mean(), f_per_frame.mean()
+
+
+def _evaluate_expression_frames(
+    vng_exp: vng_expression.VNGExpression,
+    result_folder: str,
+    vid_name: str,
+    exp_id: int,
+    options: EvaluationOptions,
+) -> tuple[np.ndarray, np.ndarray, int]:
+  """J and F of the selected frames and the number of annotated frames."""
+  with instrumentation.phase('open_results'):
+    results = vng_results.open_results(result_folder)
+    expression_results = results.open_expression(vid_name, exp_id)
+  annotated_frames = [
+      (frame_number, gt_mask)
+      for frame_number, gt_mask in enumerate(vng_exp.get_all_masks())
+      if gt_mask is not None
+  ]
+  num_annotated_frames = len(annotated_frames)
+  if options.subsamples_frames():
+    annotated_frames = [
+        annotated_frames[i]
+        for i in options.select_frames(num_annotated_frames)
+    ]
+  chunk_size = options.chunk_size
+  if chunk_size is None:
+    chunk_size = max(len(annotated_frames), 1)
+
+  j_per_frame = []
+  f_per_frame = []
+  for chunk_start in range(0, len(annotated_frames), chunk_size):
+    chunk = annotated_frames[chunk_start : chunk_start + chunk_size]
+    frame_numbers = [frame_number for frame_number, _ in chunk]
+    if instrumentation.is_enabled():
+      instrumentation.count('frames', len(chunk))
+      instrumentation.count(
+          'pixels', sum(gt_mask.get_num_pixels() for _, gt_mask in chunk)
+      )
+    if isinstance(expression_results, vng_results.RleExpressionResults):
+      gt_masks = [gt_mask for _, gt_mask in chunk]
+      pred_rles = expression_results.get_pred_rles(frame_numbers)
+      j_chunk, f_chunk = _evaluate_rles(
+          gt_masks,
+          pred_rles,
+          options.boundary_engine,
+          f'video {vid_name}, expression {exp_id}',
+          frame_numbers,
+      )
+    else:
+      with instrumentation.phase('load_pred_masks'):
+        pred_masks = expression_results.load_pred_masks(frame_numbers)
+      with instrumentation.phase('decode_gt_masks'):
+        gt_masks = [gt_mask.load() for _, gt_mask in chunk]
+      j_chunk, f_chunk = _evaluate_masks(
+          np.stack(gt_masks), np.stack(pred_masks), options.boundary_engine
+      )
+    j_per_frame.append(j_chunk)
+    f_per_frame.append(f_chunk)
+  return (
+      np.concatenate(j_per_frame),
+      np.concatenate(f_per_frame),
+      num_annotated_frames,
+  )
+
+
+def _evaluate_masks(
+    gt_masks: np.ndarray, pred_masks: np.ndarray, boundary_engine: str
+) -> tuple[np.ndarray, np.ndarray]:
+  with instrumentation.phase('metric_j'):
+    j_per_frame = metrics.db_eval_iou(gt_masks, pred_masks)
+  with instrumentation.phase('metric_f'):
+    f_per_frame = _eval_boundary(gt_masks, pred_masks, boundary_engine)
+  return j_per_frame, f_per_frame
+
+
+def _evaluate_rles(
+    gt_masks: list[mask.Mask],
+    pred_rles: list[vng_results.Rle],
+    boundary_engine: str,
+    description: str,
+    frame_numbers: list[int],
+) -> tuple[np.ndarray, np.ndarray]:
+  """Evaluate RLE-encoded masks, decoding them only where F needs boundaries.
+
+  Args:
+    gt_masks: the ground truth masks.
+    pred_rles: the predicted masks.
+    boundary_engine: the implementation of the boundary F-measure.
+    description: the video and expression of the masks, for error messages.
+    frame_numbers: the frame numbers of the masks, for error messages.
+
+  Returns:
+    J and F per frame, the same as _evaluate_masks for the decoded masks.
+
+  J is computed from the areas of the RLEs and their intersection. A mask has
+  an empty boundary exactly if it is empty or full. If both masks have an empty
+  boundary, F is 1, if only one of them has one, F is 0. Only the remaining
+  frames are decoded to compute F.
+
+  Raises:
+    ValueError: if a predicted mask has a different size than the ground truth.
+  """
+  # pycocotools silently computes wrong areas for RLEs of different sizes.
+  for gt_mask, pred_rle, frame_number in zip(
+      gt_masks, pred_rles, frame_numbers
+  ):
+    gt_size = list(gt_mask.get_rle()['size'])
+    if list(pred_rle['size']) != gt_size:
+      raise ValueError(
+          f'The predicted mask for {description}, frame {frame_number} has '
+          f'size {list(pred_rle["size"])}, but the ground truth has size '
+          f'{gt_size}.'
+      )
+  with instrumentation.phase('metric_j'):
+    gt_rles = [gt_mask.get_rle() for gt_mask in gt_masks]
+    gt_areas = np.array([m.get_area() for m in gt_masks], dtype=np.int64)
+    pred_areas = cocomask.area(pred_rles).astype(np.int64)
+    intersections = np.array(
+        [
+            cocomask.area(cocomask.merge([gt_rle, pred_rle], intersect=True))
+            for gt_rle, pred_rle in zip(gt_rles, pred_rles)
+        ],
+        dtype=np.int64,
+    )
+    unions = gt_areas + pred_areas - intersections
+    j_per_frame = np.ones(len(gt_rles))
+    non_empty = unions > 0
+    j_per_frame[non_empty] = intersections[non_empty] / unions[non_empty]
+
+  num_pixels = np.array([m.get_num_pixels() for m in gt_masks])
+  gt_is_constant = (gt_areas == 0) | (gt_areas == num_pixels)
+  pred_is_constant = (pred_areas == 0) | (pred_areas == num_pixels)
+  f_per_frame = np.where(gt_is_constant & pred_is_constant, 1.0, 0.0)
+  to_decode = np.flatnonzero(~gt_is_constant & ~pred_is_constant)
+  if to_decode.size:
+    with instrumentation.phase('decode_gt_masks'):
+      gt_decoded = np.stack([gt_masks[i].load() for i in to_decode])
+    with instrumentation.phase('decode_pred_rles'):
+      pred_decoded = np.stack(
+          [cocomask.decode(pred_rles[i]) for i in to_decode]
+      )
+    with instrumentation.phase('metric_f'):
+      f_per_frame[to_decode] = _eval_boundary(
+          gt_decoded, pred_decoded, boundary_engine
+      )
+  return j_per_frame, f_per_frame
+
+
+def _eval_boundary(
+    gt_masks: np.ndarray, pred_masks: np.ndarray, boundary_engine: str
+) -> np.ndarray:
+  if boundary_engine == 'davis2017':
+    return metrics.db_eval_boundary(gt_masks, pred_masks)
+  elif boundary_engine == 'builtin':
+    return boundary_measure.db_eval_boundary(gt_masks, pred_masks)
+  raise ValueError(f'Unknown boundary engine: {boundary_engine}')
@@ -0,0 +1,234 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from davis2017 import metrics
+import numpy as np
+
+from video_localized_narratives.tools import sharding
+from video_localized_narratives.video_narrative_grounding import vng_aggregation
+from video_localized_narratives.video_narrative_grounding import vng_evaluation
+from video_localized_narratives.video_narrative_grounding import vng_test_utils
+
+from absl.testing import absltest
+
+
+def _evaluate_per_video(dataset, pred_masks):
+  """The scores of the original evaluation, one video after the other."""
+  js_by_video_by_exp = {}
+  fs_by_video_by_exp = {}
+  for vng_vid in dataset:
+    vid_name = vng_vid.get_name()
+    js_by_video_by_exp[vid_name] = {}
+    fs_by_video_by_exp[vid_name] = {}
+    for exp_id, vng_exp in enumerate(vng_vid):
+      gt_masks = []
+      exp_pred_masks = []
+      for frame_number, gt_mask in enumerate(vng_exp.get_all_masks()):
+        if gt_mask is None:
+          continue
+        gt_masks.append(gt_mask.load())
+        exp_pred_masks.append(pred_masks[vid_name][exp_id][frame_number])
+      gt_masks = np.stack(gt_masks)
+      exp_pred_masks = np.stack(exp_pred_masks)
+      js_by_video_by_exp[vid_name][exp_id] = metrics.db_eval_iou(
+          gt_masks, exp_pred_masks
+      ).mean()
+      fs_by_video_by_exp[vid_name][exp_id] = metrics.db_eval_boundary(
+          gt_masks, exp_pred_masks
+      ).mean()
+  return js_by_video_by_exp, fs_by_video_by_exp
+
+
+class EvaluateTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    data = vng_test_utils.write_dataset(tmp_dir.name)
+    self.tmp_dir = tmp_dir.name
+    self.pred_masks = data.pred_masks
+    self.dataset = data.load_dataset()
+    self.result_folder = os.path.join(tmp_dir.name, 'results')
+    vng_test_utils.write_png_results(data.pred_masks, self.result_folder)
+    self.expected_js, self.expected_fs = _evaluate_per_video(
+        self.dataset, data.pred_masks
+    )
+
+  def test_scores_equal_the_per_video_evaluation(self):
+    expected_j = np.mean(
+        [j for j_by_exp in self.expected_js.values() for j in j_by_exp.values()]
+    )
+    expected_f = np.mean(
+        [f for f_by_exp in self.expected_fs.values() for f in f_by_exp.values()]
+    )
+    for run_parallel in (False, True):
+      with self.subTest(run_parallel=run_parallel):
+        jf, j, f, js, fs = vng_evaluation.evaluate(
+            self.dataset, self.result_folder, run_parallel, num_workers=2
+        )
+
+        self.assertEqual(js, self.expected_js)
+        self.assertEqual(fs, self.expected_fs)
+        self.assertAlmostEqual(j, expected_j)
+        self.assertAlmostEqual(f, expected_f)
+        self.assertAlmostEqual(jf, 0.5 * (expected_j + expected_f))
+
+  def test_frame_chunks_do_not_change_the_scores(self):
+    for run_parallel in (False, True):
+      for chunk_size in (1, 2, 3, 100):
+        with self.subTest(run_parallel=run_parallel, chunk_size=chunk_size):
+          _, _, _, js, fs = vng_evaluation.evaluate(
+              self.dataset,
+              self.result_folder,
+              run_parallel,
+              vng_evaluation.EvaluationOptions(chunk_size=chunk_size),
+              num_workers=2,
+          )
+
+          self.assertEqual(js, self.expected_js)
+          self.assertEqual(fs, self.expected_fs)
+
+  def test_order_of_the_videos_does_not_change_the_scores(self):
+    video_names = list(reversed(self.dataset.get_video_names()))
+    for run_parallel in (False, True):
+      with self.subTest(run_parallel=run_parallel):
+        _, _, _, js, fs = vng_evaluation.evaluate(
+            self.dataset,
+            self.result_folder,
+            run_parallel,
+            num_workers=2,
+            video_names=video_names,
+        )
+
+        # The scores are ordered like the dataset, not like video_names.
+        self.assertEqual(list(js), list(self.expected_js))
+        self.assertEqual(list(fs), list(self.expected_fs))
+        self.assertEqual(js, self.expected_js)
+        self.assertEqual(fs, self.expected_fs)
+
+  def test_merged_shards_equal_the_unsharded_evaluation(self):
+    jf, j, f, js, fs = vng_evaluation.evaluate(
+        self.dataset, self.result_folder, run_parallel=False
+    )
+    num_shards = 3
+    partial_scores = []
+    for shard_index in range(num_shards):
+      _, _, _, shard_js, shard_fs = vng_evaluation.evaluate(
+          self.dataset,
+          self.result_folder,
+          run_parallel=True,
+          num_workers=2,
+          video_names=sharding.select_shard(
+              self.dataset.get_video_names(), num_shards, shard_index
+          ),
+      )
+      partial_scores.append(
+          vng_aggregation.scores_to_partial(
+              self.result_folder, shard_js, shard_fs
+          )
+      )
+
+    _, merged_js, merged_fs = vng_aggregation.scores_from_partials(
+        partial_scores
+    )
+
+    self.assertEqual(merged_js, js)
+    self.assertEqual(merged_fs, fs)
+    self.assertEqual(
+        vng_aggregation.aggregate_scores(merged_js, merged_fs), (jf, j, f)
+    )
+
+  def test_evaluate_video_equals_the_per_video_evaluation(self):
+    for vng_vid in self.dataset:
+      j_by_exp_id, f_by_exp_id = vng_evaluation.evaluate_video(
+          vng_vid, self.result_folder
+      )
+
+      self.assertEqual(j_by_exp_id, self.expected_js[vng_vid.get_name()])
+      self.assertEqual(f_by_exp_id, self.expected_fs[vng_vid.get_name()])
+
+  def test_rle_results_have_the_scores_of_png_results(self):
+    for extension in ('json', 'jsonl'):
+      with self.subTest(extension=extension):
+        result_filename = os.path.join(self.tmp_dir, f'results.{extension}')
+        vng_test_utils.write_rle_results(self.pred_masks, result_filename)
+
+        _, _, _, js, fs = vng_evaluation.evaluate(
+            self.dataset, result_filename, run_parallel=False
+        )
+
+        self.assertEqual(js, self.expected_js)
+        self.assertEqual(fs, self.expected_fs)
+
+  def test_rle_results_are_reloaded_when_the_file_changes(self):
+    result_filename = os.path.join(self.tmp_dir, 'results.json')
+    vng_test_utils.write_rle_results(self.pred_masks, result_filename)
+    vng_evaluation.evaluate(self.dataset, result_filename, run_parallel=False)
+    inverted_pred_masks = {
+        vid_name: {
+            exp_id: {n: 255 - m for n, m in masks_by_frame.items()}
+            for exp_id, masks_by_frame in masks_by_exp_id.items()
+        }
+        for vid_name, masks_by_exp_id in self.pred_masks.items()
+    }
+    inverted_result_folder = os.path.join(self.tmp_dir, 'inverted_results')
+    vng_test_utils.write_png_results(
+        inverted_pred_masks, inverted_result_folder
+    )
+
+    mtime = os.path.getmtime(result_filename)
+    vng_test_utils.write_rle_results(inverted_pred_masks, result_filename)
+    os.utime(result_filename, (mtime + 10, mtime + 10))
+    _, _, _, js, fs = vng_evaluation.evaluate(
+        self.dataset, result_filename, run_parallel=False
+    )
+    _, _, _, expected_js, expected_fs = vng_evaluation.evaluate(
+        self.dataset, inverted_result_folder, run_parallel=False
+    )
+
+    self.assertNotEqual(js, self.expected_js)
+    self.assertEqual(js, expected_js)
+    self.assertEqual(fs, expected_fs)
+
+  def test_rle_results_of_a_different_size_are_an_error(self):
+    pred_masks = {
+        vid_name: {
+            exp_id: {n: m[:, :-1] for n, m in masks_by_frame.items()}
+            for exp_id, masks_by_frame in masks_by_exp_id.items()
+        }
+        for vid_name, masks_by_exp_id in self.pred_masks.items()
+    }
+    result_filename = os.path.join(self.tmp_dir, 'results.jsonl')
+    vng_test_utils.write_rle_results(pred_masks, result_filename)
+
+    with self.assertRaisesRegex(
+        ValueError,
+        r'video video0, expression 0, frame 0 has size \[24, 31\], but the '
+        r'ground truth has size \[24, 32\]',
+    ):
+      vng_evaluation.evaluate(self.dataset, result_filename, run_parallel=False)
+
+  def test_pool_chunk_size_is_clamped(self):
+    self.assertEqual(vng_evaluation._pool_chunk_size(0, 2), 1)
+    self.assertEqual(vng_evaluation._pool_chunk_size(10, 2), 1)
+    self.assertEqual(vng_evaluation._pool_chunk_size(2 * 32 * 5, 2), 5)
+    self.assertEqual(vng_evaluation._pool_chunk_size(10**6, 2), 16)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -14,9 +14,13 @@
 
 """Provides the VNGExpression class."""
 
+from collections.abc import AsyncIterator, Iterator
 from typing import Optional
 
+import numpy as np
+
 from video_localized_narratives.tools import frame
+from video_localized_narratives.tools import prefetch
 from video_localized_narratives.tools import util
 from video_localized_narratives.video_narrative_grounding import mask
 
@@ -39,8 +43,9 @@ class VNGExpression:
     self._meta = meta
     self._frames_path = frames_path
 
-    ann_id = expression['obj_id']
-    self._rles = masks[ann_id]['segmentations']
+    self._ann_id = expression['obj_id']
+    self._rles = masks[self._ann_id]['segmentations']
+    self._masks: Optional[list[Optional[mask.Mask]]] = None
 
   def get_description(self) -> str:
     narrative = self.get_narrative()
@@ -70,7 +75,7 @@ class VNGExpression:
     if not frames:
       raise FileNotFoundError(
           f'Did not find frames in {self._frames_path}')
-    masks = [mask.Mask(s) if s is not None else s for s in self._rles]
+    masks = self.get_all_masks()
     assert len(frames) == len(masks), (len(frames), len(masks))
     return list(zip(frames, masks))
 
@@ -80,7 +85,56 @@ class VNGExpression:
     return [(f, m) for f, m in self.get_all_frames_and_masks() if m is not None]
 
   def get_all_masks(self) -> list[Optional[mask.Mask]]:
-    return [mask.Mask(s) if s is not None else None for s in self._rles]
+    """The masks of all frames, None for frames without annotation.
+
+    The Mask objects are created once, so that their areas and bounding boxes
+    are computed at most once.
+    """
+    if self._masks is None:
+      self._masks = [mask.Mask(s) if s is not None else None for s in self._rles]
+    return list(self._masks)
+
+  def get_annotation_id(self) -> int:
+    return self._ann_id
+
+  def get_annotated_frame_numbers(self) -> list[int]:
+    return [n for n, s in enumerate(self._rles) if s is not None]
+
+  def get_num_annotated_frames(self) -> int:
+    return sum(s is not None for s in self._rles)
+
+  def prefetch_all_frames_and_masks(
+      self,
+      num_workers: int = prefetch.DEFAULT_NUM_WORKERS,
+      max_prefetch: int = prefetch.DEFAULT_MAX_PREFETCH,
+  ) -> Iterator[tuple[np.ndarray, Optional[np.ndarray]]]:
+    """Iterate over the loaded frames and masks, loading ahead in threads."""
+    return prefetch.prefetch(
+        self.get_all_frames_and_masks(),
+        _load_frame_and_mask,
+        num_workers,
+        max_prefetch,
+    )
+
+  def aprefetch_all_frames_and_masks(
+      self,
+      num_workers: int = prefetch.DEFAULT_NUM_WORKERS,
+      max_prefetch: int = prefetch.DEFAULT_MAX_PREFETCH,
+  ) -> AsyncIterator[tuple[np.ndarray, Optional[np.ndarray]]]:
+    """The asyncio variant of prefetch_all_frames_and_masks."""
+    return prefetch.aprefetch(
+        self.get_all_frames_and_masks(),
+        _load_frame_and_mask,
+        num_workers,
+        max_prefetch,
+    )
+
+
+def _load_frame_and_mask(
+    frame_and_mask: tuple[frame.Frame, Optional[mask.Mask]]
+) -> tuple[np.ndarray, Optional[np.ndarray]]:
+  f, m = frame_and_mask
+  return f.load(), m.load() if m is not None else None
 
 
 def _highlighted_description(
@@ -0,0 +1,355 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Readers for VNG results in the supported formats.
+
+VNG results can be stored
+  * as a folder with one png file per frame in result_folder/video/exp_id/,
+  * as a single zip archive of such a folder (see ZipResults), or
+  * as a single json or jsonl file with RLE-encoded masks (see RleResults).
+
+Usage example:
+  results = open_results(result_path)
+  expression_results = results.open_expression(video_name, exp_id)
+  pred_masks = expression_results.load_pred_masks(frame_numbers)
+
+Frame numbers always start at 0 for the first frame of the video.
+
+All expression results provide get_content_hash(frame_numbers), which changes
+whenever the predicted masks of these frames change.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+import posixpath
+import threading
+from typing import Any, Union
+import zipfile
+
+import numpy as np
+import PIL.Image
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.tools import frame
+from video_localized_narratives.tools import instrumentation
+from video_localized_narratives.tools import prefetch
+from video_localized_narratives.tools import util
+
+
+Rle = dict[str, Any]
+
+
+class PngExpressionResults:
+  """The results for one expression, stored as one png file per frame."""
+
+  def __init__(self, filename_by_frame_number: dict[int, str]):
+    self._filename_by_frame_number = filename_by_frame_number
+
+  def load_pred_masks(self, frame_numbers: list[int]) -> list[np.ndarray]:
+    filenames = [self._filename_by_frame_number[n] for n in frame_numbers]
+    if instrumentation.is_enabled():
+      instrumentation.count(
+          'bytes_read', sum(os.path.getsize(f) for f in filenames)
+      )
+    return [frame.load_img(f) for f in filenames]
+
+  def get_content_hash(self, frame_numbers: list[int]) -> str:
+    """Hash the bytes of the png files of the frames."""
+    hasher = hashlib.sha256()
+    for n in frame_numbers:
+      with open(self._filename_by_frame_number[n], 'rb') as f:
+        data = f.read()
+      hasher.update(f'{n}:{len(data)}:'.encode())
+      hasher.update(data)
+    return hasher.hexdigest()
+
+
+class PngResults:
+  """VNG results stored as png files in result_folder/video/exp_id/."""
+
+  def __init__(self, result_folder: str):
+    self._result_folder = result_folder
+
+  def open_expression(
+      self, vid_name: str, exp_id: int
+  ) -> PngExpressionResults:
+    return PngExpressionResults(
+        _load_pred_mask_filename_by_frame_number(
+            self._result_folder, vid_name, exp_id
+        )
+    )
+
+
+class ZipExpressionResults:
+  """The results for one expression, stored as png files in a zip archive."""
+
+  def __init__(
+      self,
+      zip_results: 'ZipResults',
+      member_by_frame_number: dict[int, str],
+      num_threads: int,
+  ):
+    self._zip_results = zip_results
+    self._member_by_frame_number = member_by_frame_number
+    self._num_threads = num_threads
+
+  def load_pred_masks(self, frame_numbers: list[int]) -> list[np.ndarray]:
+    """Read and decode the masks of the frames in parallel."""
+    members = [self._member_by_frame_number[n] for n in frame_numbers]
+    return list(
+        prefetch.prefetch(
+            members,
+            self._zip_results.load_member,
+            num_workers=self._num_threads,
+            max_prefetch=max(len(members), 1),
+        )
+    )
+
+  def get_content_hash(self, frame_numbers: list[int]) -> str:
+    """Hash the CRC-32 checksums stored in the archive, without reading data."""
+    hasher = hashlib.sha256()
+    for n in frame_numbers:
+      info = self._zip_results.get_member_info(self._member_by_frame_number[n])
+      hasher.update(f'{n}:{info.file_size}:{info.CRC:08x};'.encode())
+    return hasher.hexdigest()
+
+
+class ZipResults:
+  """VNG results stored as png files in a single zip archive.
+
+  The archive has the same structure as the result folder for PngResults, e.g.
+  created with `cd result_folder && zip -r -0 ../results.zip .`. A common
+  top-level folder inside the archive is allowed. The central directory of the
+  archive serves as an index, so only the annotated frames are read.
+  """
+
+  def __init__(self, result_filename: str, num_threads: int = 4):
+    self._result_filename = result_filename
+    self._num_threads = num_threads
+    self._lock = threading.RLock()
+    self._zip_file = None
+    self._zip_file_pid = None
+    self._members_by_expression = None
+
+  def open_expression(
+      self, vid_name: str, exp_id: int
+  ) -> ZipExpressionResults:
+    members_by_expression = self._get_members_by_expression()
+    key = (vid_name, str(exp_id))
+    if key not in members_by_expression:
+      raise FileNotFoundError(
+          f'Did not find results for {vid_name}/{exp_id} in '
+          f'{self._result_filename}'
+      )
+    member_by_frame_number = _normalize_frame_numbers(
+        members_by_expression[key],
+        f'{self._result_filename}:{vid_name}/{exp_id}',
+    )
+    return ZipExpressionResults(
+        self, member_by_frame_number, self._num_threads
+    )
+
+  def load_member(self, member: str) -> np.ndarray:
+    data = self._get_zip_file().read(member)
+    instrumentation.count('bytes_read', len(data))
+    return np.array(PIL.Image.open(io.BytesIO(data)))
+
+  def get_member_info(self, member: str) -> zipfile.ZipInfo:
+    return self._get_zip_file().getinfo(member)
+
+  def _get_members_by_expression(
+      self,
+  ) -> dict[tuple[str, str], dict[int, str]]:
+    with self._lock:
+      if self._members_by_expression is None:
+        self._members_by_expression = _index_zip_members(
+            self._get_zip_file().namelist()
+        )
+      return self._members_by_expression
+
+  def _get_zip_file(self) -> zipfile.ZipFile:
+    # A zip file which was opened before forking the process must not be
+    # shared, because the processes would share the file position.
+    with self._lock:
+      if self._zip_file is None or self._zip_file_pid != os.getpid():
+        self._zip_file = zipfile.ZipFile(self._result_filename)
+        self._zip_file_pid = os.getpid()
+      return self._zip_file
+
+
+class RleExpressionResults:
+  """The results for one expression, stored as RLEs."""
+
+  def __init__(self, rle_by_frame_number: dict[int, Rle], description: str):
+    self._rle_by_frame_number = rle_by_frame_number
+    self._description = description
+
+  def get_pred_rles(self, frame_numbers: list[int]) -> list[Rle]:
+    missing = [n for n in frame_numbers if n not in self._rle_by_frame_number]
+    if missing:
+      raise ValueError(
+          f'Missing results for frames {missing} of {self._description}'
+      )
+    return [self._rle_by_frame_number[n] for n in frame_numbers]
+
+  def load_pred_masks(self, frame_numbers: list[int]) -> list[np.ndarray]:
+    return [cocomask.decode(rle) for rle in self.get_pred_rles(frame_numbers)]
+
+  def get_content_hash(self, frame_numbers: list[int]) -> str:
+    """Hash the size and counts of the RLEs of the frames."""
+    hasher = hashlib.sha256()
+    for n, rle in zip(frame_numbers, self.get_pred_rles(frame_numbers)):
+      counts = rle['counts']
+      if isinstance(counts, bytes):
+        counts = counts.decode()
+      hasher.update(json.dumps([n, rle['size'], counts]).encode())
+    return hasher.hexdigest()
+
+
+class RleResults:
+  """VNG results stored as RLE-encoded masks in a single json or jsonl file.
+
+  A .json file maps video names to expression ids to frame numbers to RLEs:
+    {"video_name": {"0": {"0": {"size": [h, w], "counts": "..."}, ...}, ...}}
+
+  A .jsonl file has one line per frame:
+    {"video": "video_name", "exp_id": 0, "frame": 0,
+     "segmentation": {"size": [h, w], "counts": "..."}}
+
+  The RLEs use the (compressed) COCO format, as produced by
+  pycocotools.mask.encode.
+  """
+
+  def __init__(self, result_filename: str):
+    self._result_filename = result_filename
+
+  def open_expression(
+      self, vid_name: str, exp_id: int
+  ) -> RleExpressionResults:
+    rles_by_expression = _load_rles_by_expression(
+        self._result_filename, os.path.getmtime(self._result_filename)
+    )
+    key = (vid_name, exp_id)
+    if key not in rles_by_expression:
+      raise FileNotFoundError(
+          f'Did not find results for {vid_name}/{exp_id} in '
+          f'{self._result_filename}'
+      )
+    return RleExpressionResults(
+        rles_by_expression[key], f'{vid_name}/{exp_id}'
+    )
+
+
+VNGResults = Union[PngResults, ZipResults, RleResults]
+
+
+def open_results(result_path: str) -> VNGResults:
+  """Open the VNG results, choosing the reader based on the path.
+
+  The readers are cached per process. A result file which was modified since
+  it was opened is opened again, which matters for long-running processes.
+
+  Args:
+    result_path: the folder or file with the results.
+
+  Returns:
+    The reader for the results.
+  """
+  return _open_results(result_path, os.path.getmtime(result_path))
+
+
+@functools.lru_cache(maxsize=16)
+def _open_results(result_path: str, mtime: float) -> VNGResults:
+  del mtime  # Only used as part of the cache key.
+  if os.path.isdir(result_path):
+    return PngResults(result_path)
+  if result_path.endswith('.zip'):
+    return ZipResults(result_path)
+  if result_path.endswith('.json') or result_path.endswith('.jsonl'):
+    return RleResults(result_path)
+  raise ValueError(f'Unsupported VNG result format: {result_path}')
+
+
+@functools.lru_cache(maxsize=1)
+def _load_rles_by_expression(
+    result_filename: str, mtime: float
+) -> dict[tuple[str, int], dict[int, Rle]]:
+  """Load all RLEs, once per process and modification time of the file."""
+  del mtime  # Only used as part of the cache key.
+  instrumentation.count('bytes_read', os.path.getsize(result_filename))
+  rles_by_expression = {}
+  with open(result_filename) as f:
+    if result_filename.endswith('.jsonl'):
+      for line in f:
+        if not line.strip():
+          continue
+        d = json.loads(line)
+        key = (d['video'], int(d['exp_id']))
+        rles_by_frame = rles_by_expression.setdefault(key, {})
+        rles_by_frame[int(d['frame'])] = d['segmentation']
+    else:
+      for vid_name, rles_by_exp_id in json.load(f).items():
+        for exp_id, rles_by_frame in rles_by_exp_id.items():
+          rles_by_expression[(vid_name, int(exp_id))] = {
+              int(frame_number): rle
+              for frame_number, rle in rles_by_frame.items()
+          }
+  return rles_by_expression
+
+
+def _index_zip_members(
+    names: list[str],
+) -> dict[tuple[str, str], dict[int, str]]:
+  """Index the png members of a zip archive by video, expression and frame."""
+  members_by_expression = {}
+  for name in names:
+    parts = posixpath.normpath(name).split('/')
+    if len(parts) < 3 or not name.endswith('.png'):
+      continue
+    vid_name, exp_id, filename = parts[-3:]
+    frame_number = util.frame_number_from_filename(filename)
+    members = members_by_expression.setdefault((vid_name, exp_id), {})
+    members[frame_number] = name
+  return members_by_expression
+
+
+def _load_pred_mask_filename_by_frame_number(
+    result_folder: str, vid_name: str, exp_id: int
+) -> dict[int, str]:
+  masks_dir = Path(result_folder) / vid_name / str(exp_id)
+  mask_files = sorted(masks_dir.glob('*.png'))
+  if not mask_files:
+    raise FileNotFoundError(f'Did not find result files: {masks_dir}/*.png')
+  result = {util.frame_number_from_filename(str(f)): str(f) for f in mask_files}
+  return _normalize_frame_numbers(result, str(masks_dir))
+
+
+def _normalize_frame_numbers(
+    result: dict[int, str], description: str
+) -> dict[int, str]:
+  """Check that the frames are contiguous and make them start at 0."""
+  # Assume contiguous frames.
+  for x in range(1, max(result)):
+    if x not in result:
+      raise ValueError(f'Result pngs are not contiguous: {description}, {x}')
+
+  # Normalize to 0-indexing.
+  if 0 not in result:
+    assert 1 in result
+    result = {k - 1: v for k, v in result.items()}
+  return result
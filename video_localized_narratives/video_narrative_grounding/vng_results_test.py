@@ -0,0 +1,134 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+from unittest import mock
+import zipfile
+
+import numpy as np
+
+from video_localized_narratives.video_narrative_grounding import vng_results
+from video_localized_narratives.video_narrative_grounding import vng_test_utils
+
+from absl.testing import absltest
+
+
+def _zip_folder(folder, zip_filename, prefix):
+  with zipfile.ZipFile(zip_filename, 'w') as zf:
+    zf.writestr(prefix + 'README.txt', 'Not a result file.')
+    for root, _, filenames in os.walk(folder):
+      for filename in filenames:
+        path = os.path.join(root, filename)
+        zf.write(path, prefix + os.path.relpath(path, folder))
+
+
+class ZipResultsTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    self.tmp_dir = tmp_dir.name
+    data = vng_test_utils.write_dataset(self.tmp_dir, num_videos=3)
+    self.pred_masks = data.pred_masks
+    self.padded_folder = os.path.join(self.tmp_dir, 'padded')
+    vng_test_utils.write_png_results(self.pred_masks, self.padded_folder)
+    # Names like 1.png, ..., 10.png, which are not sorted by frame number.
+    self.unpadded_folder = os.path.join(self.tmp_dir, 'unpadded')
+    vng_test_utils.write_png_results(
+        self.pred_masks, self.unpadded_folder, filename_format='{}.png'
+    )
+
+  def _assert_same_masks(self, results, expected_results):
+    for vid_name, masks_by_exp_id in self.pred_masks.items():
+      for exp_id, masks_by_frame in masks_by_exp_id.items():
+        frame_numbers = sorted(masks_by_frame)
+        pred_masks = results.open_expression(
+            vid_name, exp_id
+        ).load_pred_masks(frame_numbers)
+        expected_pred_masks = expected_results.open_expression(
+            vid_name, exp_id
+        ).load_pred_masks(frame_numbers)
+
+        self.assertLen(pred_masks, len(frame_numbers))
+        for frame_number, pred_mask, expected_pred_mask in zip(
+            frame_numbers, pred_masks, expected_pred_masks
+        ):
+          np.testing.assert_array_equal(pred_mask, expected_pred_mask)
+          np.testing.assert_array_equal(
+              pred_mask, masks_by_frame[frame_number]
+          )
+
+  def test_zip_results_equal_png_results(self):
+    png_results = vng_results.PngResults(self.padded_folder)
+    for folder in (self.padded_folder, self.unpadded_folder):
+      for prefix in ('', 'submission/', 'outer/results/'):
+        with self.subTest(folder=folder, prefix=prefix):
+          zip_filename = os.path.join(self.tmp_dir, 'results.zip')
+          _zip_folder(folder, zip_filename, prefix)
+
+          self._assert_same_masks(
+              vng_results.ZipResults(zip_filename), png_results
+          )
+
+  def test_unpadded_png_results_equal_padded_png_results(self):
+    self._assert_same_masks(
+        vng_results.PngResults(self.unpadded_folder),
+        vng_results.PngResults(self.padded_folder),
+    )
+
+  def test_missing_expression_is_an_error(self):
+    zip_filename = os.path.join(self.tmp_dir, 'results.zip')
+    _zip_folder(self.padded_folder, zip_filename, 'submission/')
+
+    with self.assertRaisesRegex(FileNotFoundError, 'video0/9'):
+      vng_results.ZipResults(zip_filename).open_expression('video0', 9)
+
+  def test_zip_file_is_opened_again_in_a_forked_process(self):
+    zip_filename = os.path.join(self.tmp_dir, 'results.zip')
+    _zip_folder(self.padded_folder, zip_filename, '')
+    results = vng_results.ZipResults(zip_filename)
+    zip_file = results._get_zip_file()
+    self.assertIs(results._get_zip_file(), zip_file)
+
+    with mock.patch.object(os, 'getpid', return_value=os.getpid() + 1):
+      child_zip_file = results._get_zip_file()
+      self._assert_same_masks(
+          results, vng_results.PngResults(self.padded_folder)
+      )
+
+    self.assertIsNot(child_zip_file, zip_file)
+    self.assertIsNot(results._get_zip_file(), child_zip_file)
+
+
+class NormalizeFrameNumbersTest(absltest.TestCase):
+
+  def test_frame_numbers_start_at_0(self):
+    self.assertEqual(
+        vng_results._normalize_frame_numbers({1: 'a', 2: 'b'}, 'test'),
+        {0: 'a', 1: 'b'},
+    )
+    self.assertEqual(
+        vng_results._normalize_frame_numbers({0: 'a', 1: 'b'}, 'test'),
+        {0: 'a', 1: 'b'},
+    )
+
+  def test_missing_frame_is_an_error(self):
+    with self.assertRaisesRegex(ValueError, 'not contiguous: test, 2'):
+      vng_results._normalize_frame_numbers({1: 'a', 3: 'c'}, 'test')
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,194 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A small synthetic VNG dataset with results, for tests.
+
+The videos have different numbers of frames and expressions, and some frames
+are not annotated. The masks include empty and full masks, so that the special
+cases of J and F are covered.
+"""
+
+import dataclasses
+import json
+import os
+from typing import Any
+
+import numpy as np
+import PIL.Image
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.video_narrative_grounding import vng_dataset
+
+
+# The predicted masks by video name, expression id and frame number, with the
+# values 0 and 255 like in the result png files.
+PredMasks = dict[str, dict[int, dict[int, np.ndarray]]]
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticVNG:
+  meta_filename: str
+  orig_masks_filename: str
+  extra_masks_filename: str
+  pred_masks: PredMasks
+
+  def load_dataset(self) -> vng_dataset.VNGDataset:
+    return vng_dataset.VNGDataset(
+        meta_filename=self.meta_filename,
+        orig_masks_filename=self.orig_masks_filename,
+        extra_masks_filename=self.extra_masks_filename,
+        frames_path=None,
+    )
+
+
+def write_dataset(
+    folder: str,
+    num_videos: int = 6,
+    height: int = 24,
+    width: int = 32,
+    seed: int = 0,
+) -> SyntheticVNG:
+  """Write the ground truth json files to folder and create the predictions."""
+  rng = np.random.default_rng(seed)
+  meta = {'videos': {}}
+  annotations = []
+  pred_masks = {}
+  for video_idx in range(num_videos):
+    vid_name = f'video{video_idx}'
+    num_frames = int(rng.integers(3, 12))
+    expressions = {}
+    for exp_id in range(int(rng.integers(1, 4))):
+      ann_id = len(annotations) + 1
+      segmentations = []
+      pred_masks_by_frame = {}
+      for frame_number in range(num_frames):
+        gt_mask = _random_mask(rng, height, width)
+        pred_mask = _random_mask(rng, height, width)
+        if rng.random() < 0.5:
+          pred_mask |= gt_mask
+        # Every fourth frame is not annotated.
+        if frame_number % 4 == 3:
+          segmentations.append(None)
+        else:
+          segmentations.append(_encode(gt_mask))
+        pred_masks_by_frame[frame_number] = pred_mask * np.uint8(255)
+      annotations.append({
+          'id': ann_id,
+          'video_id': video_idx,
+          'segmentations': segmentations,
+      })
+      expressions[str(exp_id)] = {
+          'obj_id': ann_id,
+          'narrative_actor_idx': 0,
+          'noun_phrase_start_idx': 0,
+          'noun_phrase_end_idx': 1,
+      }
+      pred_masks.setdefault(vid_name, {})[exp_id] = pred_masks_by_frame
+    meta['videos'][vid_name] = {
+        'expressions': expressions,
+        'actor_narratives': [
+            {'actor_name': 'dog', 'description': 'dog runs around'}
+        ],
+        'frames': [f'{n:05d}' for n in range(num_frames)],
+    }
+
+  data = SyntheticVNG(
+      meta_filename=os.path.join(folder, 'meta.json'),
+      orig_masks_filename=os.path.join(folder, 'orig_masks.json'),
+      extra_masks_filename=os.path.join(folder, 'extra_masks.json'),
+      pred_masks=pred_masks,
+  )
+  _write_json(data.meta_filename, meta)
+  _write_json(
+      data.orig_masks_filename,
+      {'videos': [{'id': 0}], 'annotations': annotations[::2]},
+  )
+  _write_json(
+      data.extra_masks_filename,
+      {'videos': [{'id': 1}], 'annotations': annotations[1::2]},
+  )
+  return data
+
+
+def write_png_results(
+    pred_masks: PredMasks,
+    result_folder: str,
+    filename_format: str = 'img_{:07d}.png',
+    first_frame_number: int = 1,
+) -> None:
+  """Write the predictions as png files to result_folder/video/exp_id/."""
+  for vid_name, masks_by_exp_id in pred_masks.items():
+    for exp_id, masks_by_frame in masks_by_exp_id.items():
+      masks_dir = os.path.join(result_folder, vid_name, str(exp_id))
+      os.makedirs(masks_dir)
+      for frame_number, pred_mask in masks_by_frame.items():
+        filename = filename_format.format(frame_number + first_frame_number)
+        PIL.Image.fromarray(pred_mask).save(os.path.join(masks_dir, filename))
+
+
+def write_rle_results(pred_masks: PredMasks, result_filename: str) -> None:
+  """Write the predictions as RLEs to a .json or .jsonl file."""
+  if result_filename.endswith('.jsonl'):
+    with open(result_filename, 'w') as f:
+      for vid_name, masks_by_exp_id in pred_masks.items():
+        for exp_id, masks_by_frame in masks_by_exp_id.items():
+          for frame_number, pred_mask in masks_by_frame.items():
+            line = {
+                'video': vid_name,
+                'exp_id': exp_id,
+                'frame': frame_number,
+                'segmentation': _encode(pred_mask),
+            }
+            f.write(json.dumps(line) + '\n')
+  else:
+    _write_json(
+        result_filename,
+        {
+            vid_name: {
+                str(exp_id): {
+                    str(frame_number): _encode(pred_mask)
+                    for frame_number, pred_mask in masks_by_frame.items()
+                }
+                for exp_id, masks_by_frame in masks_by_exp_id.items()
+            }
+            for vid_name, masks_by_exp_id in pred_masks.items()
+        },
+    )
+
+
+def _random_mask(
+    rng: np.random.Generator, height: int, width: int
+) -> np.ndarray:
+  """An empty, full or rectangular mask."""
+  kind = rng.random()
+  if kind < 0.15:
+    return np.zeros((height, width), dtype=np.uint8)
+  if kind < 0.2:
+    return np.ones((height, width), dtype=np.uint8)
+  mask = np.zeros((height, width), dtype=np.uint8)
+  y0, y1 = sorted(rng.integers(0, height, size=2))
+  x0, x1 = sorted(rng.integers(0, width, size=2))
+  mask[y0 : y1 + 1, x0 : x1 + 1] = 1
+  return mask
+
+
+def _encode(mask: np.ndarray) -> dict[str, Any]:
+  rle = cocomask.encode(np.asfortranarray((mask > 0).astype(np.uint8)))
+  rle['counts'] = rle['counts'].decode()
+  return rle
+
+
+def _write_json(filename: str, data: Any) -> None:
+  with open(filename, 'w') as f:
+    json.dump(data, f)
@@ -20,16 +20,19 @@ boxes as masks to calculate the evaluation measures.
 
 from collections.abc import Sequence
 
-import os
+import time
+from typing import Optional
 from absl import app
 from absl import flags
 import numpy as np
-from multiprocessing import Pool
 
-from video_localized_narratives.tools import frame
+from video_localized_narratives.tools import bootstrap
+from video_localized_narratives.tools import instrumentation
+from video_localized_narratives.tools import sharding
 from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import location_output_evaluation
 from video_localized_narratives.videoqa.location_output import location_output_question
-from video_localized_narratives.videoqa.location_output import square_prediction
+from video_localized_narratives.videoqa.location_output import square_gt_sidecar
 
 
 GROUND_TRUTH_JSON_PATH_FLAG = flags.DEFINE_string(
@@ -40,17 +43,94 @@ GROUND_TRUTH_JSON_PATH_FLAG = flags.DEFINE_string(
 RESULT_FOLDER_FLAG = flags.DEFINE_string(
     'result_folder',
     default=None,
-    required=True,
     help='Path to the folder with location-output VideoQA results in the form '
-         'of png files for each question_hash.',
+         'of png files for each question_hash, or to a json or jsonl file with '
+         'a box [x, y, w, h] for each question_hash.',
+)
+RESULT_FOLDERS_FLAG = flags.DEFINE_list(
+    'result_folders',
+    default=None,
+    help='Instead of --result_folder: comma-separated list of the results of '
+         'several models, which are evaluated in one pass. A table with the '
+         'measures of each model is printed.',
 )
 PARALLEL_FLAG = flags.DEFINE_boolean(
     'parallel',
     default=True,
     help='Whether to run in parallel. Disable for better debuggability.',
 )
+NUM_SHARDS_FLAG = flags.DEFINE_integer(
+    'num_shards',
+    default=1,
+    lower_bound=1,
+    help='The number of shards into which the questions are split, e.g. to '
+         'evaluate on several machines. See merge_eval_location_output.py.',
+)
+SHARD_INDEX_FLAG = flags.DEFINE_integer(
+    'shard_index',
+    default=0,
+    lower_bound=0,
+    help='The shard to evaluate, in [0, num_shards).',
+)
+PARTIAL_RESULT_FILENAME_FLAG = flags.DEFINE_string(
+    'partial_result_filename',
+    default=None,
+    help='Optional json file to which the measures of the evaluated questions '
+         'are written, for merging the shards with '
+         'merge_eval_location_output.py.',
+)
+NUM_WORKERS_FLAG = flags.DEFINE_integer(
+    'num_workers',
+    default=None,
+    lower_bound=1,
+    help='The number of worker processes. Defaults to 12, but at most the '
+         'number of CPUs available to this process.',
+)
+BATCH_SIZE_FLAG = flags.DEFINE_integer(
+    'batch_size',
+    default=None,
+    lower_bound=1,
+    help='If given, the questions are grouped by resolution and evaluated in '
+         'batches of this size with vectorized NumPy, instead of one by one. '
+         'With the mask engine, a batch takes about 3 * batch_size * H * W / 8 '
+         'bytes of memory.',
+)
+ENGINE_FLAG = flags.DEFINE_enum(
+    'engine',
+    default='mask',
+    enum_values=location_output_evaluation.ENGINES,
+    help='How to calculate the measures. "mask" compares full-resolution '
+         'masks. "box" gives the same measures from the box coordinates and '
+         'the run-length encoded trace, which is much faster.',
+)
+BOOTSTRAP_RESAMPLES_FLAG = flags.DEFINE_integer(
+    'bootstrap_resamples',
+    default=0,
+    lower_bound=0,
+    help='If positive, the 95% confidence interval of the combined score is '
+         'estimated with this many bootstrap resamples of the videos. With '
+         '--result_folders, each model is also compared to the first one with '
+         'a paired test.',
+)
+INSTRUMENT_FLAG = flags.DEFINE_boolean(
+    'instrument',
+    default=False,
+    help='Whether to measure the time of each phase of the evaluation (e.g. '
+         'loading, decoding, metrics) and count questions, pixels and bytes '
+         'read. The report is printed at the end.',
+)
+INSTRUMENTATION_FILENAME_FLAG = flags.DEFINE_string(
+    'instrumentation_filename',
+    default=None,
+    help='Optional json file for the report of --instrument.',
+)
 
-WORKER_COUNT = 12
+# The evaluation of single questions moved to location_output_evaluation.py.
+# These aliases keep the old entry points working for code which imports
+# eval_location_output.
+WORKER_COUNT = location_output_evaluation.WORKER_COUNT
+eval_question = location_output_evaluation.eval_question
+load_result_box_mask = location_output_evaluation.load_result_box_mask
 
 
 def main(argv: Sequence[str]) -> None:
@@ -59,82 +139,218 @@ def main(argv: Sequence[str]) -> None:
 
   gt_json_path = GROUND_TRUTH_JSON_PATH_FLAG.value
   results_folder = RESULT_FOLDER_FLAG.value
+  results_folders = RESULT_FOLDERS_FLAG.value
   parallel_flag = PARALLEL_FLAG.value
-  evaluate(gt_json_path, results_folder, parallel_flag)
+  num_shards = NUM_SHARDS_FLAG.value
+  shard_index = SHARD_INDEX_FLAG.value
+  if (results_folder is None) == (results_folders is None):
+    raise app.UsageError(
+        'Exactly one of --result_folder and --result_folders is required.'
+    )
+  if shard_index >= num_shards:
+    raise app.UsageError('--shard_index must be smaller than --num_shards.')
+  if (
+      results_folders is not None
+      and PARTIAL_RESULT_FILENAME_FLAG.value is not None
+  ):
+    raise app.UsageError(
+        '--partial_result_filename is only supported with --result_folder.'
+    )
+  instrumentation.enable(INSTRUMENT_FLAG.value)
+  start_time = time.perf_counter()
+  if results_folders is not None:
+    evaluate_models(
+        gt_json_path,
+        results_folders,
+        parallel_flag,
+        num_shards,
+        shard_index,
+        ENGINE_FLAG.value,
+        NUM_WORKERS_FLAG.value,
+        BATCH_SIZE_FLAG.value,
+        BOOTSTRAP_RESAMPLES_FLAG.value,
+    )
+  else:
+    evaluate(
+        gt_json_path,
+        results_folder,
+        parallel_flag,
+        num_shards,
+        shard_index,
+        PARTIAL_RESULT_FILENAME_FLAG.value,
+        ENGINE_FLAG.value,
+        NUM_WORKERS_FLAG.value,
+        BATCH_SIZE_FLAG.value,
+        BOOTSTRAP_RESAMPLES_FLAG.value,
+    )
+  wall_seconds = time.perf_counter() - start_time
+  if instrumentation.is_enabled():
+    stats = instrumentation.get_stats()
+    print(instrumentation.format_report(stats, wall_seconds))
+    if INSTRUMENTATION_FILENAME_FLAG.value is not None:
+      instrumentation.write_report_json(
+          INSTRUMENTATION_FILENAME_FLAG.value, stats, wall_seconds
+      )
 
 
 def evaluate(
-    gt_json_path: str, results_folder: str, parallel_flag: bool
+    gt_json_path: str,
+    results_folder: str,
+    parallel_flag: bool,
+    num_shards: int = 1,
+    shard_index: int = 0,
+    partial_result_filename: Optional[str] = None,
+    engine: str = 'mask',
+    num_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    bootstrap_resamples: int = 0,
 ) -> None:
-  """Evaluate a location-output VideoQA result against the ground truth."""
-  questions = list(location_output_question.iterate_location_output_questions(
-      gt_json_path
-  ))
-  if parallel_flag:
-    with Pool(processes=WORKER_COUNT) as pool:
-      args = ((question, results_folder) for question in questions)
-      question_results = pool.starmap(
-          eval_question, args)
-  else:
-    question_results = []
-    for idx, question in enumerate(questions):
-      print(idx, '/', len(questions))
-      question_result = eval_question(question, results_folder=results_folder)
-      question_results.append(question_result)
-
-  measures = eval_utils.FrameEvaluationResult.__annotations__.keys()
-  for m in measures:
-    m_scores = [getattr(r, m) for r in question_results]
-    m_mean = np.mean(m_scores)
-    print(f'{m}: {m_mean:.1%}')
+  """Evaluate a location-output VideoQA result against the ground truth.
 
+  Args:
+    gt_json_path: the path to the ground truth.
+    results_folder: the folder with the result pngs.
+    parallel_flag: whether to evaluate the questions in worker processes.
+    num_shards: the number of shards into which the questions are split.
+    shard_index: the shard to evaluate.
+    partial_result_filename: if given, the measures of each question of the
+      shard are written to this file, see tools/sharding.py.
+    engine: how to calculate the measures, see
+      location_output_evaluation.ENGINES.
+    num_workers: the number of worker processes, see
+      location_output_evaluation.create_pool.
+    batch_size: if given, the questions are evaluated in batches, see
+      location_output_evaluation.evaluate_questions_for_models.
+    bootstrap_resamples: if positive, the confidence interval of the combined
+      score is estimated with this many resamples of the videos.
 
-def eval_question(
-    question: location_output_question.LocationOutputQuestion,
-    results_folder: str,
-) -> eval_utils.FrameEvaluationResult:
-  result_mask = load_result_box_mask(question, results_folder)
-
-  trace_mask = question.get_trace_mask()
-  approx_gt_square_mask = square_prediction.estimate_approximate_square_gt_mask(
-      trace_mask
+  If the ground truth has a sidecar with the precomputed approximate squares
+  (see precompute_square_gt.py), it is used by the box engine.
+  """
+  num_questions, question_indices, questions = _load_questions(
+      gt_json_path, num_shards, shard_index
   )
-  return eval_utils.evaluate_result(
-      result_mask, approx_gt_square_mask, trace_mask
+  question_results = location_output_evaluation.evaluate_questions(
+      questions,
+      results_folder,
+      parallel_flag,
+      engine=engine,
+      square_gt=square_gt_sidecar.load_sidecar(gt_json_path),
+      num_workers=num_workers,
+      batch_size=batch_size,
   )
 
+  eval_utils.print_measures(question_results)
+  if bootstrap_resamples:
+    _print_bootstrap(
+        questions, {results_folder: question_results}, bootstrap_resamples
+    )
+  if partial_result_filename is not None:
+    sharding.write_partial_results(
+        partial_result_filename,
+        eval_utils.PARTIAL_RESULTS_KIND,
+        num_shards,
+        shard_index,
+        num_questions,
+        eval_utils.results_to_partial(question_indices, question_results),
+    )
 
-def load_result_box_mask(
-    question: location_output_question.LocationOutputQuestion,
-    results_folder: str,
-) -> np.ndarray:
-  """Load the result bounding box represented as a mask.
+
+def evaluate_models(
+    gt_json_path: str,
+    results_paths: list[str],
+    parallel_flag: bool,
+    num_shards: int = 1,
+    shard_index: int = 0,
+    engine: str = 'mask',
+    num_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    bootstrap_resamples: int = 0,
+) -> None:
+  """Evaluate the results of several models in one pass and print a table.
 
   Args:
-    question: the location-output question for which we load the result mask.
-    results_folder: A string pointing to the folder in which the results are
-      stored.
+    gt_json_path: the path to the ground truth.
+    results_paths: the results of each model, see evaluate.
+    parallel_flag: whether to evaluate the questions in worker processes.
+    num_shards: the number of shards into which the questions are split.
+    shard_index: the shard to evaluate.
+    engine: how to calculate the measures, see
+      location_output_evaluation.ENGINES.
+    num_workers: the number of worker processes, see
+      location_output_evaluation.create_pool.
+    batch_size: if given, the questions are evaluated in batches, see
+      location_output_evaluation.evaluate_questions_for_models.
+    bootstrap_resamples: if positive, the confidence interval of the combined
+      score of each model and a paired test against the first model are
+      estimated with this many resamples of the videos.
+  """
+  _, _, questions = _load_questions(gt_json_path, num_shards, shard_index)
+  question_results_by_model = (
+      location_output_evaluation.evaluate_questions_for_models(
+          questions,
+          results_paths,
+          parallel_flag,
+          engine=engine,
+          square_gt=square_gt_sidecar.load_sidecar(gt_json_path),
+          num_workers=num_workers,
+          batch_size=batch_size,
+      )
+  )
+  question_results_by_path = dict(zip(results_paths, question_results_by_model))
+  eval_utils.print_measures_table(question_results_by_path)
+  if bootstrap_resamples:
+    _print_bootstrap(questions, question_results_by_path, bootstrap_resamples)
 
-  Returns:
-    The result bounding box represented as a mask (np.ndarray).
 
-  Here, we load a mask from a .png file and then fill it to it's enclosing
-  bounding box, such that we have a bounding box represented as a mask.
+def _print_bootstrap(
+    questions: list[location_output_question.LocationOutputQuestion],
+    question_results_by_model: dict[
+        str, list[eval_utils.FrameEvaluationResult]
+    ],
+    num_resamples: int,
+) -> None:
+  """Print the confidence interval of the combined score of each model.
 
-  Instead, you can change this function tool load the coordinates of a bounding
-  box and then convert it to a bounding box mask using
-  eval_utils.box_mask_from_bounding_box.
+  The questions are resampled by video, and each model is compared to the first
+  one with a paired test.
   """
-  res_mask_filename = os.path.join(
-      results_folder,
-      question.video_name,
-      question.question_hash,
-      question.trace_frame,
+  video_names = [question.video_name for question in questions]
+  combined_scores = {
+      name: np.array([r.combined_score for r in question_results])
+      for name, question_results in question_results_by_model.items()
+  }
+  first_name, first_scores = next(iter(combined_scores.items()))
+  for name, scores in combined_scores.items():
+    ci = bootstrap.confidence_interval(
+        scores, num_resamples, clusters=video_names
+    )
+    print(
+        f'{name}: combined_score {bootstrap.format_confidence_interval(ci)}'
+    )
+    if name != first_name:
+      test = bootstrap.paired_test(
+          scores, first_scores, num_resamples, clusters=video_names
+      )
+      print(f'  vs. {first_name}: {bootstrap.format_paired_test(test)}')
+
+
+def _load_questions(
+    gt_json_path: str, num_shards: int, shard_index: int
+) -> tuple[
+    int, list[int], list[location_output_question.LocationOutputQuestion]
+]:
+  """Load the questions of the shard and their indices among all questions."""
+  all_questions = list(
+      location_output_question.iterate_location_output_questions(gt_json_path)
   )
-  mask = (frame.load_img(res_mask_filename) > 0).astype(np.uint8)
-  # Usually we convert the mask to a box and evaluate the box.
-  # Note that the box is still represented as a mask.
-  return eval_utils.box_mask_from_mask(mask)
+  question_indices = [
+      idx
+      for idx, question in enumerate(all_questions)
+      if sharding.is_in_shard(question.question_hash, num_shards, shard_index)
+  ]
+  questions = [all_questions[idx] for idx in question_indices]
+  return len(all_questions), question_indices, questions
 
 
 if __name__ == '__main__':
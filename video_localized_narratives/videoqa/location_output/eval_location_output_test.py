@@ -0,0 +1,135 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import location_output_evaluation
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import location_output_test_utils
+
+from absl.testing import absltest
+
+
+_REPO_ROOT = os.path.dirname(
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+)
+
+# eval_location_output is imported in a separate process, because its flags
+# would clash with the flags of other binaries imported by tests in the same
+# process.
+_OLD_ENTRY_POINTS_SCRIPT = """
+import dataclasses
+import json
+import sys
+
+from video_localized_narratives.videoqa.location_output import eval_location_output
+from video_localized_narratives.videoqa.location_output import location_output_question
+
+gt_json_path, results_folder = sys.argv[1:]
+questions = list(
+    location_output_question.iterate_location_output_questions(gt_json_path)
+)
+eval_location_output.evaluate(gt_json_path, results_folder, False)
+print(json.dumps({
+    'worker_count': eval_location_output.WORKER_COUNT,
+    'eval_question': [
+        dataclasses.asdict(
+            eval_location_output.eval_question(question, results_folder)
+        )
+        for question in questions
+    ],
+    'load_result_box_mask': [
+        eval_location_output.load_result_box_mask(
+            question, results_folder
+        ).tolist()
+        for question in questions
+    ],
+}, default=float))
+"""
+
+
+class EvalLocationOutputTest(absltest.TestCase):
+
+  def test_old_entry_points(self):
+    tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(tmp_dir.cleanup)
+    data = location_output_test_utils.write_dataset(tmp_dir.name)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [_REPO_ROOT] + env.get('PYTHONPATH', '').split(os.pathsep)
+    )
+
+    output = subprocess.run(
+        [
+            sys.executable,
+            '-c',
+            _OLD_ENTRY_POINTS_SCRIPT,
+            data.gt_json_path,
+            data.results_folder,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    # The measures printed by evaluate are followed by the json.
+    *measure_lines, json_line = output.splitlines()
+    results = json.loads(json_line)
+
+    questions = list(
+        location_output_question.iterate_location_output_questions(
+            data.gt_json_path
+        )
+    )
+    question_results = [
+        location_output_evaluation.eval_question(question, data.results_folder)
+        for question in questions
+    ]
+    expected_measures = io.StringIO()
+    with contextlib.redirect_stdout(expected_measures):
+      eval_utils.print_measures(question_results)
+    self.assertEqual(
+        measure_lines[-len(expected_measures.getvalue().splitlines()) :],
+        expected_measures.getvalue().splitlines(),
+    )
+    self.assertEqual(
+        results['worker_count'], location_output_evaluation.WORKER_COUNT
+    )
+    self.assertEqual(
+        results['eval_question'],
+        [dataclasses.asdict(r) for r in question_results],
+    )
+    self.assertEqual(
+        results['load_result_box_mask'],
+        [
+            location_output_evaluation.load_result_box_mask(
+                question, data.results_folder
+            ).tolist()
+            for question in questions
+        ],
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
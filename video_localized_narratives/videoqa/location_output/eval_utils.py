@@ -12,16 +12,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Utilities for evaluation location-output questions."""
+"""Utilities for evaluation location-output questions.
+
+There are two equivalent ways to evaluate a result. evaluate_result works on
+full-resolution masks. evaluate_result_boxes represents the result and the
+approximate ground truth square as boxes and intersects the box with the
+run-length encoded trace directly, which gives exactly the same scores without
+allocating any full-resolution masks. evaluate_packed_results_batch works on
+bit-packed masks, see tools/packed_mask.py.
+"""
 
 import dataclasses
+from typing import Any
+
 import numpy as np
 from pycocotools import mask as cocomask
 
+from video_localized_narratives.tools import packed_mask
+
 
 RECALL_THRESHOLD = 0.5
 PRECISION_THRESHOLD = 0.5
 
+PARTIAL_RESULTS_KIND = 'location_output'
+
 
 @dataclasses.dataclass(frozen=True)
 class FrameEvaluationResult:
@@ -51,6 +65,328 @@ def evaluate_result(
   )
 
 
+@dataclasses.dataclass(frozen=True)
+class Box:
+  """The pixels [x0, x1) x [y0, y1) of an image, with coordinates inside it."""
+  x0: int
+  y0: int
+  x1: int
+  y1: int
+
+  def area(self) -> int:
+    return max(self.x1 - self.x0, 0) * max(self.y1 - self.y0, 0)
+
+  def intersection(self, other: 'Box') -> 'Box':
+    return Box(
+        x0=max(self.x0, other.x0),
+        y0=max(self.y0, other.y0),
+        x1=min(self.x1, other.x1),
+        y1=min(self.y1, other.y1),
+    )
+
+
+def box_from_slices(
+    image_w: int, image_h: int, x0: int, x1: int, y0: int, y1: int
+) -> Box:
+  """The box filled by mask[y0:y1, x0:x1] = 1, with numpy slice semantics."""
+  x0, x1, _ = slice(x0, x1).indices(image_w)
+  y0, y1, _ = slice(y0, y1).indices(image_h)
+  return Box(x0=x0, y0=y0, x1=max(x1, x0), y1=max(y1, y0))
+
+
+def box_from_bounding_box(
+    image_w: int, image_h: int, x: int, y: int, w: int, h: int
+) -> Box:
+  """The box which box_mask_from_bounding_box fills."""
+  return box_from_slices(image_w, image_h, x, x + w, y, y + h)
+
+
+def box_from_mask(mask: np.ndarray) -> Box:
+  """The box which box_mask_from_mask fills, for a mask of shape (H, W)."""
+  image_h, image_w = mask.shape
+  rows = np.flatnonzero(mask.any(axis=1))
+  if not rows.size:
+    return Box(x0=0, y0=0, x1=0, y1=0)
+  cols = np.flatnonzero(mask.any(axis=0))
+  return box_from_slices(
+      image_w, image_h, cols[0], cols[-1] + 1, rows[0], rows[-1] + 1
+  )
+
+
+def evaluate_result_boxes(
+    result_box: Box, approx_gt_square_box: Box, trace_rle: dict[str, Any]
+) -> FrameEvaluationResult:
+  """Evaluate a result box, with the same scores as evaluate_result.
+
+  Args:
+    result_box: the result box, e.g. from box_from_mask.
+    approx_gt_square_box: the approximate ground truth square, see
+      square_prediction.estimate_approximate_square_gt_box.
+    trace_rle: the trace mask as a COCO RLE.
+
+  Returns:
+    The evaluation result.
+  """
+  [result] = evaluate_result_boxes_batch(
+      boxes_to_array([result_box]),
+      boxes_to_array([approx_gt_square_box]),
+      np.array([rle_box_intersection_area(trace_rle, result_box)]),
+      np.array([cocomask.area(trace_rle)]),
+  )
+  return result
+
+
+def evaluate_result_boxes_batch(
+    result_boxes: np.ndarray,
+    approx_gt_square_boxes: np.ndarray,
+    trace_intersection_areas: np.ndarray,
+    trace_areas: np.ndarray,
+) -> list[FrameEvaluationResult]:
+  """Evaluate many result boxes at once, with the scores of evaluate_result.
+
+  Args:
+    result_boxes: the result boxes as an array of shape (N, 4) with the
+      coordinates x0, y0, x1, y1 of each Box.
+    approx_gt_square_boxes: the approximate ground truth squares, in the same
+      format.
+    trace_intersection_areas: the number of trace pixels inside each result
+      box, see rle_box_intersection_area.
+    trace_areas: the number of pixels of each trace.
+
+  Returns:
+    The evaluation result for each box.
+  """
+  assert np.all(trace_areas > 0)
+  recalls = np.asarray(trace_intersection_areas, dtype=np.int64) / np.asarray(
+      trace_areas, dtype=np.int64
+  )
+
+  assert np.all(_box_areas(approx_gt_square_boxes) > 0)
+  result_areas = _box_areas(result_boxes)
+  square_intersection_areas = _box_areas(
+      np.concatenate(
+          [
+              np.maximum(result_boxes[:, :2], approx_gt_square_boxes[:, :2]),
+              np.minimum(result_boxes[:, 2:], approx_gt_square_boxes[:, 2:]),
+          ],
+          axis=1,
+      )
+  )
+  return _frame_evaluation_results(
+      recalls, square_intersection_areas, result_areas
+  )
+
+
+def evaluate_results_batch(
+    result_masks: np.ndarray,
+    approx_gt_square_masks: np.ndarray,
+    trace_masks: np.ndarray,
+) -> list[FrameEvaluationResult]:
+  """Evaluate a batch of masks at once, with the scores of evaluate_result.
+
+  Args:
+    result_masks: the result box masks, of shape (B, H, W).
+    approx_gt_square_masks: the approximate ground truth square masks, of
+      shape (B, H, W).
+    trace_masks: the trace masks, of shape (B, H, W).
+
+  Returns:
+    The evaluation result for each mask of the batch.
+  """
+  trace_intersection_areas = np.logical_and(result_masks, trace_masks).sum(
+      axis=(1, 2)
+  )
+  trace_areas = trace_masks.sum(axis=(1, 2), dtype=np.int64)
+  assert np.all(trace_areas > 0)
+  recalls = trace_intersection_areas / trace_areas
+
+  assert np.all(approx_gt_square_masks.any(axis=(1, 2)))
+  square_intersection_areas = np.logical_and(
+      result_masks, approx_gt_square_masks
+  ).sum(axis=(1, 2))
+  result_areas = result_masks.sum(axis=(1, 2), dtype=np.int64)
+  return _frame_evaluation_results(
+      recalls, square_intersection_areas, result_areas
+  )
+
+
+def evaluate_packed_results_batch(
+    result_masks: packed_mask.PackedMask,
+    approx_gt_square_masks: packed_mask.PackedMask,
+    trace_masks: packed_mask.PackedMask,
+) -> list[FrameEvaluationResult]:
+  """Like evaluate_results_batch, for bit-packed masks of shape (B, H, W)."""
+  trace_intersection_areas = result_masks.intersection_count(trace_masks)
+  trace_areas = trace_masks.count()
+  assert np.all(trace_areas > 0)
+  recalls = trace_intersection_areas / trace_areas
+
+  assert np.all(approx_gt_square_masks.any())
+  square_intersection_areas = result_masks.intersection_count(
+      approx_gt_square_masks
+  )
+  return _frame_evaluation_results(
+      recalls, square_intersection_areas, result_masks.count()
+  )
+
+
+def _frame_evaluation_results(
+    recalls: np.ndarray,
+    square_intersection_areas: np.ndarray,
+    result_areas: np.ndarray,
+) -> list[FrameEvaluationResult]:
+  """Threshold the measures of a batch like evaluate_result."""
+  with np.errstate(divide='ignore', invalid='ignore'):
+    precisions = square_intersection_areas / result_areas
+  is_empty = result_areas == 0
+  precisions[is_empty] = 0.0
+  recall_criteria = np.where(recalls >= RECALL_THRESHOLD, 1.0, 0.0)
+  precision_criteria = np.where(precisions >= PRECISION_THRESHOLD, 1.0, 0.0)
+  combined_scores = recall_criteria * precision_criteria
+  # Like evaluate_result, the criteria are Python floats and the precision of
+  # an empty result box is as well.
+  recall_criteria = recall_criteria.tolist()
+  precision_criteria = precision_criteria.tolist()
+  combined_scores = combined_scores.tolist()
+  return [
+      FrameEvaluationResult(
+          recall=recalls[idx],
+          precision=0.0 if is_empty[idx] else precisions[idx],
+          recall_criterion=recall_criteria[idx],
+          precision_criterion=precision_criteria[idx],
+          combined_score=combined_scores[idx],
+      )
+      for idx in range(len(recalls))
+  ]
+
+
+def boxes_to_array(boxes: list[Box]) -> np.ndarray:
+  """Convert the boxes to the format of evaluate_result_boxes_batch."""
+  return np.array(
+      [(box.x0, box.y0, box.x1, box.y1) for box in boxes], dtype=np.int64
+  ).reshape(-1, 4)
+
+
+def _box_areas(boxes: np.ndarray) -> np.ndarray:
+  widths = np.maximum(boxes[:, 2] - boxes[:, 0], 0)
+  heights = np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+  return (widths * heights).astype(np.int64)
+
+
+def rle_box_intersection_area(rle: dict[str, Any], box: Box) -> int:
+  """Count the foreground pixels of an RLE mask inside the box.
+
+  Args:
+    rle: a COCO RLE, with compressed or uncompressed counts.
+    box: the box.
+
+  Returns:
+    The number of foreground pixels inside the box.
+
+  The RLE runs over the pixels in column-major order, so each column of the box
+  is one interval of pixel indices. The number of foreground pixels before any
+  pixel index follows from the cumulative run lengths.
+  """
+  if box.area() == 0:
+    return 0
+  image_h, _ = rle['size']
+  counts = rle_counts(rle)
+  # Run i covers the pixel indices [bounds[i], bounds[i + 1]). Odd runs are
+  # foreground.
+  bounds = np.concatenate([[0], np.cumsum(counts)])
+  fg_counts = np.where(np.arange(len(counts)) % 2 == 1, counts, 0)
+  fg_before_run = np.concatenate([[0], np.cumsum(fg_counts)])
+
+  def fg_before(pixel_indices: np.ndarray) -> np.ndarray:
+    runs = np.searchsorted(bounds, pixel_indices, side='right') - 1
+    runs = np.clip(runs, 0, len(counts) - 1)
+    partial = np.where(runs % 2 == 1, pixel_indices - bounds[runs], 0)
+    return fg_before_run[runs] + partial
+
+  column_starts = np.arange(box.x0, box.x1, dtype=np.int64) * image_h
+  inside = fg_before(column_starts + box.y1) - fg_before(column_starts + box.y0)
+  return int(inside.sum())
+
+
+def rle_counts(rle: dict[str, Any]) -> np.ndarray:
+  """The run lengths of an RLE, decoding compressed counts like pycocotools."""
+  counts = rle['counts']
+  if isinstance(counts, list):
+    return np.array(counts, dtype=np.int64)
+  if isinstance(counts, str):
+    counts = counts.encode('ascii')
+  # This follows rleFrString of the COCO API.
+  decoded = []
+  p = 0
+  while p < len(counts):
+    x = 0
+    k = 0
+    more = True
+    while more:
+      c = counts[p] - 48
+      x |= (c & 0x1F) << (5 * k)
+      more = bool(c & 0x20)
+      p += 1
+      k += 1
+      if not more and c & 0x10:
+        x |= -1 << (5 * k)
+    if len(decoded) > 2:
+      x += decoded[-2]
+    decoded.append(x)
+  return np.array(decoded, dtype=np.int64)
+
+
+def print_measures(question_results: list[FrameEvaluationResult]) -> None:
+  """Print the mean of each measure over the questions, in the given order."""
+  measures = FrameEvaluationResult.__annotations__.keys()
+  for m in measures:
+    m_scores = [getattr(r, m) for r in question_results]
+    m_mean = np.mean(m_scores)
+    print(f'{m}: {m_mean:.1%}')
+
+
+def print_measures_table(
+    question_results_by_model: dict[str, list[FrameEvaluationResult]],
+) -> None:
+  """Print the means of print_measures as a table with one row per model."""
+  measures = list(FrameEvaluationResult.__annotations__.keys())
+  name_width = max(len(name) for name in ['model', *question_results_by_model])
+  print('  '.join(['model'.ljust(name_width), *measures]))
+  for name, question_results in question_results_by_model.items():
+    cells = [name.ljust(name_width)]
+    for m in measures:
+      m_mean = np.mean([getattr(r, m) for r in question_results])
+      cells.append(f'{m_mean:.1%}'.rjust(len(m)))
+    print('  '.join(cells))
+
+
+def results_to_partial(
+    question_indices: list[int], question_results: list[FrameEvaluationResult]
+) -> list[tuple[int, dict[str, float]]]:
+  """Convert the results of a shard to json, see tools/sharding.py.
+
+  Args:
+    question_indices: the index of each question among all questions.
+    question_results: the results of the questions.
+
+  Returns:
+    The index and the measures of each question.
+  """
+  return [
+      (idx, dataclasses.asdict(r))
+      for idx, r in zip(question_indices, question_results)
+  ]
+
+
+def results_from_partials(
+    partial_results: list[list[tuple[int, dict[str, float]]]],
+) -> list[FrameEvaluationResult]:
+  """Merge the results of all shards in the order of the questions."""
+  indexed_results = [r for results in partial_results for r in results]
+  indexed_results.sort(key=lambda r: r[0])
+  return [FrameEvaluationResult(**measures) for _, measures in indexed_results]
+
+
 def _eval_recall(pred_mask: np.ndarray, trace_mask: np.ndarray) -> float:
   i = np.logical_and(pred_mask, trace_mask).sum()
   a = trace_mask.sum()
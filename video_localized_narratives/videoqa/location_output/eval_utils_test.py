@@ -0,0 +1,139 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.tools import packed_mask
+from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import square_prediction
+
+from absl.testing import absltest
+
+
+def _encode(arr: np.ndarray) -> dict[str, object]:
+  rle = cocomask.encode(np.asfortranarray(arr))
+  rle['counts'] = rle['counts'].decode()
+  return rle
+
+
+def _random_trace(rng: np.random.Generator, h: int, w: int) -> np.ndarray:
+  trace = np.zeros((h, w), dtype=np.uint8)
+  y, x = rng.integers(0, h), rng.integers(0, w)
+  for _ in range(rng.integers(1, 40)):
+    y = int(np.clip(y + rng.integers(-6, 7), 0, h - 1))
+    x = int(np.clip(x + rng.integers(-6, 7), 0, w - 1))
+    trace[max(y - 1, 0):y + 2, max(x - 1, 0):x + 2] = 1
+  return trace
+
+
+def _random_result(rng: np.random.Generator, h: int, w: int) -> np.ndarray:
+  result = np.zeros((h, w), dtype=np.uint8)
+  if rng.random() < 0.1:
+    return result
+  y0, y1 = sorted(rng.integers(0, h, size=2))
+  x0, x1 = sorted(rng.integers(0, w, size=2))
+  result[y0:y1 + 1, x0:x1 + 1] = rng.random((y1 - y0 + 1, x1 - x0 + 1)) < 0.3
+  return result
+
+
+class EvalUtilsTest(absltest.TestCase):
+
+  def test_box_from_mask_matches_box_mask(self):
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+      result = _random_result(rng, 23, 31)
+      box = eval_utils.box_from_mask(result)
+      expected = eval_utils.box_mask_from_mask(result)
+      actual = np.zeros_like(expected)
+      actual[box.y0:box.y1, box.x0:box.x1] = 1
+      np.testing.assert_array_equal(actual, expected)
+      self.assertEqual(box.area(), expected.sum())
+
+  def test_rle_box_intersection_area(self):
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+      trace = _random_trace(rng, 40, 50)
+      y0, y1 = sorted(rng.integers(0, 41, size=2))
+      x0, x1 = sorted(rng.integers(0, 51, size=2))
+      box = eval_utils.Box(x0=x0, y0=y0, x1=x1, y1=y1)
+      expected = int(trace[y0:y1, x0:x1].sum())
+      rle = _encode(trace)
+      self.assertEqual(eval_utils.rle_box_intersection_area(rle, box), expected)
+      rle['counts'] = rle['counts'].encode()
+      self.assertEqual(eval_utils.rle_box_intersection_area(rle, box), expected)
+
+  def test_evaluate_result_boxes_matches_evaluate_result(self):
+    rng = np.random.default_rng(2)
+    for h, w in [(30, 40), (45, 20), (1, 7)]:
+      for _ in range(40):
+        trace = _random_trace(rng, h, w)
+        result = _random_result(rng, h, w)
+        square_mask = square_prediction.estimate_approximate_square_gt_mask(
+            trace
+        )
+        y0, y1, x0, x1 = square_prediction.estimate_approximate_square_gt_box(
+            trace
+        )
+        square_box = eval_utils.box_from_slices(w, h, x0, x1, y0, y1)
+        if not square_mask.any():
+          # E.g. for a single-pixel trace. Both engines reject this.
+          self.assertEqual(square_box.area(), 0)
+          continue
+
+        expected = eval_utils.evaluate_result(
+            eval_utils.box_mask_from_mask(result), square_mask, trace
+        )
+        actual = eval_utils.evaluate_result_boxes(
+            eval_utils.box_from_mask(result), square_box, _encode(trace)
+        )
+
+        self.assertEqual(actual, expected)
+
+
+  def test_evaluate_results_batch_matches_evaluate_result(self):
+    rng = np.random.default_rng(3)
+    result_masks = []
+    square_masks = []
+    trace_masks = []
+    for _ in range(30):
+      trace = _random_trace(rng, 30, 40)
+      square_mask = square_prediction.estimate_approximate_square_gt_mask(trace)
+      if not square_mask.any():
+        continue
+      result_masks.append(
+          eval_utils.box_mask_from_mask(_random_result(rng, 30, 40))
+      )
+      square_masks.append(square_mask)
+      trace_masks.append(trace)
+
+    actual = eval_utils.evaluate_results_batch(
+        np.stack(result_masks), np.stack(square_masks), np.stack(trace_masks)
+    )
+
+    packed_actual = eval_utils.evaluate_packed_results_batch(
+        packed_mask.PackedMask.from_dense(np.stack(result_masks)),
+        packed_mask.PackedMask.from_dense(np.stack(square_masks)),
+        packed_mask.PackedMask.from_dense(np.stack(trace_masks)),
+    )
+
+    expected = [
+        eval_utils.evaluate_result(*masks)
+        for masks in zip(result_masks, square_masks, trace_masks)
+    ]
+    self.assertEqual(actual, expected)
+    self.assertEqual(packed_actual, expected)
+
+if __name__ == '__main__':
+  absltest.main()
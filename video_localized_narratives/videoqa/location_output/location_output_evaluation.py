@@ -0,0 +1,628 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Evaluate location-output VideoQA results question by question.
+
+This is the library behind eval_location_output.py, e.g. for evaluating from
+other tools without the command line flags of eval_location_output.py.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+from multiprocessing import Pool
+import PIL.Image
+
+from video_localized_narratives.tools import frame
+from video_localized_narratives.tools import instrumentation
+from video_localized_narratives.tools import packed_mask
+from video_localized_narratives.tools import progress
+from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import location_output_results
+from video_localized_narratives.videoqa.location_output import square_gt_sidecar
+from video_localized_narratives.videoqa.location_output import square_prediction
+
+
+WORKER_COUNT = 12
+
+# The mask engine evaluates full-resolution masks with
+# eval_utils.evaluate_result. The box engine gives the same results with
+# eval_utils.evaluate_result_boxes, without the full-resolution masks.
+ENGINES = ('mask', 'box')
+
+# For these image modes, PIL.Image.getbbox finds the same box as thresholding
+# the decoded image with > 0.
+_GETBBOX_IMAGE_MODES = ('1', 'L', 'P')
+
+
+def evaluate_questions(
+    questions: list[location_output_question.LocationOutputQuestion],
+    results_folder: str,
+    parallel_flag: bool,
+    pool: Optional[Pool] = None,
+    engine: str = 'mask',
+    square_gt: Optional[square_gt_sidecar.SquareGt] = None,
+    num_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> list[eval_utils.FrameEvaluationResult]:
+  """Evaluate the results for the questions, in the order of the questions.
+
+  Args:
+    questions: the questions to evaluate.
+    results_folder: the folder with the result pngs, or a json or jsonl file
+      with a box per question, see location_output_results.py.
+    parallel_flag: whether to evaluate the questions in worker processes.
+    pool: an existing pool created with create_pool, which is used instead of
+      starting new worker processes if parallel_flag is True.
+    engine: how to calculate the measures, one of ENGINES.
+    square_gt: optionally, the precomputed approximate squares of (at least)
+      these questions, e.g. from square_gt_sidecar.load_sidecar. They are used
+      when evaluating a box results file with the box engine or in batches.
+    num_workers: the number of worker processes if a new pool is created, see
+      create_pool.
+    batch_size: if given, the questions are evaluated in batches, see
+      evaluate_questions_for_models.
+
+  Returns:
+    The result for each question.
+  """
+  [question_results] = evaluate_questions_for_models(
+      questions,
+      [results_folder],
+      parallel_flag,
+      pool,
+      engine,
+      square_gt,
+      num_workers,
+      batch_size,
+  )
+  return question_results
+
+
+def evaluate_questions_for_models(
+    questions: list[location_output_question.LocationOutputQuestion],
+    results_paths: list[str],
+    parallel_flag: bool,
+    pool: Optional[Pool] = None,
+    engine: str = 'mask',
+    square_gt: Optional[square_gt_sidecar.SquareGt] = None,
+    num_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> list[list[eval_utils.FrameEvaluationResult]]:
+  """Evaluate the results of several models for the questions in one pass.
+
+  The ground truth of each question is decoded once and all models are
+  evaluated against it in the same task.
+
+  Args:
+    questions: the questions to evaluate.
+    results_paths: the results of each model, see evaluate_questions.
+    parallel_flag: whether to evaluate the questions in worker processes.
+    pool: an existing pool created with create_pool, which is used instead of
+      starting new worker processes if parallel_flag is True.
+    engine: how to calculate the measures, one of ENGINES.
+    square_gt: optionally, the precomputed approximate squares, see
+      evaluate_questions.
+    num_workers: the number of worker processes if a new pool is created, see
+      create_pool.
+    batch_size: if given, the questions are evaluated in batches of at most
+      this many questions with the same resolution, with vectorized NumPy over
+      each batch. A batch of the mask engine takes about 3 * batch_size
+      * H * W / 8 bytes of memory, since its masks are bit-packed.
+
+  Returns:
+    The result for each question, for each model in the order of
+    results_paths.
+  """
+  if engine not in ENGINES:
+    raise ValueError(f'Unknown engine {engine}, available: {ENGINES}')
+  results_by_path = {}
+  if engine == 'box':
+    # Without pngs to decode, worker processes would only add overhead.
+    box_results_paths = [
+        path
+        for path in results_paths
+        if location_output_results.is_box_results_file(path)
+    ]
+    if box_results_paths and square_gt is None:
+      square_gt = square_gt_sidecar.compute_square_gt(questions)
+    for path in box_results_paths:
+      results_by_path[path] = evaluate_questions_boxes(
+          questions,
+          location_output_results.load_bounding_boxes(path),
+          square_gt,
+      )
+  other_paths = [path for path in results_paths if path not in results_by_path]
+  if other_paths:
+    if parallel_flag and pool is None:
+      with create_pool(num_workers) as new_pool:
+        model_results_by_question = _evaluate_in_tasks(
+            questions, other_paths, new_pool, engine, square_gt, batch_size
+        )
+    else:
+      model_results_by_question = _evaluate_in_tasks(
+          questions,
+          other_paths,
+          pool if parallel_flag else None,
+          engine,
+          square_gt,
+          batch_size,
+      )
+    for model_idx, path in enumerate(other_paths):
+      results_by_path[path] = [
+          model_results[model_idx]
+          for model_results in model_results_by_question
+      ]
+  return [results_by_path[path] for path in results_paths]
+
+
+def _evaluate_in_tasks(
+    questions: list[location_output_question.LocationOutputQuestion],
+    results_paths: list[str],
+    pool: Optional[Pool],
+    engine: str,
+    square_gt: Optional[square_gt_sidecar.SquareGt],
+    batch_size: Optional[int],
+) -> list[list[eval_utils.FrameEvaluationResult]]:
+  """Evaluate the questions, in the pool if given, one task per batch.
+
+  Args:
+    questions: the questions to evaluate.
+    results_paths: the results of each model.
+    pool: the pool, or None to evaluate in this process.
+    engine: how to calculate the measures, one of ENGINES.
+    square_gt: optionally, the precomputed approximate squares.
+    batch_size: the maximum batch size, or None to evaluate question by
+      question.
+
+  Returns:
+    The result of each model, for each question.
+  """
+  if batch_size is None:
+    func = eval_question_for_models
+    task_func = _eval_question_task
+    args = [(question, results_paths, engine) for question in questions]
+    batches = [[idx] for idx in range(len(questions))]
+  else:
+    func = eval_questions_batch_for_models
+    task_func = _eval_batch_task
+    batches = make_batches(questions, batch_size)
+    args = [
+        (
+            [questions[idx] for idx in batch],
+            results_paths,
+            engine,
+            None if square_gt is None else square_gt.select(
+                [questions[idx].question_hash for idx in batch]
+            ),
+        )
+        for batch in batches
+    ]
+
+  if pool is not None:
+    task_results = []
+    for task_result, stats in pool.starmap(task_func, args):
+      instrumentation.add_stats(stats)
+      task_results.append(task_result)
+  else:
+    task_results = []
+    for idx, task_args in enumerate(args):
+      print(idx, '/', len(args))
+      task_results.append(func(*task_args))
+
+  model_results_by_question = [None] * len(questions)
+  for batch, task_result in zip(batches, task_results):
+    if batch_size is None:
+      task_result = [task_result]
+    for idx, model_results in zip(batch, task_result):
+      model_results_by_question[idx] = model_results
+  return model_results_by_question
+
+
+def make_batches(
+    questions: list[location_output_question.LocationOutputQuestion],
+    batch_size: int,
+) -> list[list[int]]:
+  """Group the questions by resolution into batches of at most batch_size.
+
+  Args:
+    questions: the questions.
+    batch_size: the maximum number of questions per batch.
+
+  Returns:
+    The indices of the questions of each batch. The questions of a batch have
+    the same resolution and keep their order.
+  """
+  indices_by_size = {}
+  for idx, question in enumerate(questions):
+    indices_by_size.setdefault(tuple(question.trace['size']), []).append(idx)
+  return [
+      indices[start:start + batch_size]
+      for indices in indices_by_size.values()
+      for start in range(0, len(indices), batch_size)
+  ]
+
+
+def evaluate_questions_boxes(
+    questions: list[location_output_question.LocationOutputQuestion],
+    bounding_boxes: dict[str, location_output_results.BoundingBox],
+    square_gt: Optional[square_gt_sidecar.SquareGt] = None,
+) -> list[eval_utils.FrameEvaluationResult]:
+  """Evaluate result boxes for all questions at once, in the box domain.
+
+  Args:
+    questions: the questions to evaluate.
+    bounding_boxes: the result box [x, y, w, h] by question_hash, see
+      location_output_results.load_bounding_boxes.
+    square_gt: optionally, the precomputed approximate squares of (at least)
+      these questions. Otherwise they are computed from the traces.
+
+  Returns:
+    The result for each question, the same as eval_question.
+  """
+  if not questions:
+    return []
+  with instrumentation.phase('load_result_box'):
+    result_boxes = eval_utils.boxes_to_array(
+        [_get_result_box(q, bounding_boxes) for q in questions]
+    )
+  with instrumentation.phase('approx_gt_square'):
+    question_hashes = [q.question_hash for q in questions]
+    if square_gt is None:
+      square_gt = square_gt_sidecar.compute_square_gt(questions)
+    else:
+      square_gt = square_gt.select(question_hashes)
+  instrumentation.count('questions', len(questions))
+  with instrumentation.phase('metrics'):
+    return _evaluate_result_boxes(questions, result_boxes, square_gt)
+
+
+def _evaluate_result_boxes(
+    questions: list[location_output_question.LocationOutputQuestion],
+    result_boxes: np.ndarray,
+    square_gt: square_gt_sidecar.SquareGt,
+) -> list[eval_utils.FrameEvaluationResult]:
+  """Evaluate the result boxes of shape (N, 4) of the questions."""
+  # Only result boxes which cut through the bounding box of the trace need
+  # the trace itself.
+  trace_boxes = square_gt.trace_boxes
+  intersections = np.concatenate(
+      [
+          np.maximum(result_boxes[:, :2], trace_boxes[:, :2]),
+          np.minimum(result_boxes[:, 2:], trace_boxes[:, 2:]),
+      ],
+      axis=1,
+  )
+  is_disjoint = np.any(intersections[:, :2] >= intersections[:, 2:], axis=1)
+  contains_trace = np.all(intersections == trace_boxes, axis=1)
+  trace_intersection_areas = np.where(contains_trace, square_gt.trace_areas, 0)
+  for idx in np.flatnonzero(~is_disjoint & ~contains_trace):
+    trace_intersection_areas[idx] = eval_utils.rle_box_intersection_area(
+        questions[idx].trace, eval_utils.Box(*result_boxes[idx])
+    )
+  return eval_utils.evaluate_result_boxes_batch(
+      result_boxes,
+      square_gt.square_boxes,
+      trace_intersection_areas,
+      square_gt.trace_areas,
+  )
+
+
+def create_pool(num_workers: Optional[int] = None) -> Pool:
+  """Create a pool of worker processes, which can be reused for evaluations.
+
+  Args:
+    num_workers: the number of worker processes. Defaults to WORKER_COUNT, but
+      at most the number of CPUs available to this process.
+
+  Returns:
+    The pool.
+  """
+  if num_workers is None:
+    num_workers = min(WORKER_COUNT, progress.available_cpu_count())
+  return Pool(
+      processes=num_workers,
+      initializer=instrumentation.enable,
+      initargs=(instrumentation.is_enabled(),),
+  )
+
+
+def _eval_question_task(
+    question: location_output_question.LocationOutputQuestion,
+    results_paths: list[str],
+    engine: str,
+) -> tuple[
+    list[eval_utils.FrameEvaluationResult], Optional[instrumentation.Stats]
+]:
+  """Evaluate the question, also returning the instrumentation stats."""
+  model_results = eval_question_for_models(question, results_paths, engine)
+  return model_results, instrumentation.pop_stats()
+
+
+def _eval_batch_task(
+    questions: list[location_output_question.LocationOutputQuestion],
+    results_paths: list[str],
+    engine: str,
+    square_gt: Optional[square_gt_sidecar.SquareGt],
+) -> tuple[
+    list[list[eval_utils.FrameEvaluationResult]],
+    Optional[instrumentation.Stats],
+]:
+  """Evaluate the batch, also returning the instrumentation stats."""
+  model_results_by_question = eval_questions_batch_for_models(
+      questions, results_paths, engine, square_gt
+  )
+  return model_results_by_question, instrumentation.pop_stats()
+
+
+def eval_questions_batch_for_models(
+    questions: list[location_output_question.LocationOutputQuestion],
+    results_paths: list[str],
+    engine: str = 'mask',
+    square_gt: Optional[square_gt_sidecar.SquareGt] = None,
+) -> list[list[eval_utils.FrameEvaluationResult]]:
+  """Evaluate a batch of questions with vectorized NumPy over the batch.
+
+  Args:
+    questions: the questions, which all have the same resolution, see
+      make_batches.
+    results_paths: the results of each model, see evaluate_questions.
+    engine: how to calculate the measures, one of ENGINES.
+    square_gt: optionally, the precomputed approximate squares of exactly
+      these questions.
+
+  Returns:
+    The result of each model, for each question. The results are the same as
+    for eval_question_for_models.
+  """
+  image_h, image_w = questions[0].trace['size']
+  if any(list(q.trace['size']) != [image_h, image_w] for q in questions):
+    raise ValueError('The questions of a batch must have the same resolution.')
+  with instrumentation.phase('approx_gt_square'):
+    if square_gt is None:
+      square_gt = square_gt_sidecar.compute_square_gt(questions)
+  if engine == 'mask':
+    # The masks are bit-packed, and the traces are decoded one at a time, so a
+    # batch takes 1 / 8 of the memory of uint8 masks.
+    with instrumentation.phase('decode_trace'):
+      trace_masks = packed_mask.PackedMask.stack(
+          [packed_mask.PackedMask.from_rle(q.trace) for q in questions]
+      )
+    with instrumentation.phase('approx_gt_square'):
+      approx_gt_square_masks = packed_mask.PackedMask.from_boxes(
+          square_gt.square_boxes, image_h, image_w
+      )
+    instrumentation.count('pixels', len(questions) * image_h * image_w)
+  instrumentation.count('questions', len(questions))
+
+  results_by_model = []
+  for results_path in results_paths:
+    with instrumentation.phase('load_result_box'):
+      result_boxes = eval_utils.boxes_to_array(
+          [load_result_box(q, results_path) for q in questions]
+      )
+    with instrumentation.phase('metrics'):
+      if engine == 'mask':
+        results_by_model.append(
+            eval_utils.evaluate_packed_results_batch(
+                packed_mask.PackedMask.from_boxes(
+                    result_boxes, image_h, image_w
+                ),
+                approx_gt_square_masks,
+                trace_masks,
+            )
+        )
+      else:
+        results_by_model.append(
+            _evaluate_result_boxes(questions, result_boxes, square_gt)
+        )
+  return [list(model_results) for model_results in zip(*results_by_model)]
+
+
+def eval_question(
+    question: location_output_question.LocationOutputQuestion,
+    results_folder: str,
+    engine: str = 'mask',
+) -> eval_utils.FrameEvaluationResult:
+  [question_result] = eval_question_for_models(
+      question, [results_folder], engine
+  )
+  return question_result
+
+
+def eval_question_for_models(
+    question: location_output_question.LocationOutputQuestion,
+    results_paths: list[str],
+    engine: str = 'mask',
+) -> list[eval_utils.FrameEvaluationResult]:
+  """Evaluate the results of several models for one question.
+
+  Args:
+    question: the question to evaluate.
+    results_paths: the results of each model, see evaluate_questions.
+    engine: how to calculate the measures, one of ENGINES.
+
+  Returns:
+    The result of each model.
+  """
+  if engine == 'box':
+    return eval_question_boxes_for_models(question, results_paths)
+  with instrumentation.phase('decode_trace'):
+    trace_mask = question.get_trace_mask()
+  with instrumentation.phase('approx_gt_square'):
+    approx_gt_square_mask = (
+        square_prediction.estimate_approximate_square_gt_mask(trace_mask)
+    )
+  instrumentation.count('questions')
+  instrumentation.count('pixels', trace_mask.size)
+
+  model_results = []
+  for results_path in results_paths:
+    with instrumentation.phase('load_result_box'):
+      result_mask = load_result_box_mask(question, results_path)
+    with instrumentation.phase('metrics'):
+      model_results.append(
+          eval_utils.evaluate_result(
+              result_mask, approx_gt_square_mask, trace_mask
+          )
+      )
+  return model_results
+
+
+def eval_question_boxes(
+    question: location_output_question.LocationOutputQuestion,
+    results_folder: str,
+) -> eval_utils.FrameEvaluationResult:
+  """Evaluate the question like eval_question, but in the box domain."""
+  [question_result] = eval_question_boxes_for_models(
+      question, [results_folder]
+  )
+  return question_result
+
+
+def eval_question_boxes_for_models(
+    question: location_output_question.LocationOutputQuestion,
+    results_paths: list[str],
+) -> list[eval_utils.FrameEvaluationResult]:
+  """Like eval_question_for_models, but in the box domain."""
+  with instrumentation.phase('approx_gt_square'):
+    approx_gt_square_box = _approx_gt_square_box(question)
+  instrumentation.count('questions')
+
+  model_results = []
+  for results_path in results_paths:
+    with instrumentation.phase('load_result_box'):
+      result_box = load_result_box(question, results_path)
+    with instrumentation.phase('metrics'):
+      model_results.append(
+          eval_utils.evaluate_result_boxes(
+              result_box, approx_gt_square_box, question.trace
+          )
+      )
+  return model_results
+
+
+def _approx_gt_square_box(
+    question: location_output_question.LocationOutputQuestion,
+) -> eval_utils.Box:
+  y0, y1, x0, x1 = (
+      square_prediction.estimate_approximate_square_gt_box_from_rle(
+          question.trace
+      )
+  )
+  image_h, image_w = question.trace['size']
+  return eval_utils.box_from_slices(image_w, image_h, x0, x1, y0, y1)
+
+
+def load_result_box(
+    question: location_output_question.LocationOutputQuestion,
+    results_folder: str,
+) -> eval_utils.Box:
+  """Load the result bounding box, which load_result_box_mask would fill.
+
+  Args:
+    question: the location-output question for which we load the result box.
+    results_folder: the folder with the result pngs, or a json or jsonl file
+      with a box per question.
+
+  Returns:
+    The result box.
+  """
+  if location_output_results.is_box_results_file(results_folder):
+    return _get_result_box(
+        question, location_output_results.load_bounding_boxes(results_folder)
+    )
+  res_mask_filename = _get_result_mask_filename(question, results_folder)
+  if instrumentation.is_enabled():
+    instrumentation.count('bytes_read', os.path.getsize(res_mask_filename))
+  with open(res_mask_filename, 'rb') as f:
+    img = PIL.Image.open(f)
+    if img.mode in _GETBBOX_IMAGE_MODES:
+      # Fast path: find the box without converting the image to an array.
+      bbox = img.getbbox()
+      if bbox is None:
+        return eval_utils.Box(x0=0, y0=0, x1=0, y1=0)
+      x0, y0, x1, y1 = bbox
+      return eval_utils.Box(x0=x0, y0=y0, x1=x1, y1=y1)
+    mask = (np.array(img) > 0).astype(np.uint8)
+  return eval_utils.box_from_mask(mask)
+
+
+def _get_result_box(
+    question: location_output_question.LocationOutputQuestion,
+    bounding_boxes: dict[str, location_output_results.BoundingBox],
+) -> eval_utils.Box:
+  image_h, image_w = question.trace['size']
+  x, y, w, h = location_output_results.get_bounding_box(
+      bounding_boxes, question.question_hash
+  )
+  return eval_utils.box_from_bounding_box(image_w, image_h, x, y, w, h)
+
+
+def load_result_box_mask(
+    question: location_output_question.LocationOutputQuestion,
+    results_folder: str,
+) -> np.ndarray:
+  """Load the result bounding box represented as a mask.
+
+  Args:
+    question: the location-output question for which we load the result mask.
+    results_folder: A string pointing to the folder in which the results are
+      stored.
+
+  Returns:
+    The result bounding box represented as a mask (np.ndarray).
+
+  Here, we load a mask from a .png file and then fill it to it's enclosing
+  bounding box, such that we have a bounding box represented as a mask.
+
+  If results_folder is a json or jsonl file with the coordinates of the boxes
+  (see location_output_results.py), we convert the coordinates to a bounding
+  box mask using eval_utils.box_mask_from_bounding_box instead.
+  """
+  if location_output_results.is_box_results_file(results_folder):
+    image_h, image_w = question.trace['size']
+    x, y, w, h = location_output_results.get_bounding_box(
+        location_output_results.load_bounding_boxes(results_folder),
+        question.question_hash,
+    )
+    return eval_utils.box_mask_from_bounding_box(image_w, image_h, x, y, w, h)
+  mask = _load_result_mask(question, results_folder)
+  # Usually we convert the mask to a box and evaluate the box.
+  # Note that the box is still represented as a mask.
+  return eval_utils.box_mask_from_mask(mask)
+
+
+def _get_result_mask_filename(
+    question: location_output_question.LocationOutputQuestion,
+    results_folder: str,
+) -> str:
+  return os.path.join(
+      results_folder,
+      question.video_name,
+      question.question_hash,
+      question.trace_frame,
+  )
+
+
+def _load_result_mask(
+    question: location_output_question.LocationOutputQuestion,
+    results_folder: str,
+) -> np.ndarray:
+  res_mask_filename = _get_result_mask_filename(question, results_folder)
+  if instrumentation.is_enabled():
+    instrumentation.count('bytes_read', os.path.getsize(res_mask_filename))
+  return (frame.load_img(res_mask_filename) > 0).astype(np.uint8)
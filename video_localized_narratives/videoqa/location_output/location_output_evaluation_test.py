@@ -0,0 +1,216 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import PIL.Image
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import location_output_evaluation
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import square_gt_sidecar
+
+from absl.testing import absltest
+
+
+_HEIGHT = 24
+_WIDTH = 32
+
+
+def _make_question(
+    idx: int, rng: np.random.Generator
+) -> location_output_question.LocationOutputQuestion:
+  trace = np.zeros((_HEIGHT, _WIDTH), dtype=np.uint8)
+  y, x = rng.integers(2, _HEIGHT - 2), rng.integers(2, _WIDTH - 2)
+  trace[y - 2:y + 3, x - 2:x + 3] = 1
+  trace[rng.integers(0, _HEIGHT), rng.integers(0, _WIDTH)] = 1
+  rle = cocomask.encode(np.asfortranarray(trace))
+  rle['counts'] = rle['counts'].decode()
+  return location_output_question.LocationOutputQuestion(
+      video_name=f'video{idx % 2}',
+      question_hash=f'hash{idx}',
+      question='Where is it?',
+      trace_frame='000003.png',
+      trace=rle,
+  )
+
+
+class LocationOutputEvaluationTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self._root = temp_dir.name
+    rng = np.random.default_rng(0)
+    self._questions = [_make_question(idx, rng) for idx in range(12)]
+    self._png_folder = os.path.join(self._root, 'pngs')
+    self._bounding_boxes = {}
+    for idx, question in enumerate(self._questions):
+      result = np.zeros((_HEIGHT, _WIDTH), dtype=np.uint8)
+      if idx % 5:
+        y0, y1 = sorted(rng.integers(0, _HEIGHT, size=2))
+        x0, x1 = sorted(rng.integers(0, _WIDTH, size=2))
+        result[y0, x0] = 255
+        result[y1, x1] = 255
+      filename = os.path.join(
+          self._png_folder,
+          question.video_name,
+          question.question_hash,
+          question.trace_frame,
+      )
+      os.makedirs(os.path.dirname(filename))
+      PIL.Image.fromarray(result).save(filename)
+      result_rle = cocomask.encode(
+          np.asfortranarray((result > 0).astype(np.uint8))
+      )
+      bbox = cocomask.toBbox(result_rle)
+      self._bounding_boxes[question.question_hash] = bbox.tolist()
+
+  def _evaluate(self, results_path, engine):
+    return location_output_evaluation.evaluate_questions(
+        self._questions, results_path, parallel_flag=False, engine=engine
+    )
+
+  def test_box_results_match_png_results(self):
+    json_filename = os.path.join(self._root, 'results.json')
+    with open(json_filename, 'w') as f:
+      json.dump(self._bounding_boxes, f)
+    jsonl_filename = os.path.join(self._root, 'results.jsonl')
+    with open(jsonl_filename, 'w') as f:
+      for question_hash, bbox in self._bounding_boxes.items():
+        f.write(json.dumps({'question_hash': question_hash, 'bbox': bbox}))
+        f.write('\n')
+
+    expected = self._evaluate(self._png_folder, 'mask')
+
+    self.assertEqual(self._evaluate(self._png_folder, 'box'), expected)
+    for results_path in (json_filename, jsonl_filename):
+      for engine in location_output_evaluation.ENGINES:
+        self.assertEqual(self._evaluate(results_path, engine), expected)
+    # The precomputed squares may be in a different order.
+    square_gt = square_gt_sidecar.compute_square_gt(self._questions[::-1])
+    self.assertEqual(
+        location_output_evaluation.evaluate_questions(
+            self._questions,
+            json_filename,
+            parallel_flag=False,
+            engine='box',
+            square_gt=square_gt,
+        ),
+        expected,
+    )
+
+  def test_models_are_evaluated_in_one_pass(self):
+    results_paths = [self._png_folder]
+    for model_idx in range(2):
+      json_filename = os.path.join(self._root, f'results{model_idx}.json')
+      with open(json_filename, 'w') as f:
+        json.dump(
+            {
+                question_hash: [x + model_idx, y, w + 2 * model_idx, h]
+                for question_hash, (x, y, w, h) in self._bounding_boxes.items()
+            },
+            f,
+        )
+      results_paths.append(json_filename)
+
+    for engine in location_output_evaluation.ENGINES:
+      question_results_by_model = (
+          location_output_evaluation.evaluate_questions_for_models(
+              self._questions, results_paths, parallel_flag=False, engine=engine
+          )
+      )
+
+      self.assertLen(question_results_by_model, len(results_paths))
+      for results_path, question_results in zip(
+          results_paths, question_results_by_model
+      ):
+        self.assertEqual(
+            question_results, self._evaluate(results_path, engine)
+        )
+    self.assertNotEqual(
+        question_results_by_model[1], question_results_by_model[2]
+    )
+
+  def test_batches_match_question_by_question(self):
+    for engine in location_output_evaluation.ENGINES:
+      expected = self._evaluate(self._png_folder, engine)
+      for batch_size in (1, 5, 100):
+        self.assertEqual(
+            location_output_evaluation.evaluate_questions(
+                self._questions,
+                self._png_folder,
+                parallel_flag=False,
+                engine=engine,
+                batch_size=batch_size,
+            ),
+            expected,
+        )
+
+  def test_make_batches_groups_by_resolution(self):
+    questions = []
+    for idx, size in enumerate([(2, 3), (4, 5), (2, 3), (2, 3), (4, 5)]):
+      rle = cocomask.encode(np.ones(size, dtype=np.uint8, order='F'))
+      questions.append(
+          location_output_question.LocationOutputQuestion(
+              video_name='video',
+              question_hash=f'hash{idx}',
+              question='Where is it?',
+              trace_frame='000000.png',
+              trace=rle,
+          )
+      )
+
+    self.assertEqual(
+        location_output_evaluation.make_batches(questions, batch_size=2),
+        [[0, 2], [3], [1, 4]],
+    )
+
+  def test_missing_box_raises(self):
+    json_filename = os.path.join(self._root, 'results.json')
+    with open(json_filename, 'w') as f:
+      json.dump({'hash0': [1, 2, 3, 4]}, f)
+
+    with self.assertRaisesRegex(ValueError, 'hash1'):
+      self._evaluate(json_filename, 'box')
+
+  def test_load_result_box_for_image_modes(self):
+    question = self._questions[1]
+    filename = os.path.join(
+        self._png_folder,
+        question.video_name,
+        question.question_hash,
+        question.trace_frame,
+    )
+    img = PIL.Image.open(filename)
+    img.load()
+    for mode in ('L', 'P', 'I;16'):
+      img.convert(mode).save(filename)
+      mask = location_output_evaluation.load_result_box_mask(
+          question, self._png_folder
+      )
+      box = location_output_evaluation.load_result_box(
+          question, self._png_folder
+      )
+
+      self.assertEqual(box, eval_utils.box_from_mask(mask), mode)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,95 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Readers for location-output VideoQA results given as bounding boxes.
+
+Instead of a folder with one png file per question, the results can be a
+single json file mapping each question_hash to a box [x, y, w, h] in pixels:
+  {"69e69b3a8b29d92dd94be66c79f82d69": [10, 20, 30, 40], ...}
+or a jsonl file with one question per line:
+  {"question_hash": "69e69b3a8b29d...", "bbox": [10, 20, 30, 40]}
+
+The box covers the pixels mask[y:y+h, x:x+w] of the trace frame, like
+eval_utils.box_mask_from_bounding_box. Non-integer coordinates are rounded.
+"""
+
+import functools
+import json
+import os
+
+import numpy as np
+
+from video_localized_narratives.tools import instrumentation
+
+
+BoundingBox = tuple[int, int, int, int]
+
+
+def is_box_results_file(results_path: str) -> bool:
+  return os.path.isfile(results_path) and (
+      results_path.endswith('.json') or results_path.endswith('.jsonl')
+  )
+
+
+def load_bounding_boxes(results_filename: str) -> dict[str, BoundingBox]:
+  """Load the boxes [x, y, w, h] by question_hash, cached per process.
+
+  Args:
+    results_filename: the json or jsonl file with the results.
+
+  Returns:
+    The rounded box of each question. A result file which was modified since
+    it was loaded is loaded again.
+  """
+  return _load_bounding_boxes(
+      results_filename, os.path.getmtime(results_filename)
+  )
+
+
+def get_bounding_box(
+    bounding_boxes: dict[str, BoundingBox], question_hash: str
+) -> BoundingBox:
+  if question_hash not in bounding_boxes:
+    raise ValueError(f'No result box for question {question_hash}.')
+  return bounding_boxes[question_hash]
+
+
+@functools.lru_cache(maxsize=1)
+def _load_bounding_boxes(
+    results_filename: str, mtime: float
+) -> dict[str, BoundingBox]:
+  del mtime  # Only used as part of the cache key.
+  instrumentation.count('bytes_read', os.path.getsize(results_filename))
+  with open(results_filename) as f:
+    if results_filename.endswith('.jsonl'):
+      boxes_by_question_hash = {}
+      for line in f:
+        if not line.strip():
+          continue
+        d = json.loads(line)
+        boxes_by_question_hash[d['question_hash']] = d['bbox']
+    else:
+      boxes_by_question_hash = json.load(f)
+  return {
+      question_hash: _round_bounding_box(box)
+      for question_hash, box in boxes_by_question_hash.items()
+  }
+
+
+def _round_bounding_box(box: list[float]) -> BoundingBox:
+  if len(box) != 4:
+    raise ValueError(f'Expected a box [x, y, w, h], got {box}.')
+  # Round like eval_utils.box_mask_from_mask rounds the boxes of masks.
+  x, y, w, h = np.round(np.array(box, dtype=np.float64)).astype(np.int32)
+  return int(x), int(y), int(w), int(h)
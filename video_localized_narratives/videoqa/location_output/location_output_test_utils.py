@@ -0,0 +1,81 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A small synthetic location-output VideoQA dataset with results, for tests.
+
+Some of the predicted masks are empty and some of them overlap the trace.
+"""
+
+import dataclasses
+import json
+import os
+
+import numpy as np
+import PIL.Image
+from pycocotools import mask as cocomask
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticLocationOutput:
+  gt_json_path: str
+  results_folder: str
+
+
+def write_dataset(
+    folder: str,
+    num_videos: int = 2,
+    num_questions_per_video: int = 4,
+    height: int = 24,
+    width: int = 32,
+    seed: int = 0,
+) -> SyntheticLocationOutput:
+  """Write the ground truth json file and png results to folder."""
+  rng = np.random.default_rng(seed)
+  data = SyntheticLocationOutput(
+      gt_json_path=os.path.join(folder, 'gt.json'),
+      results_folder=os.path.join(folder, 'results'),
+  )
+  questions_data_by_video_name = {}
+  for video_idx in range(num_videos):
+    video_name = f'video{video_idx}'
+    questions_data = []
+    for question_idx in range(num_questions_per_video):
+      trace = np.zeros((height, width), dtype=np.uint8)
+      y, x = rng.integers(2, height - 2), rng.integers(2, width - 2)
+      trace[y - 2 : y + 3, x - 2 : x + 3] = 1
+      trace[rng.integers(0, height), rng.integers(0, width)] = 1
+      rle = cocomask.encode(np.asfortranarray(trace))
+      rle['counts'] = rle['counts'].decode()
+      question_hash = f'hash{video_idx}_{question_idx}'
+      trace_frame = f'{question_idx:06d}.png'
+      questions_data.append({
+          'question_hash': question_hash,
+          'question': 'Where is it?',
+          'trace_frame': trace_frame,
+          'trace': rle,
+      })
+
+      result = np.zeros((height, width), dtype=np.uint8)
+      if question_idx % 3:
+        y0, y1 = sorted(rng.integers(0, height, size=2))
+        x0, x1 = sorted(rng.integers(0, width, size=2))
+        result[y0 : y1 + 1, x0 : x1 + 1] = 255
+      result_dir = os.path.join(data.results_folder, video_name, question_hash)
+      os.makedirs(result_dir)
+      PIL.Image.fromarray(result).save(os.path.join(result_dir, trace_frame))
+    questions_data_by_video_name[video_name] = questions_data
+
+  with open(data.gt_json_path, 'w') as f:
+    json.dump(questions_data_by_video_name, f)
+  return data
@@ -0,0 +1,55 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Precompute the approximate square ground truth of a location-output split.
+
+This writes the sidecar next to the ground truth file, which
+eval_location_output.py then uses automatically. See square_gt_sidecar.py.
+
+Usage example:
+  python3 video_localized_narratives/videoqa/location_output/precompute_square_gt.py \\
+    --gt_json_path=data/videoqa/location_output/oops_val/qa_location_output.json
+"""
+
+from collections.abc import Sequence
+
+from absl import app
+from absl import flags
+
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import square_gt_sidecar
+
+
+GROUND_TRUTH_JSON_PATH_FLAG = flags.DEFINE_string(
+    'gt_json_path',
+    default='data/videoqa/location_output/oops_val/qa_location_output.json',
+    help='Path to the location-output ground truth data in json format',
+)
+
+
+def main(argv: Sequence[str]) -> None:
+  if len(argv) > 1:
+    raise app.UsageError('Too many command-line arguments.')
+
+  gt_json_path = GROUND_TRUTH_JSON_PATH_FLAG.value
+  questions = list(
+      location_output_question.iterate_location_output_questions(gt_json_path)
+  )
+  square_gt = square_gt_sidecar.compute_square_gt(questions)
+  filename = square_gt_sidecar.write_sidecar(gt_json_path, square_gt)
+  print(f'Wrote the squares of {len(questions)} questions to {filename}')
+
+
+if __name__ == '__main__':
+  app.run(main)
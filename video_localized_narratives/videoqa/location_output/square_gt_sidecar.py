@@ -0,0 +1,165 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Precomputed approximate square ground truth of a location-output split.
+
+The approximate square of a question only depends on its trace, so it can be
+computed once per ground truth file. The sidecar is stored next to the ground
+truth, e.g. data/videoqa/location_output/oops_val/qa_location_output.json has
+the sidecar qa_location_output_square_gt.npz, and is created with
+precompute_square_gt.py. It contains, in the order of the questions:
+  * the approximate square of each question,
+  * the number of pixels of each trace,
+  * the bounding box of each trace.
+
+The sidecar stores the sha256 hash of the ground truth file. It is only used if
+the hash matches, so a changed ground truth file never uses stale squares.
+"""
+
+import dataclasses
+import functools
+import hashlib
+import os
+from typing import Optional
+
+import numpy as np
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.videoqa.location_output import eval_utils
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import square_prediction
+
+
+SIDECAR_SUFFIX = '_square_gt.npz'
+
+
+@dataclasses.dataclass(frozen=True)
+class SquareGt:
+  """The precomputed values of N questions.
+
+  The boxes are arrays of shape (N, 4) with the coordinates x0, y0, x1, y1 of
+  an eval_utils.Box, see eval_utils.boxes_to_array.
+  """
+
+  question_hashes: np.ndarray
+  square_boxes: np.ndarray
+  trace_areas: np.ndarray
+  trace_boxes: np.ndarray
+
+  def select(self, question_hashes: list[str]) -> 'SquareGt':
+    """The values of the given questions, in the given order."""
+    index_by_question_hash = {
+        question_hash: idx
+        for idx, question_hash in enumerate(self.question_hashes)
+    }
+    indices = np.array(
+        [index_by_question_hash[q] for q in question_hashes], dtype=np.int64
+    )
+    return SquareGt(
+        question_hashes=self.question_hashes[indices],
+        square_boxes=self.square_boxes[indices],
+        trace_areas=self.trace_areas[indices],
+        trace_boxes=self.trace_boxes[indices],
+    )
+
+
+def compute_square_gt(
+    questions: list[location_output_question.LocationOutputQuestion],
+) -> SquareGt:
+  """Compute the values of the questions from their traces."""
+  square_boxes = []
+  trace_boxes = []
+  for question in questions:
+    image_h, image_w = question.trace['size']
+    y0, y1, x0, x1 = (
+        square_prediction.estimate_approximate_square_gt_box_from_rle(
+            question.trace
+        )
+    )
+    square_boxes.append(
+        eval_utils.box_from_slices(image_w, image_h, x0, x1, y0, y1)
+    )
+    # The bounding box of an RLE has integer coordinates.
+    x, y, w, h = cocomask.toBbox(question.trace).astype(np.int64)
+    trace_boxes.append(eval_utils.Box(x0=x, y0=y, x1=x + w, y1=y + h))
+  if questions:
+    trace_areas = cocomask.area([q.trace for q in questions])
+  else:
+    trace_areas = []
+  return SquareGt(
+      question_hashes=np.array(
+          [q.question_hash for q in questions], dtype=np.str_
+      ),
+      square_boxes=eval_utils.boxes_to_array(square_boxes),
+      trace_areas=np.asarray(trace_areas, dtype=np.int64),
+      trace_boxes=eval_utils.boxes_to_array(trace_boxes),
+  )
+
+
+def get_sidecar_filename(gt_json_path: str) -> str:
+  return os.path.splitext(gt_json_path)[0] + SIDECAR_SUFFIX
+
+
+def get_file_hash(filename: str) -> str:
+  with open(filename, 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()
+
+
+def write_sidecar(gt_json_path: str, square_gt: SquareGt) -> str:
+  """Write the sidecar of the ground truth file and return its filename."""
+  filename = get_sidecar_filename(gt_json_path)
+  with open(filename + '.tmp', 'wb') as f:
+    np.savez_compressed(
+        f,
+        gt_sha256=np.array(get_file_hash(gt_json_path)),
+        **dataclasses.asdict(square_gt),
+    )
+  os.replace(filename + '.tmp', filename)
+  _load_sidecar.cache_clear()
+  return filename
+
+
+def load_sidecar(gt_json_path: str) -> Optional[SquareGt]:
+  """Load the sidecar of the ground truth file, if it exists and matches.
+
+  Args:
+    gt_json_path: the path to the ground truth.
+
+  Returns:
+    The precomputed values of all questions, or None if there is no sidecar or
+    if it was computed for a different version of the ground truth file.
+  """
+  filename = get_sidecar_filename(gt_json_path)
+  if not os.path.exists(filename):
+    return None
+  return _load_sidecar(
+      filename, os.path.getmtime(filename), get_file_hash(gt_json_path)
+  )
+
+
+@functools.lru_cache(maxsize=4)
+def _load_sidecar(
+    filename: str, mtime: float, gt_sha256: str
+) -> Optional[SquareGt]:
+  del mtime  # Only used as part of the cache key.
+  with np.load(filename) as data:
+    if str(data['gt_sha256']) != gt_sha256:
+      print('warning, ignoring outdated square ground truth', filename)
+      return None
+    return SquareGt(
+        **{
+            field.name: data[field.name]
+            for field in dataclasses.fields(SquareGt)
+        }
+    )
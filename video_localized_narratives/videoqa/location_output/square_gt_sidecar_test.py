@@ -0,0 +1,104 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+
+import numpy as np
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.videoqa.location_output import location_output_question
+from video_localized_narratives.videoqa.location_output import square_gt_sidecar
+from video_localized_narratives.videoqa.location_output import square_prediction
+
+from absl.testing import absltest
+
+
+def _encode(arr: np.ndarray) -> dict[str, object]:
+  rle = cocomask.encode(np.asfortranarray(arr))
+  rle['counts'] = rle['counts'].decode()
+  return rle
+
+
+class SquareGtSidecarTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self._gt_json_path = os.path.join(temp_dir.name, 'qa_location_output.json')
+    rng = np.random.default_rng(0)
+    self._traces = []
+    questions_data = []
+    for idx in range(5):
+      trace = (rng.random((20, 30)) < 0.05).astype(np.uint8)
+      trace[idx, idx] = 1
+      self._traces.append(trace)
+      questions_data.append({
+          'question_hash': f'hash{idx}',
+          'question': 'Where is it?',
+          'trace_frame': '000000.png',
+          'trace': _encode(trace),
+      })
+    with open(self._gt_json_path, 'w') as f:
+      json.dump({'video': questions_data}, f)
+    self._questions = list(
+        location_output_question.iterate_location_output_questions(
+            self._gt_json_path
+        )
+    )
+
+  def test_compute_square_gt(self):
+    square_gt = square_gt_sidecar.compute_square_gt(self._questions)
+
+    for idx, trace in enumerate(self._traces):
+      y0, y1, x0, x1 = square_prediction.estimate_approximate_square_gt_box(
+          trace
+      )
+      np.testing.assert_array_equal(
+          square_gt.square_boxes[idx], [x0, y0, x1, y1]
+      )
+      self.assertEqual(square_gt.trace_areas[idx], trace.sum())
+      ys, xs = trace.nonzero()
+      np.testing.assert_array_equal(
+          square_gt.trace_boxes[idx],
+          [xs.min(), ys.min(), xs.max() + 1, ys.max() + 1],
+      )
+    selected = square_gt.select(['hash3', 'hash1'])
+    np.testing.assert_array_equal(selected.question_hashes, ['hash3', 'hash1'])
+    np.testing.assert_array_equal(
+        selected.trace_areas, square_gt.trace_areas[[3, 1]]
+    )
+
+  def test_sidecar_is_loaded_only_for_same_ground_truth(self):
+    self.assertIsNone(square_gt_sidecar.load_sidecar(self._gt_json_path))
+    square_gt = square_gt_sidecar.compute_square_gt(self._questions)
+    square_gt_sidecar.write_sidecar(self._gt_json_path, square_gt)
+
+    loaded = square_gt_sidecar.load_sidecar(self._gt_json_path)
+
+    for field in ('question_hashes', 'square_boxes', 'trace_areas',
+                  'trace_boxes'):
+      np.testing.assert_array_equal(
+          getattr(loaded, field), getattr(square_gt, field)
+      )
+
+    with open(self._gt_json_path, 'a') as f:
+      f.write('\n')
+    self.assertIsNone(square_gt_sidecar.load_sidecar(self._gt_json_path))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -14,8 +14,12 @@
 
 """Functions to predict an approximate square bounding box from a trace mask."""
 
+from typing import Any
+
 import numpy as np
 
+from video_localized_narratives.videoqa.location_output import eval_utils
+
 _LEARNED_POLYNOM_COEFS = (0.239715, 1.6737112, -0.42075962)
 
 
@@ -30,6 +34,100 @@ def estimate_approximate_square_gt_mask(trace_mask: np.ndarray) -> np.ndarray:
   )
 
 
+def estimate_approximate_square_gt_box(
+    trace_mask: np.ndarray,
+) -> tuple[int, int, int, int]:
+  """The approximate square as a box (y0, y1, x0, x1), clipped to the image.
+
+  The square mask of estimate_approximate_square_gt_mask is m[y0:y1, x0:x1].
+
+  Args:
+    trace_mask: the trace mask.
+
+  Returns:
+    The slice bounds of the square.
+  """
+  height, width, *_ = trace_mask.shape
+  trace_center_yx = _center_of_mass_yx(trace_mask)
+  estimated_square_side_length = _predict_side_length(
+      trace_mask, trace_center_yx
+  )
+  return _square_to_box(
+      trace_center_yx, estimated_square_side_length, height, width
+  )
+
+
+def estimate_approximate_square_gt_box_from_rle(
+    trace_rle: dict[str, Any],
+) -> tuple[int, int, int, int]:
+  """Like estimate_approximate_square_gt_box, but without decoding the trace.
+
+  The center of mass and the extents of the trace are calculated from its run
+  lengths, so the memory is proportional to the number of runs instead of the
+  number of pixels. The result is exactly the same.
+
+  Args:
+    trace_rle: the trace mask as a COCO RLE.
+
+  Returns:
+    The slice bounds (y0, y1, x0, x1) of the square.
+  """
+  height, width = trace_rle['size']
+  counts = eval_utils.rle_counts(trace_rle)
+  bounds = np.concatenate([[0], np.cumsum(counts)])
+  # Odd runs are foreground. Pixel index p is at y = p % height and
+  # x = p // height.
+  starts = bounds[1:-1:2]
+  ends = bounds[2::2]
+  nonempty = ends > starts
+  starts = starts[nonempty]
+  ends = ends[nonempty]
+  num_pixels = int((ends - starts).sum())
+  if num_pixels == 0:
+    raise ValueError('The trace is empty.')
+
+  # The sums of the coordinates are exact integers, like the float64 sums of
+  # the integer coordinates in _center_of_mass_yx.
+  sum_y = _sum_y_before(ends, height) - _sum_y_before(starts, height)
+  sum_x = _sum_x_before(ends, height) - _sum_x_before(starts, height)
+  trace_center_yx = (
+      int(round(int(sum_y.sum()) / num_pixels)),
+      int(round(int(sum_x.sum()) / num_pixels)),
+  )
+
+  # A run within one column covers the rows from its start to its end. A run
+  # across columns covers all rows.
+  lasts = ends - 1
+  single_column = starts // height == lasts // height
+  min_y = int(np.where(single_column, starts % height, 0).min())
+  max_y = int(np.where(single_column, lasts % height, height - 1).max())
+  min_x = int(starts.min() // height)
+  max_x = int(lasts.max() // height)
+  cy, cx = trace_center_yx
+  yl = max(abs(min_y - cy), abs(max_y - cy))
+  xl = max(abs(min_x - cx), abs(max_x - cx))
+  trace_square_side_length = np.int64(2 * max(yl, xl))
+
+  estimated_square_side_length = _predict_side_length_from_trace_square(
+      trace_square_side_length, height, width
+  )
+  return _square_to_box(
+      trace_center_yx, estimated_square_side_length, height, width
+  )
+
+
+def _sum_y_before(pixel_indices: np.ndarray, height: int) -> np.ndarray:
+  """The sum of the rows of all pixels before each pixel index."""
+  cols, rows = np.divmod(pixel_indices, height)
+  return cols * (height * (height - 1) // 2) + rows * (rows - 1) // 2
+
+
+def _sum_x_before(pixel_indices: np.ndarray, height: int) -> np.ndarray:
+  """The sum of the columns of all pixels before each pixel index."""
+  cols, rows = np.divmod(pixel_indices, height)
+  return height * (cols * (cols - 1) // 2) + cols * rows
+
+
 def _predict_side_length(
     trace_mask: np.ndarray, center_yx: tuple[int, int]
 ) -> float:
@@ -37,6 +135,14 @@ def _predict_side_length(
   trace_square_side_length = _square_side_length(trace_mask, center_yx)
 
   height, width, *_ = trace_mask.shape
+  return _predict_side_length_from_trace_square(
+      trace_square_side_length, height, width
+  )
+
+
+def _predict_side_length_from_trace_square(
+    trace_square_side_length: float, height: int, width: int
+) -> float:
   norm = min(height, width)
   norm_side_length = trace_square_side_length / norm
 
@@ -74,7 +180,15 @@ def _square_to_mask(
     center_yx: tuple[int, int], side_length: float, height: int, width: int
 ) -> np.ndarray:
   """Represent the square as a segmentation mask."""
-  m = np.zeros((height, width))
+  m = np.zeros((height, width), dtype=bool)
+  y0, y1, x0, x1 = _square_to_box(center_yx, side_length, height, width)
+  m[y0:y1, x0:x1] = 1
+  return m
+
+
+def _square_to_box(
+    center_yx: tuple[int, int], side_length: float, height: int, width: int
+) -> tuple[int, int, int, int]:
   yc, xc = center_yx
   y0 = int(round(yc - side_length / 2))
   y1 = int(round(yc + side_length / 2))
@@ -84,5 +198,4 @@ def _square_to_mask(
   x0 = max(x0, 0)
   y1 = min(y1, height)
   x1 = min(x1, width)
-  m[y0:y1, x0:x1] = 1
-  return m
+  return y0, y1, x0, x1
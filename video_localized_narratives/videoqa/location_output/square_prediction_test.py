@@ -0,0 +1,81 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from pycocotools import mask as cocomask
+
+from video_localized_narratives.videoqa.location_output import square_prediction
+
+from absl.testing import absltest
+
+
+def _encode(arr: np.ndarray) -> dict[str, object]:
+  rle = cocomask.encode(np.asfortranarray(arr))
+  rle['counts'] = rle['counts'].decode()
+  return rle
+
+
+class SquarePredictionTest(absltest.TestCase):
+
+  def _assert_same_square(self, trace: np.ndarray):
+    expected = square_prediction.estimate_approximate_square_gt_box(trace)
+    rle = _encode(trace)
+    self.assertEqual(
+        square_prediction.estimate_approximate_square_gt_box_from_rle(rle),
+        expected,
+    )
+    rle['counts'] = rle['counts'].encode()
+    self.assertEqual(
+        square_prediction.estimate_approximate_square_gt_box_from_rle(rle),
+        expected,
+    )
+
+  def test_box_matches_mask(self):
+    trace = np.zeros((30, 40), dtype=np.uint8)
+    trace[5:9, 10:16] = 1
+    y0, y1, x0, x1 = square_prediction.estimate_approximate_square_gt_box(trace)
+    square = np.zeros((30, 40))
+    square[y0:y1, x0:x1] = 1
+
+    np.testing.assert_array_equal(
+        square_prediction.estimate_approximate_square_gt_mask(trace), square
+    )
+
+  def test_rle_matches_mask_for_random_traces(self):
+    rng = np.random.default_rng(0)
+    for h, w in [(30, 40), (50, 17), (3, 90), (1, 5)]:
+      for _ in range(50):
+        trace = (rng.random((h, w)) < rng.random() * 0.2).astype(np.uint8)
+        trace[rng.integers(0, h), rng.integers(0, w)] = 1
+        self._assert_same_square(trace)
+
+  def test_rle_matches_mask_for_runs_across_columns(self):
+    trace = np.zeros((10, 20), dtype=np.uint8)
+    # In column-major order, this is one run across three columns.
+    trace[7:, 3] = 1
+    trace[:, 4] = 1
+    trace[:2, 5] = 1
+    self._assert_same_square(trace)
+    trace = np.ones((10, 20), dtype=np.uint8)
+    self._assert_same_square(trace)
+
+  def test_empty_trace_raises(self):
+    with self.assertRaises(ValueError):
+      square_prediction.estimate_approximate_square_gt_box_from_rle(
+          _encode(np.zeros((4, 5), dtype=np.uint8))
+      )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -21,6 +21,7 @@ from absl import flags
 import sklearn.metrics
 
 from video_localized_narratives.tools import util
+from video_localized_narratives.videoqa.text_output import text_output_evaluation
 
 
 _GROUND_TRUTH_JSON_PATH_FLAG = flags.DEFINE_string(
@@ -31,9 +32,24 @@ _GROUND_TRUTH_JSON_PATH_FLAG = flags.DEFINE_string(
 _RESULTS_JSON_PATH_FLAG = flags.DEFINE_string(
     'results_path',
     default=None,
-    required=True,
     help='Path to the json file with text-output VideoQA results.',
 )
+_RESULTS_PATHS_FLAG = flags.DEFINE_list(
+    'results_paths',
+    default=None,
+    help='Instead of --results_path: comma-separated list of json or jsonl '
+         'files with the results of several runs. Only a table with the '
+         'accuracy and the number of missing answers of each run is printed, '
+         'ranked by accuracy.',
+)
+_BOOTSTRAP_RESAMPLES_FLAG = flags.DEFINE_integer(
+    'bootstrap_resamples',
+    default=0,
+    lower_bound=0,
+    help='With --results_paths: if positive, the 95% confidence interval of '
+         'the accuracy of each run and a paired test against the best run are '
+         'estimated with this many bootstrap resamples of the videos.',
+)
 
 
 def main(argv: Sequence[str]) -> None:
@@ -42,7 +58,23 @@ def main(argv: Sequence[str]) -> None:
 
   gt_json_path = _GROUND_TRUTH_JSON_PATH_FLAG.value
   results_file = _RESULTS_JSON_PATH_FLAG.value
+  results_paths = _RESULTS_PATHS_FLAG.value
   gt = util.load_json_data(gt_json_path)
+  if results_paths is not None:
+    table = text_output_evaluation.build_ground_truth_table(gt)
+    results_by_run = {
+        results_path: text_output_evaluation.load_results(results_path)
+        for results_path in results_paths
+    }
+    text_output_evaluation.print_run_scores({
+        results_path: text_output_evaluation.score_results(table, results)
+        for results_path, results in results_by_run.items()
+    })
+    if _BOOTSTRAP_RESAMPLES_FLAG.value:
+      text_output_evaluation.print_bootstrap(
+          table, results_by_run, _BOOTSTRAP_RESAMPLES_FLAG.value
+      )
+    return
   results = util.load_json_data(results_file)
   evaluate(gt, results)
 
@@ -79,4 +111,7 @@ def accuracy(targets, predictions):
 
 
 if __name__ == '__main__':
+  flags.mark_flags_as_mutual_exclusive(
+      [_RESULTS_JSON_PATH_FLAG, _RESULTS_PATHS_FLAG], required=True
+  )
   app.run(main)
@@ -0,0 +1,212 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Score many text-output VideoQA results against the ground truth at once.
+
+This is the library behind eval_text_output.py --results_paths. The ground
+truth answers are put into a table once, which is then used to score any number
+of result files.
+
+A result file is either a json file mapping question ids to answers:
+  {"question_val_0": "black shorts", ...}
+or a jsonl file with one answer per line:
+  {"question_id": "question_val_0", "answer": "black shorts"}
+
+Like eval_text_output.evaluate, a result can use the full question id or the
+short question id, which consists of its last three parts.
+
+The accuracy is the mean of the per-question correctness, so its confidence
+interval and paired tests between runs are bootstrapped from that, resampling
+the annotations (i.e. videos) as clusters, see tools/bootstrap.py.
+"""
+
+import dataclasses
+import json
+
+import numpy as np
+
+from video_localized_narratives.tools import bootstrap
+from video_localized_narratives.tools import util
+
+
+@dataclasses.dataclass(frozen=True)
+class GroundTruthTable:
+  """The ground truth answers in the order of the questions."""
+
+  question_ids: list[str]
+  short_question_ids: list[str]
+  answers: list[str]
+  # The index of the annotation of each question, to resample by video.
+  annotation_indices: np.ndarray
+
+
+@dataclasses.dataclass(frozen=True)
+class RunScore:
+  """The score of one result file.
+
+  Missing answers count as wrong, so the accuracy is the same as for
+  eval_text_output.evaluate if nothing is missing.
+  """
+
+  accuracy: float
+  num_correct: int
+  num_questions: int
+  num_missing: int
+
+
+def build_ground_truth_table(gt: util.JsonData) -> GroundTruthTable:
+  question_ids = []
+  answers = []
+  annotation_indices = []
+  for annotation_index, ann in enumerate(gt['annotations']):
+    for question_answer_pair in ann['qa_pairs']:
+      question_ids.append(question_answer_pair['question_id'])
+      answers.append(question_answer_pair['answer'])
+      annotation_indices.append(annotation_index)
+  short_question_ids = [
+      '_'.join(question_id.rsplit('_', 3)[-3:]) for question_id in question_ids
+  ]
+  return GroundTruthTable(
+      question_ids=question_ids,
+      short_question_ids=short_question_ids,
+      answers=answers,
+      annotation_indices=np.array(annotation_indices, dtype=np.int64),
+  )
+
+
+def load_results(results_path: str) -> dict[str, str]:
+  """Load the answers by question id from a json or jsonl file."""
+  with open(results_path) as f:
+    if results_path.endswith('.jsonl'):
+      results = {}
+      for line in f:
+        if not line.strip():
+          continue
+        d = json.loads(line)
+        results[d['question_id']] = d['answer']
+      return results
+    return json.load(f)
+
+
+def score_questions(
+    table: GroundTruthTable, results: dict[str, str]
+) -> tuple[np.ndarray, int]:
+  """Return whether each answer is correct (0 or 1) and the number missing."""
+  correct = np.zeros(len(table.answers), dtype=np.float64)
+  num_missing = 0
+  for idx, (question_id, short_question_id, gt_answer) in enumerate(
+      zip(table.question_ids, table.short_question_ids, table.answers)
+  ):
+    if question_id in results:
+      prediction = results[question_id]
+    elif short_question_id in results:
+      prediction = results[short_question_id]
+    else:
+      num_missing += 1
+      continue
+    correct[idx] = prediction == gt_answer
+  return correct, num_missing
+
+
+def score_results(
+    table: GroundTruthTable, results: dict[str, str]
+) -> RunScore:
+  """Score the answers of one result file against the ground truth."""
+  _check_has_questions(table)
+  correct, num_missing = score_questions(table, results)
+  num_correct = int(np.count_nonzero(correct))
+  num_questions = len(table.answers)
+  return RunScore(
+      # The same as 100 * sklearn.metrics.accuracy_score.
+      accuracy=100 * (num_correct / num_questions),
+      num_correct=num_correct,
+      num_questions=num_questions,
+      num_missing=num_missing,
+  )
+
+
+def score_runs(
+    gt: util.JsonData, results_paths: list[str]
+) -> dict[str, RunScore]:
+  """Score each result file, building the ground truth table only once."""
+  table = build_ground_truth_table(gt)
+  return {
+      results_path: score_results(table, load_results(results_path))
+      for results_path in results_paths
+  }
+
+
+def print_run_scores(scores_by_run: dict[str, RunScore]) -> None:
+  """Print a table of the runs, ranked by accuracy."""
+  if not scores_by_run:
+    raise ValueError('No runs to print, at least one result file is needed.')
+  name_width = max(len(name) for name in ['run', *scores_by_run])
+  print(
+      f'{"run":<{name_width}}  {"accuracy (%)":>12}  {"correct":>8}  '
+      f'{"missing":>8}'
+  )
+  ranked = sorted(scores_by_run.items(), key=lambda item: -item[1].accuracy)
+  for name, score in ranked:
+    print(
+        f'{name:<{name_width}}  {score.accuracy:>12.2f}  '
+        f'{score.num_correct:>8}  {score.num_missing:>8}'
+    )
+
+
+def print_bootstrap(
+    table: GroundTruthTable,
+    results_by_run: dict[str, dict[str, str]],
+    num_resamples: int,
+) -> None:
+  """Print the confidence interval of the accuracy of each run.
+
+  The runs are ranked by accuracy, and each run is compared to the best one
+  with a paired test.
+
+  Args:
+    table: the ground truth table.
+    results_by_run: the answers of each run, see load_results.
+    num_resamples: the number of bootstrap resamples.
+  """
+  if not results_by_run:
+    raise ValueError('No runs to compare, at least one result file is needed.')
+  _check_has_questions(table)
+  # In percent, like the accuracy.
+  correct_by_run = {
+      name: 100 * score_questions(table, results)[0]
+      for name, results in results_by_run.items()
+  }
+  ranked = sorted(correct_by_run.items(), key=lambda item: -np.mean(item[1]))
+  best_name, best_correct = ranked[0]
+  for name, correct in ranked:
+    ci = bootstrap.confidence_interval(
+        correct, num_resamples, clusters=table.annotation_indices
+    )
+    print(
+        f'{name}: accuracy (%) '
+        f'{bootstrap.format_confidence_interval(ci)}'
+    )
+    if name != best_name:
+      test = bootstrap.paired_test(
+          correct,
+          best_correct,
+          num_resamples,
+          clusters=table.annotation_indices,
+      )
+      print(f'  vs. {best_name}: {bootstrap.format_paired_test(test)}')
+
+
+def _check_has_questions(table: GroundTruthTable) -> None:
+  if not table.answers:
+    raise ValueError('The ground truth has no questions to score.')
@@ -0,0 +1,130 @@
+# Copyright 2023 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+
+import sklearn.metrics
+
+from video_localized_narratives.videoqa.text_output import text_output_evaluation
+
+from absl.testing import absltest
+
+
+_GT = {
+    'annotations': [
+        {
+            'qa_pairs': [
+                {'question_id': 'video_a_question_val_0', 'answer': 'red'},
+                {'question_id': 'video_a_question_val_1', 'answer': 'dog'},
+            ]
+        },
+        {
+            'qa_pairs': [
+                {'question_id': 'video_b_question_val_2', 'answer': 'running'},
+            ]
+        },
+    ]
+}
+
+
+class TextOutputEvaluationTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    temp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(temp_dir.cleanup)
+    self._root = temp_dir.name
+
+  def test_short_question_ids(self):
+    table = text_output_evaluation.build_ground_truth_table(_GT)
+
+    self.assertEqual(
+        table.short_question_ids,
+        ['question_val_0', 'question_val_1', 'question_val_2'],
+    )
+    self.assertEqual(table.answers, ['red', 'dog', 'running'])
+    self.assertEqual(table.annotation_indices.tolist(), [0, 0, 1])
+
+  def test_score_questions(self):
+    table = text_output_evaluation.build_ground_truth_table(_GT)
+
+    correct, num_missing = text_output_evaluation.score_questions(
+        table, {'question_val_0': 'red', 'question_val_1': 'cat'}
+    )
+
+    self.assertEqual(correct.tolist(), [1.0, 0.0, 0.0])
+    self.assertEqual(num_missing, 1)
+
+  def test_score_runs(self):
+    json_filename = os.path.join(self._root, 'run1.json')
+    with open(json_filename, 'w') as f:
+      json.dump(
+          {
+              'video_a_question_val_0': 'red',
+              'question_val_1': 'cat',
+              'question_val_2': 'running',
+          },
+          f,
+      )
+    jsonl_filename = os.path.join(self._root, 'run2.jsonl')
+    with open(jsonl_filename, 'w') as f:
+      f.write(json.dumps({'question_id': 'question_val_0', 'answer': 'red'}))
+      f.write('\n')
+      f.write(json.dumps({'question_id': 'question_val_1', 'answer': 'dog'}))
+      f.write('\n')
+
+    scores = text_output_evaluation.score_runs(
+        _GT, [json_filename, jsonl_filename]
+    )
+
+    expected_accuracy = 100 * sklearn.metrics.accuracy_score(
+        ['red', 'dog', 'running'], ['red', 'cat', 'running']
+    )
+    self.assertEqual(
+        scores[json_filename],
+        text_output_evaluation.RunScore(
+            accuracy=expected_accuracy,
+            num_correct=2,
+            num_questions=3,
+            num_missing=0,
+        ),
+    )
+    self.assertEqual(scores[jsonl_filename].num_correct, 2)
+    self.assertEqual(scores[jsonl_filename].num_missing, 1)
+
+  def test_ground_truth_without_questions_raises(self):
+    table = text_output_evaluation.build_ground_truth_table(
+        {'annotations': []}
+    )
+
+    with self.assertRaisesRegex(ValueError, 'no questions'):
+      text_output_evaluation.score_results(table, {'question_val_0': 'red'})
+    with self.assertRaisesRegex(ValueError, 'no questions'):
+      text_output_evaluation.print_bootstrap(
+          table, {'run': {'question_val_0': 'red'}}, num_resamples=10
+      )
+
+  def test_no_runs_raises(self):
+    table = text_output_evaluation.build_ground_truth_table(_GT)
+
+    with self.assertRaisesRegex(ValueError, 'No runs'):
+      text_output_evaluation.print_run_scores({})
+    with self.assertRaisesRegex(ValueError, 'No runs'):
+      text_output_evaluation.print_bootstrap(table, {}, num_resamples=10)
+
+
+if __name__ == '__main__':
+  absltest.main()